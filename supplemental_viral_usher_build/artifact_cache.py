@@ -0,0 +1,165 @@
+"""
+Read-through cache for the inputs viral_usher_build downloads, shared between
+builds through a common directory (a ReadWriteMany volume in Kubernetes).
+
+Each entry holds one artifact under a key such as "genbank/<taxid>" and is
+reused while younger than the TTL given at lookup. Entries are built in a
+staging directory and renamed into place, so a build never sees a partial
+entry. Once the cache grows past its size cap, the least recently used
+entries are evicted.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import hashlib
+
+META_NAME = 'meta.json'
+DATA_NAME = 'data'
+STAGING_MAX_AGE = 24 * 3600  # Seconds before an abandoned staging directory is removed
+
+
+def path_size(path):
+    """Total size in bytes of a file or directory tree"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def link_or_copy(source, dest):
+    """Place a cached file or directory at dest, hard-linking where the filesystem allows"""
+    if os.path.isdir(source):
+        shutil.copytree(source, dest, copy_function=link_or_copy)
+        return dest
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
+    return dest
+
+
+class ArtifactCache:
+    """Keyed artifacts in a directory shared between builds, with TTLs and an LRU size cap"""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.entries = os.path.join(root, 'entries')
+        self.staging = os.path.join(root, 'staging')
+        os.makedirs(self.entries, exist_ok=True)
+        os.makedirs(self.staging, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.entries, hashlib.sha256(key.encode()).hexdigest()[:32])
+
+    def lookup(self, key, ttl):
+        """Path of the cached artifact for key, or None if it is missing or older than ttl seconds"""
+        entry = self._entry_path(key)
+        meta_path = os.path.join(entry, META_NAME)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('key') != key or time.time() - meta.get('created_at', 0) > ttl:
+            return None
+        try:
+            os.utime(meta_path)  # Last use, for eviction
+        except OSError:
+            pass
+        return os.path.join(entry, DATA_NAME)
+
+    def publish(self, key, produce):
+        """Run produce(path) to create the artifact for key, then move it into the cache; returns its cached path"""
+        staging = os.path.join(self.staging, uuid.uuid4().hex)
+        os.makedirs(staging)
+        try:
+            produce(os.path.join(staging, DATA_NAME))
+            meta = {
+                'key': key,
+                'created_at': time.time(),
+                'size': path_size(os.path.join(staging, DATA_NAME)),
+            }
+            with open(os.path.join(staging, META_NAME), 'w') as f:
+                json.dump(meta, f)
+
+            entry = self._entry_path(key)
+            if os.path.exists(entry):
+                # rename() will not replace a non-empty directory, so move the stale entry aside first
+                stale = os.path.join(self.staging, f"{uuid.uuid4().hex}-stale")
+                try:
+                    os.rename(entry, stale)
+                    shutil.rmtree(stale, ignore_errors=True)
+                except FileNotFoundError:
+                    pass
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # Another build published the same key first; use theirs
+                shutil.rmtree(staging, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self.evict(keep=entry)
+        return os.path.join(entry, DATA_NAME)
+
+    def fetch(self, key, ttl, dest, produce):
+        """Put the artifact for key at dest: from the cache while fresh, otherwise from produce(path), caching it"""
+        cached = self.lookup(key, ttl)
+        if cached is not None:
+            print(f"Artifact cache hit for {key}")
+        try:
+            if cached is None:
+                print(f"Artifact cache miss for {key}, fetching")
+                cached = self.publish(key, produce)
+            return link_or_copy(cached, dest)
+        except OSError as e:
+            # The cache is full or unwritable, or the entry was evicted while being copied; fetch directly instead
+            print(f"Could not use the artifact cache for {key} ({e}), fetching directly", file=sys.stderr)
+            if os.path.isdir(dest):
+                shutil.rmtree(dest, ignore_errors=True)
+            elif os.path.exists(dest):
+                os.remove(dest)
+            produce(dest)
+            return dest
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits max_bytes, and abandoned staging directories"""
+        now = time.time()
+        for name in os.listdir(self.staging):
+            path = os.path.join(self.staging, name)
+            try:
+                if now - os.path.getmtime(path) > STAGING_MAX_AGE:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+
+        entries = []
+        for name in os.listdir(self.entries):
+            entry = os.path.join(self.entries, name)
+            meta_path = os.path.join(entry, META_NAME)
+            try:
+                with open(meta_path) as f:
+                    size = json.load(f).get('size', 0)
+                entries.append((os.path.getmtime(meta_path), size, entry))
+            except (OSError, ValueError):
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            print(f"Evicting {os.path.basename(entry)} ({size} bytes) from the artifact cache")
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Long-lived build worker for the viral_usher web backend (JOB_EXECUTOR=workers).
+It leases builds from the backend's job queue, runs each viral_usher_build in
+a fresh scratch directory, streams its log back and uploads the results with
+the shared upload engine. Builds therefore skip pod scheduling, image pulls
+and container start-up.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+
+from s3_upload_engine import upload_directory_to_s3
+
+BACKEND_URL = os.environ.get('BACKEND_URL', 'http://localhost:8000').rstrip('/')
+WORKER_TOKEN = os.environ.get('WORKER_TOKEN', '')
+WORKER_ID = os.environ.get('WORKER_ID') or socket.gethostname()
+WORK_ROOT = os.environ.get('WORK_ROOT', tempfile.gettempdir())  # Scratch directories are created under this
+POLL_INTERVAL = float(os.environ.get('WORKER_POLL_INTERVAL', '2'))  # Seconds between lease attempts while idle
+BUILD_COMMAND = os.environ.get('VIRAL_USHER_BUILD_COMMAND', 'viral_usher_build')  # viral_usher_build_cached.py with a download cache
+REPORT_INTERVAL = float(os.environ.get('WORKER_REPORT_INTERVAL', '5'))  # Seconds between log reports (which renew the lease)
+
+
+class LeaseLost(Exception):
+    """The backend requeued the build, so this worker must stop working on it"""
+
+
+def backend_post(path, payload):
+    """POST JSON to the backend and return (status, decoded body or None)"""
+    request = urllib.request.Request(
+        f"{BACKEND_URL}{path}",
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json', 'X-Worker-Token': WORKER_TOKEN},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            body = response.read()
+            return response.status, json.loads(body) if body else None
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+class BuildLog:
+    """Output of the running build, collected by a reader thread and sent to the backend in pieces"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = []
+
+    def write(self, text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+        with self.lock:
+            self.pending.append(text)
+
+    def follow(self, stream):
+        for line in iter(stream.readline, b''):
+            self.write(line.decode('utf-8', errors='replace'))
+
+    def take(self):
+        with self.lock:
+            text, self.pending = ''.join(self.pending), []
+        return text
+
+
+def report(job_name, log, **final):
+    """Send new log output, renewing the lease; with exit_code and usage, finish the build"""
+    for attempt in range(3):
+        try:
+            status, _ = backend_post(f"/api/worker/builds/{job_name}", {"worker": WORKER_ID, "log": log, **final})
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Could not reach backend ({e}), retrying", file=sys.stderr)
+            time.sleep(2 ** attempt)
+            continue
+        if status == 409:
+            raise LeaseLost()
+        return status == 200
+    return False
+
+
+def run_build(item):
+    """Run one leased build and upload its results; returns (exit code, usage)"""
+    job_name = item['job_name']
+    scratch = tempfile.mkdtemp(prefix=f"{job_name}-", dir=WORK_ROOT)
+    command = [BUILD_COMMAND, '--config', item['config_url']]
+    if item.get('no_genbank'):
+        command.append('--no_genbank')
+    if item.get('update'):
+        command.append('--update')
+    if item.get('threads'):
+        command += ['--threads', str(item['threads'])]
+
+    log = BuildLog()
+    log.write(f"Running on worker {WORKER_ID} (attempt {item.get('attempt', 1)}) in {scratch}\n")
+    env = dict(os.environ, CONFIG_S3_KEY=item.get('config_s3_key', ''))
+    started = last_report = time.time()
+    process = subprocess.Popen(command, cwd=scratch, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    reader = threading.Thread(target=log.follow, args=(process.stdout,), daemon=True)
+    reader.start()
+
+    try:
+        # wait4 gives this build's own peak memory and CPU time, including the tools it ran
+        while True:
+            pid, wait_status, rusage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                process.returncode = exit_code = os.waitstatus_to_exitcode(wait_status)
+                break
+            time.sleep(min(REPORT_INTERVAL, 1))
+            if time.time() - last_report >= REPORT_INTERVAL:
+                report(job_name, log.take())
+                last_report = time.time()
+        reader.join()
+        usage = {
+            "peak_memory_bytes": rusage.ru_maxrss * 1024,
+            "cpu_seconds": rusage.ru_utime + rusage.ru_stime,
+        }
+
+        if exit_code == 0:
+            log.write(f"\nUploading results to s3://{os.environ.get('S3_BUCKET')}/{item['results_prefix']}/\n")
+            result = {}
+
+            def upload():
+                try:
+                    result["files"] = upload_directory_to_s3(scratch, os.environ['S3_BUCKET'], item['results_prefix'])
+                except Exception as e:
+                    result["error"] = e
+
+            uploader = threading.Thread(target=upload, daemon=True)
+            uploader.start()
+            while uploader.is_alive():
+                uploader.join(REPORT_INTERVAL)
+                report(job_name, log.take())
+            if "error" in result:
+                log.write(f"ERROR uploading results to S3: {result['error']}\n")
+                exit_code = 1
+            else:
+                log.write(f"Uploaded {len(result['files'])} files\n")
+        else:
+            log.write(f"\nviral_usher_build failed with exit code {exit_code}\n")
+        usage["wall_seconds"] = time.time() - started
+        report(job_name, log.take(), exit_code=exit_code, usage=usage)
+        return exit_code, usage
+    except LeaseLost:
+        print(f"Lease on {job_name} expired, abandoning it", file=sys.stderr)
+        if process.returncode is None:
+            process.kill()
+            process.wait()
+        return None, None
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def main():
+    """Lease and run builds until stopped"""
+    if not WORKER_TOKEN or not os.environ.get('S3_BUCKET'):
+        print("ERROR: WORKER_TOKEN and S3_BUCKET must be set", file=sys.stderr)
+        sys.exit(1)
+    os.makedirs(WORK_ROOT, exist_ok=True)
+
+    print("=" * 80)
+    print(f"Build worker {WORKER_ID} taking builds from {BACKEND_URL}")
+    print("=" * 80)
+    sys.stdout.flush()
+
+    while True:
+        try:
+            status, item = backend_post("/api/worker/lease", {"worker": WORKER_ID})
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Could not reach backend: {e}", file=sys.stderr)
+            status, item = None, None
+        if status != 200 or not item:
+            if status not in (None, 204):
+                print(f"Lease request failed with HTTP {status}", file=sys.stderr)
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        print(f"\nLeased {item['job_name']}")
+        exit_code, _ = run_build(item)
+        print(f"Finished {item['job_name']} with exit code {exit_code}")
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
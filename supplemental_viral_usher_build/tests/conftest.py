@@ -0,0 +1,8 @@
+"""
+The build scripts are run from their own directory rather than installed,
+so the tests import them from there.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+
+import pytest
+
+import artifact_cache
+from artifact_cache import ArtifactCache, META_NAME
+
+
+def writer(content, calls=None):
+    def produce(path):
+        if calls is not None:
+            calls.append(path)
+        with open(path, 'w') as f:
+            f.write(content)
+    return produce
+
+
+def age(cache, key, seconds):
+    """Pretend an entry was created (and last used) seconds ago"""
+    meta_path = os.path.join(cache._entry_path(key), META_NAME)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta['created_at'] -= seconds
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    used = time.time() - seconds
+    os.utime(meta_path, (used, used))
+
+
+def test_publish_then_lookup(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), 1024 ** 2)
+    path = cache.publish("genbank/2697049", writer("ACGT"))
+    assert open(path).read() == "ACGT"
+    assert cache.lookup("genbank/2697049", ttl=60) == path
+    assert cache.lookup("genbank/11320", ttl=60) is None
+    assert os.listdir(cache.staging) == []
+
+
+def test_fetch_reuses_fresh_entries(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), 1024 ** 2)
+    calls = []
+    first = cache.fetch("refseq/GCF_1", 60, str(tmp_path / "a.zip"), writer("v1", calls))
+    second = cache.fetch("refseq/GCF_1", 60, str(tmp_path / "b.zip"), writer("v2", calls))
+    assert len(calls) == 1
+    assert open(first).read() == open(second).read() == "v1"
+
+
+def test_directory_artifacts(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), 1024 ** 2)
+
+    def produce(path):
+        os.makedirs(os.path.join(path, "reference"))
+        with open(os.path.join(path, "reference", "tree.json"), 'w') as f:
+            f.write("{}")
+
+    dest = cache.fetch("nextclade/sars-cov-2@1", 60, str(tmp_path / "dataset"), produce)
+    assert open(os.path.join(dest, "reference", "tree.json")).read() == "{}"
+
+
+def test_expired_entry_is_replaced(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), 1024 ** 2)
+    cache.publish("genbank/2697049", writer("old"))
+    age(cache, "genbank/2697049", 7200)
+    assert cache.lookup("genbank/2697049", ttl=3600) is None
+    assert cache.lookup("genbank/2697049", ttl=86400) is not None
+
+    dest = cache.fetch("genbank/2697049", 3600, str(tmp_path / "genbank.zip"), writer("new"))
+    assert open(dest).read() == "new"
+    assert open(cache.lookup("genbank/2697049", ttl=3600)).read() == "new"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), 250)
+    cache.publish("a", writer("a" * 100))
+    cache.publish("b", writer("b" * 100))
+    age(cache, "a", 300)
+    age(cache, "b", 600)
+    cache.lookup("b", ttl=3600)  # Now the most recently used
+
+    cache.publish("c", writer("c" * 100))
+    assert cache.lookup("a", ttl=3600) is None
+    assert cache.lookup("b", ttl=3600) is not None
+    assert cache.lookup("c", ttl=3600) is not None
+
+
+def test_new_entry_is_kept_even_when_over_the_cap(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), 10)
+    path = cache.publish("big", writer("x" * 100))
+    assert os.path.exists(path)
+
+
+def test_abandoned_staging_directories_are_removed(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), 1024 ** 2)
+    abandoned = os.path.join(cache.staging, "abandoned")
+    os.makedirs(abandoned)
+    old = time.time() - artifact_cache.STAGING_MAX_AGE - 60
+    os.utime(abandoned, (old, old))
+    cache.evict()
+    assert not os.path.exists(abandoned)
+
+
+def test_failed_produce_leaves_no_entry(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), 1024 ** 2)
+
+    def produce(path):
+        raise RuntimeError("download failed")
+
+    with pytest.raises(RuntimeError):
+        cache.publish("genbank/1", produce)
+    assert cache.lookup("genbank/1", ttl=60) is None
+    assert os.listdir(cache.staging) == []
+
+
+def test_unusable_cache_falls_back_to_a_direct_fetch(tmp_path, monkeypatch):
+    cache = ArtifactCache(str(tmp_path / "cache"), 1024 ** 2)
+
+    def full(key, produce):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(cache, "publish", full)
+    dest = cache.fetch("genbank/1", 60, str(tmp_path / "genbank.zip"), writer("direct"))
+    assert open(dest).read() == "direct"
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Drop-in replacement for viral_usher_build that takes its downloads from a
+shared artifact cache (artifact_cache.py) when VIRAL_USHER_CACHE_DIR is set.
+Cached inputs: the RefSeq assembly, the full GenBank set and NCBI Virus
+metadata for a taxid, GenBank downloads of specific accessions, and Nextclade
+datasets (by path and version). Arguments are passed to viral_usher_build
+unchanged.
+"""
+import os
+import sys
+import hashlib
+
+import requests
+from viral_usher import ncbi_helper, viral_usher_build
+
+from artifact_cache import ArtifactCache
+
+CACHE_DIR = os.environ.get('VIRAL_USHER_CACHE_DIR', '')
+CACHE_MAX_BYTES = int(float(os.environ.get('VIRAL_USHER_CACHE_MAX_GB', '50')) * 1024 ** 3)
+# Seconds an entry is reused: GenBank and metadata change daily, references and pinned datasets rarely
+GENBANK_TTL = float(os.environ.get('VIRAL_USHER_CACHE_GENBANK_TTL', str(24 * 3600)))
+REFSEQ_TTL = float(os.environ.get('VIRAL_USHER_CACHE_REFSEQ_TTL', str(30 * 24 * 3600)))
+NEXTCLADE_TTL = float(os.environ.get('VIRAL_USHER_CACHE_NEXTCLADE_TTL', str(30 * 24 * 3600)))
+NEXTCLADE_INDEX_URL = "https://data.clades.nextstrain.org/v3/index.json"
+
+
+def nextclade_dataset_tag(dataset_path):
+    """Current version tag of a Nextclade dataset from the index, or None if it cannot be looked up"""
+    try:
+        response = requests.get(NEXTCLADE_INDEX_URL, timeout=30)
+        response.raise_for_status()
+        for collection in response.json().get('collections', []):
+            for dataset in collection.get('datasets', []):
+                if dataset.get('path') == dataset_path:
+                    return dataset.get('version', {}).get('tag')
+    except (requests.RequestException, ValueError) as e:
+        print(f"Could not look up Nextclade dataset version: {e}", file=sys.stderr)
+    return None
+
+
+def install_cache_hooks(cache):
+    """Route viral_usher's downloads through the cache"""
+    helper = ncbi_helper.NcbiHelper
+    download_refseq = helper.download_refseq
+    download_genbank = helper.download_genbank
+    download_genbank_accessions = helper.download_genbank_accessions
+    query_ncbi_virus_metadata = helper.query_ncbi_virus_metadata
+    run_command = viral_usher_build.run_command
+
+    def as_zip(download):
+        # The datasets tool insists on a .zip file name
+        def produce(path):
+            download(path + '.zip')
+            os.rename(path + '.zip', path)
+        return produce
+
+    def cached_download_refseq(self, assembly_id, filename):
+        produce = as_zip(lambda path: download_refseq(self, assembly_id, path))
+        return cache.fetch(f"refseq/{assembly_id}", REFSEQ_TTL, filename, produce)
+
+    def cached_download_genbank(self, taxid, filename):
+        produce = as_zip(lambda path: download_genbank(self, taxid, path))
+        return cache.fetch(f"genbank/{taxid}", GENBANK_TTL, filename, produce)
+
+    def cached_download_genbank_accessions(self, accessions, filename):
+        digest = hashlib.sha256('\n'.join(sorted(accessions)).encode()).hexdigest()
+        produce = as_zip(lambda path: download_genbank_accessions(self, accessions, path))
+        return cache.fetch(f"genbank-accessions/{digest}", GENBANK_TTL, filename, produce)
+
+    def cached_query_ncbi_virus_metadata(self, taxid, filename):
+        def produce(path):
+            query_ncbi_virus_metadata(self, taxid, path)
+        return cache.fetch(f"ncbi-virus-metadata/{taxid}", GENBANK_TTL, filename, produce)
+
+    dataset_dirs = {}
+
+    def cached_run_command(command, *args, **kwargs):
+        # nextclade --dataset-name downloads the dataset on every run; use a cached copy with --input-dataset instead
+        if command[:2] == ['nextclade', 'run'] and '--dataset-name' in command:
+            index = command.index('--dataset-name')
+            dataset_path = command[index + 1]
+            if dataset_path not in dataset_dirs:
+                tag = nextclade_dataset_tag(dataset_path)
+                get_command = ['nextclade', 'dataset', 'get', '--name', dataset_path]
+                if tag:
+                    get_command += ['--tag', tag]
+                key = f"nextclade/{dataset_path}@{tag or 'latest'}"
+                dest = os.path.abspath(f"nextclade_dataset_{hashlib.sha256(dataset_path.encode()).hexdigest()[:12]}")
+                dataset_dirs[dataset_path] = cache.fetch(
+                    key, NEXTCLADE_TTL if tag else GENBANK_TTL, dest,
+                    lambda path: run_command(get_command + ['--output-dir', path])
+                )
+            command = command[:index] + ['--input-dataset', dataset_dirs[dataset_path]] + command[index + 2:]
+        return run_command(command, *args, **kwargs)
+
+    helper.download_refseq = cached_download_refseq
+    helper.download_genbank = cached_download_genbank
+    helper.download_genbank_accessions = cached_download_genbank_accessions
+    helper.query_ncbi_virus_metadata = cached_query_ncbi_virus_metadata
+    viral_usher_build.run_command = cached_run_command
+
+
+def main():
+    """Run viral_usher_build, with its downloads cached when a cache directory is configured"""
+    if CACHE_DIR:
+        try:
+            cache = ArtifactCache(CACHE_DIR, CACHE_MAX_BYTES)
+        except OSError as e:
+            print(f"Artifact cache unavailable ({e}), downloading everything", file=sys.stderr)
+        else:
+            print(f"Using artifact cache at {CACHE_DIR} (up to {CACHE_MAX_BYTES / 1024 ** 3:g} GB)")
+            install_cache_hooks(cache)
+    sys.argv[0] = 'viral_usher_build'
+    viral_usher_build.main()
+
+
+if __name__ == '__main__':
+    main()
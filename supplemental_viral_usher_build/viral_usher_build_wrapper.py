@@ -6,57 +6,8 @@ This script runs viral_usher_build and then uploads the entire workdir to S3.
 import os
 import sys
 import subprocess
-import boto3
-from pathlib import Path
-
-
-def upload_directory_to_s3(local_directory, bucket, s3_prefix):
-    """Upload all files in a directory to S3, preserving directory structure"""
-    import json
-
-    s3_client = boto3.client(
-        's3',
-        endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
-        aws_access_key_id=os.environ.get('S3_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.environ.get('S3_SECRET_ACCESS_KEY'),
-        region_name=os.environ.get('S3_REGION', 'us-east-1')
-    )
-
-    local_path = Path(local_directory)
-    uploaded_files = []
-
-    print(f"\nUploading results from {local_directory} to s3://{bucket}/{s3_prefix}/")
-    print("__S3_UPLOAD_START__")
-    sys.stdout.flush()
-
-    for file_path in local_path.rglob('*'):
-        if file_path.is_file():
-            # Calculate relative path for S3 key
-            relative_path = file_path.relative_to(local_path)
-            s3_key = f"{s3_prefix}/{relative_path}"
-
-            print(f"  Uploading {relative_path} -> s3://{bucket}/{s3_key}")
-
-            try:
-                s3_client.upload_file(str(file_path), bucket, s3_key)
-                uploaded_files.append(s3_key)
-
-                # Output incremental file info as JSON after each upload
-                file_info = {
-                    "filename": str(relative_path),
-                    "s3_key": s3_key,
-                    "bucket": bucket,
-                    "prefix": s3_prefix
-                }
-                print(f"__S3_FILE_UPLOADED__{json.dumps(file_info)}__S3_FILE_END__")
-                sys.stdout.flush()
-            except Exception as e:
-                print(f"  ERROR uploading {file_path}: {e}", file=sys.stderr)
-
-    print("__S3_UPLOAD_COMPLETE__")
-    print(f"\nSuccessfully uploaded {len(uploaded_files)} files to S3")
-    sys.stdout.flush()
-    return uploaded_files
+
+from s3_upload_engine import upload_directory_to_s3
 
 
 def main():
@@ -67,7 +18,8 @@ def main():
     print("Running viral_usher_build...")
     print("=" * 80)
 
-    cmd = ['viral_usher_build'] + sys.argv[1:]
+    # VIRAL_USHER_BUILD_COMMAND swaps in viral_usher_build_cached.py when a download cache is mounted
+    cmd = [os.environ.get('VIRAL_USHER_BUILD_COMMAND', 'viral_usher_build')] + sys.argv[1:]
     result = subprocess.run(cmd)
 
     if result.returncode != 0:
@@ -3,18 +3,38 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, List, Optional
+from collections import OrderedDict
 import os
 import sys
+import time
+import threading
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 import boto3
+import requests
 from botocore.exceptions import ClientError
 import uuid
-from datetime import datetime
-from kubernetes import client, config as k8s_config
-
-from viral_usher import ncbi_helper, nextclade_helper, config
+import shutil
+import subprocess
+import hashlib
+import hmac
+import secrets
+import re
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+import zlib
+import lzma
+import math
+from datetime import datetime, timezone
+from kubernetes import client, watch, config as k8s_config
+
+from viral_usher import ncbi_helper, config
 
 # S3 Configuration from environment variables
 S3_BUCKET = os.getenv('S3_BUCKET', '')
@@ -22,17 +42,146 @@ S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL', '')  # e.g., https://s3.example.c
 S3_REGION = os.getenv('S3_REGION', 'us-east-1')
 S3_ACCESS_KEY_ID = os.getenv('S3_ACCESS_KEY_ID', '')
 S3_SECRET_ACCESS_KEY = os.getenv('S3_SECRET_ACCESS_KEY', '')
+S3_PUBLIC_ENDPOINT_URL = os.getenv('S3_PUBLIC_ENDPOINT_URL', '')  # Browser-reachable endpoint for presigned URLs
+
+# Result download configuration
+S3_DOWNLOAD_MODE = os.getenv('S3_DOWNLOAD_MODE', 'proxy')  # 'proxy' (via /api/s3-proxy) or 'presigned' (direct from S3)
+S3_PROXY_BASE_URL = os.getenv('S3_PROXY_BASE_URL', 'https://bookish-space-happiness-x56rxw7x77q2p5rq-8081.app.github.dev')
+S3_PRESIGNED_URL_EXPIRY = int(os.getenv('S3_PRESIGNED_URL_EXPIRY', '3600'))  # Seconds a presigned URL stays valid
+S3_PRESIGNED_URL_REFRESH_MARGIN = int(os.getenv('S3_PRESIGNED_URL_REFRESH_MARGIN', '300'))  # Re-sign this long before expiry
 
 # Kubernetes Configuration
 K8S_NAMESPACE = os.getenv('K8S_NAMESPACE', 'default')
 K8S_JOB_IMAGE = os.getenv('K8S_JOB_IMAGE')  # Set via Helm values (viral_usher main image)
 K8S_JOB_IMAGE_PULL_POLICY = os.getenv('K8S_JOB_IMAGE_PULL_POLICY', 'IfNotPresent')
-K8S_UPLOAD_IMAGE = os.getenv('K8S_UPLOAD_IMAGE', 'python:3.12-slim')  # Upload sidecar image
+K8S_UPLOAD_IMAGE = os.getenv('K8S_UPLOAD_IMAGE', 'ghcr.io/theosanderson/project23/viral-usher-uploader:latest')  # Upload sidecar image (Dockerfile.uploader)
 K8S_UPLOAD_IMAGE_PULL_POLICY = os.getenv('K8S_UPLOAD_IMAGE_PULL_POLICY', 'IfNotPresent')
+K8S_UPLOAD_SCRIPT_CONFIGMAP = os.getenv('K8S_UPLOAD_SCRIPT_CONFIGMAP', 'false').lower() == 'true'  # Run this backend's copy of the upload scripts in the uploader image (development)
+K8S_JOB_MODE = os.getenv('K8S_JOB_MODE', 'sidecar')  # 'sidecar', or 'single' to upload from the build container with viral_usher_build_wrapper.py
+K8S_WRAPPER_COMMAND = os.getenv('K8S_WRAPPER_COMMAND', 'viral_usher_build_wrapper.py')  # Wrapper in the job image, for single-container mode
 K8S_S3_SECRET_NAME = os.getenv('K8S_S3_SECRET_NAME', '')  # Optional: use k8s secret instead of env vars
+K8S_JOB_LABELS = {"app": "viral-usher-job"}  # Set on build Jobs and their Pods; the status watch selects on these
+K8S_RESULTS_PREFIX_ANNOTATION = "viral-usher/results-prefix"  # Where a Job's results (and manifest.json) are written
+K8S_SIZING_ANNOTATION = "viral-usher/sizing"  # Inputs and resource estimate a Job was sized from
+K8S_WATCH_TIMEOUT = int(os.getenv('K8S_WATCH_TIMEOUT', '300'))  # Seconds before each watch request is renewed
+K8S_LOG_REFRESH_INTERVAL = float(os.getenv('K8S_LOG_REFRESH_INTERVAL', '1'))  # Seconds; polls within this share one log read
+K8S_LOG_CACHE_MAX_CONTAINERS = int(os.getenv('K8S_LOG_CACHE_MAX_CONTAINERS', '64'))  # Container logs held for incremental reads
+K8S_LOG_CLOCK_MARGIN = 10  # Seconds of overlap when resuming a log read, allowing for node clock skew
+JOB_EVENTS_INTERVAL = float(os.getenv('JOB_EVENTS_INTERVAL', '1'))  # Seconds between reads for a streamed job
+JOB_EVENTS_KEEPALIVE = 15  # Seconds of silence before a keepalive comment, so proxies keep the stream open
+JOB_EVENTS_QUEUE_SIZE = 256  # Events buffered per subscriber before a slow one is dropped
+# Upload engine tuning passed through to job pods when set on the backend (see s3_upload_engine.py)
+K8S_UPLOAD_TUNING_ENV_VARS = [
+    'S3_UPLOAD_WORKERS', 'S3_MULTIPART_THRESHOLD', 'S3_MULTIPART_CHUNKSIZE',
+    'S3_MULTIPART_CONCURRENCY', 'S3_UPLOAD_RETRIES', 'S3_UPLOAD_RETRY_BACKOFF', 'S3_MANIFEST_INTERVAL',
+    'S3_COMPRESS_ENCODING', 'S3_COMPRESS_MIN_SIZE',
+    'UPLOAD_MODE', 'UPLOAD_STABLE_SECONDS', 'UPLOAD_POLL_INTERVAL'
+]
+
+# Shared download cache for builds (see supplemental_viral_usher_build/artifact_cache.py)
+K8S_ARTIFACT_CACHE_PVC = os.getenv('K8S_ARTIFACT_CACHE_PVC', '')  # ReadWriteMany claim mounted into build pods; needs the worker image as K8S_JOB_IMAGE
+ARTIFACT_CACHE_DIR = os.getenv('ARTIFACT_CACHE_DIR', '')  # Cache directory for local builds
+ARTIFACT_CACHE_BUILD_COMMAND = os.getenv('ARTIFACT_CACHE_BUILD_COMMAND', 'viral_usher_build_cached.py')  # viral_usher_build with the cache
+# Cache size cap and TTLs passed through to builds when set on the backend
+ARTIFACT_CACHE_ENV_VARS = [
+    'VIRAL_USHER_CACHE_MAX_GB', 'VIRAL_USHER_CACHE_GENBANK_TTL', 'VIRAL_USHER_CACHE_REFSEQ_TTL',
+    'VIRAL_USHER_CACHE_NEXTCLADE_TTL'
+]
+
+# Upload streaming configuration
+S3_MIN_PART_SIZE = 5 * 1024 * 1024  # S3 rejects non-final multipart parts smaller than 5 MiB
+S3_UPLOAD_PART_SIZE = max(int(os.getenv('S3_UPLOAD_PART_SIZE', str(8 * 1024 * 1024))), S3_MIN_PART_SIZE)
+S3_CONTENT_ADDRESSED_UPLOADS = os.getenv('S3_CONTENT_ADDRESSED_UPLOADS', 'true').lower() == 'true'  # Store inputs under cas/<sha256>
+S3_MAX_PARTS = 10000  # S3 limit on the number of parts in a multipart upload
+S3_DOWNLOAD_CHUNK_SIZE = int(os.getenv('S3_DOWNLOAD_CHUNK_SIZE', str(1024 * 1024)))  # Proxy read size per chunk
+# Signs the upload tokens handed out with direct uploads; random per process unless set (set it when running several replicas)
+UPLOAD_TOKEN_SECRET = os.getenv('UPLOAD_TOKEN_SECRET', '') or secrets.token_hex(32)
+
+# Build result cache: identical submissions reuse an earlier job's results instead of launching a new one
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+RESULT_CACHE_DB = os.getenv('RESULT_CACHE_DB', '/data/viral_usher_cache.db')
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', str(7 * 24 * 3600)))  # Seconds before an entry is rebuilt
+RESULT_CACHE_GENBANK_TTL = int(os.getenv('RESULT_CACHE_GENBANK_TTL', str(24 * 3600)))  # Shorter for GenBank builds, whose NCBI data changes; 0 never reuses them
+RESULT_CACHE_BUILD_IMAGE = os.getenv('RESULT_CACHE_BUILD_IMAGE', '')  # Image builds run in, part of the cache key; defaults to K8S_JOB_IMAGE
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '1000'))  # Least recently used entries evicted beyond this
+
+# Incremental rebuilds ("continue from latest"), tracked in the result cache database
+CONTINUE_MAX_CHAIN = int(os.getenv('CONTINUE_MAX_CHAIN', '14'))  # Incremental builds in a row before a full rebuild is forced
+CONTINUE_MAX_GROWTH = float(os.getenv('CONTINUE_MAX_GROWTH', '0.5'))  # Tree growth since the last full rebuild that forces another
+BUILD_LINEAGE_KEEP = 50  # Builds remembered per taxid and reference
+
+# Job admission queue: submissions wait until the cluster has room, instead of all creating Jobs at once
+JOB_QUEUE_DB = os.getenv('JOB_QUEUE_DB', '/data/viral_usher_jobs.db')  # Persists the queue across restarts
+JOB_MAX_RUNNING = int(os.getenv('JOB_MAX_RUNNING', '10'))  # Build jobs running at once, across all users
+JOB_MAX_RUNNING_PER_USER = int(os.getenv('JOB_MAX_RUNNING_PER_USER', '2'))
+JOB_SMALL_INPUT_BYTES = int(os.getenv('JOB_SMALL_INPUT_BYTES', str(100 * 1024 * 1024)))  # Smaller submissions go first
+JOB_PRIORITY_AGING = int(os.getenv('JOB_PRIORITY_AGING', '1800'))  # Seconds before a waiting large job ranks as small
+JOB_QUEUE_INTERVAL = float(os.getenv('JOB_QUEUE_INTERVAL', '5'))  # Seconds between checks for freed capacity
+JOB_USER_HEADER = os.getenv('JOB_USER_HEADER', '')  # e.g. X-Forwarded-User from an auth proxy; client address if unset
+
+# Job execution: 'kubernetes' creates a Job per build; 'workers' lets long-lived build_worker.py processes lease builds
+# from the queue; 'local' runs builds as subprocesses of the backend
+JOB_EXECUTOR = os.getenv('JOB_EXECUTOR', 'kubernetes')
+LOCAL_JOBS_DIR = os.getenv('LOCAL_JOBS_DIR', '/data/jobs')  # Per-build workspace and logs for local builds
+LOCAL_MAX_JOBS = int(os.getenv('LOCAL_MAX_JOBS', '2'))  # Local builds run at once
+LOCAL_JOB_RETENTION = 7 * 24 * 3600  # Seconds a finished local build's logs are kept
+WORKER_TOKEN = os.getenv('WORKER_TOKEN', '')  # Shared secret workers send as X-Worker-Token; worker endpoints are off without it
+WORKER_LEASE_SECONDS = int(os.getenv('WORKER_LEASE_SECONDS', '60'))  # A build whose worker stops reporting for this long is requeued
+WORKER_MAX_ATTEMPTS = 3  # Leases of one build before it is failed, like a Job's backoff_limit
+WORKER_LOG_MAX_CHARS = 4 * 1024 * 1024  # Build log kept per job; later output is dropped
+WORKER_BUILD_RETENTION = 7 * 24 * 3600  # Seconds a finished build's status and log are kept
+
+# Job sizing: CPU, memory and ephemeral storage requested for a build, estimated from its inputs
+JOB_SIZING_ENABLED = os.getenv('JOB_SIZING_ENABLED', 'true').lower() == 'true'
+JOB_SIZING_DEFAULTS = {
+    "cpu_base": 1.0,  # Cores for a build with no uploaded sequences
+    "cpu_per_1k_sequences": 0.1,
+    "cpu_max": 8.0,
+    "cpu_limit_factor": 2.0,  # Limit as a multiple of the request, so idle node capacity can be used
+    "memory_base_mib": 2048,
+    "memory_per_1k_sequences_mib": 64,
+    "memory_per_input_mib": 2.0,  # Per MiB of uploaded FASTA, metadata and starting tree
+    "memory_max_mib": 32768,
+    "memory_limit_factor": 1.5,
+    "storage_base_mib": 4096,  # GenBank download, reference files and intermediate outputs
+    "storage_per_input_mib": 10.0,
+    "update_sequence_factor": 0.5,  # --update only places the new sequences on an existing tree
+    "sidecar_cpu": 0.25,
+    "sidecar_memory_mib": 512,
+}
+JOB_SIZING = {**JOB_SIZING_DEFAULTS, **json.loads(os.getenv('JOB_SIZING', '{}'))}  # JSON object overriding any of the above
+JOB_BUILD_THREADS = os.getenv('JOB_BUILD_THREADS', 'false').lower() == 'true'  # Pass the estimate's --threads (needs viral_usher >= 0.11 in the job image)
+JOB_SIZING_SAMPLE_BYTES = 1024 * 1024  # Leading bytes of an uploaded FASTA read to estimate its sequence count
+JOB_USAGE_MAX_RECORDS = int(os.getenv('JOB_USAGE_MAX_RECORDS', '10000'))  # Estimated vs. observed usage kept for recalibration
+
+# Result manifest written under each results prefix by the upload engine (see s3_upload_engine.py)
+RESULT_MANIFEST_NAME = "manifest.json"
+RESULT_MANIFEST_RECHECK = float(os.getenv('RESULT_MANIFEST_RECHECK', '2'))  # Seconds between conditional reads of an unfinished manifest
+RESULT_MANIFEST_CACHE_MAX = 1024  # Manifests held in memory
+
+# NCBI lookup cache (taxonomy search, RefSeqs for a taxid, assembly for a RefSeq)
+NCBI_CACHE_TTL = int(os.getenv('NCBI_CACHE_TTL', str(24 * 3600)))  # Seconds before a lookup is repeated
+NCBI_CACHE_MAX_ENTRIES = int(os.getenv('NCBI_CACHE_MAX_ENTRIES', '2048'))  # Per lookup type, in memory
+NCBI_CACHE_DB = os.getenv('NCBI_CACHE_DB', '/data/viral_usher_cache.db')  # Persistent tier; empty to disable
+
+# Concurrency limits and timeouts for blocking client calls, per dependency
+NCBI_MAX_CONCURRENCY = int(os.getenv('NCBI_MAX_CONCURRENCY', '4'))
+NCBI_TIMEOUT = float(os.getenv('NCBI_TIMEOUT', '120'))  # Seconds; NcbiHelper retries internally
+S3_MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', '16'))
+S3_TIMEOUT = float(os.getenv('S3_TIMEOUT', '300'))
+K8S_MAX_CONCURRENCY = int(os.getenv('K8S_MAX_CONCURRENCY', '16'))
+K8S_TIMEOUT = float(os.getenv('K8S_TIMEOUT', '30'))
+DB_MAX_CONCURRENCY = int(os.getenv('DB_MAX_CONCURRENCY', '4'))  # Threads for SQLite reads and writes made from request handlers
+DB_TIMEOUT = float(os.getenv('DB_TIMEOUT', '30'))
+
+# Nextclade dataset index, held in memory and refreshed in the background
+NEXTCLADE_INDEX_URL = "https://data.clades.nextstrain.org/v3/index.json"  # Same index nextclade_helper reads
+NEXTCLADE_INDEX_TTL = int(os.getenv('NEXTCLADE_INDEX_TTL', '3600'))  # Seconds between refresh checks
+NEXTCLADE_INDEX_RETRY = int(os.getenv('NEXTCLADE_INDEX_RETRY', '30'))  # First retry delay while the index has never loaded; doubles up to the TTL
 
 # Initialize S3 client if configured
 s3_client = None
+s3_presign_client = None
 if S3_BUCKET and S3_ACCESS_KEY_ID and S3_SECRET_ACCESS_KEY:
     s3_config = {
         'region_name': S3_REGION,
@@ -44,7 +193,54 @@ if S3_BUCKET and S3_ACCESS_KEY_ID and S3_SECRET_ACCESS_KEY:
 
     s3_client = boto3.client('s3', **s3_config)
 
-app = FastAPI(title="Viral Usher Web API")
+    # Presigned URLs embed the host in their signature, so sign them against
+    # the public endpoint when the backend reaches S3 via an internal address
+    s3_presign_client = s3_client
+    if S3_PUBLIC_ENDPOINT_URL:
+        s3_presign_client = boto3.client('s3', **{**s3_config, 'endpoint_url': S3_PUBLIC_ENDPOINT_URL})
+
+
+class BlockingPool:
+    """Run blocking client calls for one dependency on its own bounded thread pool.
+
+    Keeps slow NCBI, S3 or Kubernetes calls off the event loop, and stops one
+    dependency from exhausting the threads every other request needs.
+    """
+
+    def __init__(self, name: str, max_workers: int, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Call func(*args, **kwargs) on the pool, raising a 504 if it takes longer than the timeout"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"{self.name} request timed out after {self.timeout:g}s")
+
+
+ncbi_pool = BlockingPool("ncbi", NCBI_MAX_CONCURRENCY, NCBI_TIMEOUT)
+s3_pool = BlockingPool("s3", S3_MAX_CONCURRENCY, S3_TIMEOUT)
+k8s_pool = BlockingPool("kubernetes", K8S_MAX_CONCURRENCY, K8S_TIMEOUT)
+db_pool = BlockingPool("database", DB_MAX_CONCURRENCY, DB_TIMEOUT)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background refresh tasks and shared clients for the lifetime of the app"""
+    refresh_task = asyncio.create_task(refresh_nextclade_index_periodically())
+    queue_task = asyncio.create_task(job_queue.run())
+    await job_executor.startup()
+    yield
+    refresh_task.cancel()
+    queue_task.cancel()
+    job_executor.shutdown()
+
+
+app = FastAPI(title="Viral Usher Web API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -59,6 +255,251 @@ app.add_middleware(
 ncbi = ncbi_helper.NcbiHelper()
 
 
+class LookupCache:
+    """LRU cache with a TTL per entry, optionally backed by a SQLite table that survives restarts.
+
+    Values must be JSON-serializable to be persisted. Exceptions raised by
+    the wrapped lookup are not cached.
+    """
+
+    def __init__(self, name: str, ttl: int, max_entries: int, db_path: str = ""):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()  # The connection is used from db_pool threads
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+                self.db = sqlite3.connect(db_path, check_same_thread=False)
+                self.db.execute("""
+                    CREATE TABLE IF NOT EXISTS lookup_cache (
+                        cache_name TEXT NOT NULL,
+                        cache_key TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        PRIMARY KEY (cache_name, cache_key)
+                    )
+                """)
+                self.db.commit()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Warning: {name} cache is in-memory only, could not open {db_path}: {e}", file=sys.stderr)
+                self.db = None
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _load(self, key: str, now: float) -> Optional[tuple]:
+        """Read an unexpired persisted entry as (value, expires_at); runs on db_pool"""
+        with self.db_lock:
+            row = self.db.execute(
+                "SELECT value, expires_at FROM lookup_cache WHERE cache_name = ? AND cache_key = ? AND expires_at > ?",
+                (self.name, key, now)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _store(self, key: str, value: Any, expires_at: float):
+        """Persist an entry and drop expired ones; runs on db_pool"""
+        with self.db_lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO lookup_cache VALUES (?, ?, ?, ?)",
+                (self.name, key, json.dumps(value), expires_at)
+            )
+            self.db.execute("DELETE FROM lookup_cache WHERE expires_at <= ?", (time.time(),))
+            self.db.commit()
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, awaiting fetch() and caching its result on a miss.
+
+        Hits are answered directly, so they never wait behind slow lookups.
+        The persistent table is read and written on db_pool, off the event loop.
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        if self.db is not None:
+            row = await db_pool.run(self._load, key, now)
+            if row:
+                value, expires_at = row
+                with self.lock:
+                    self._remember(key, value, expires_at)
+                    self.persistent_hits += 1
+                return value
+
+        with self.lock:
+            self.misses += 1
+        value = await fetch()
+        expires_at = time.time() + self.ttl
+        with self.lock:
+            self._remember(key, value, expires_at)
+        if self.db is not None:
+            await db_pool.run(self._store, key, value, expires_at)
+        return value
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses
+            }
+
+
+class NextcladeIndex:
+    """The Nextclade dataset index with precomputed lowercase search structures.
+
+    refresh() revalidates the index with a conditional request and re-indexes
+    the body of that same response when it has changed, so the stored
+    validators always match the index held. search() answers from memory,
+    memoizing results per query.
+    """
+
+    # Words too generic to narrow down a species on their own
+    IGNORED_WORDS = {"human", "virus", "fever", "genotype"}
+
+    def __init__(self, max_queries: int = 1024):
+        self.datasets = []
+        self.haystacks = []  # lowercase "name\npath" per dataset
+        self.token_index = {}  # lowercase token -> dataset indices containing it
+        self.etag = None
+        self.last_modified = None
+        self.loaded = False
+        self.max_queries = max_queries
+        self.query_cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def entries(index_data: dict) -> list:
+        """Datasets with clade annotations from index.json, in the shape nextclade_helper.nextclade_get_index returns"""
+        entries = []
+        for collection in index_data.get('collections', []):
+            for dataset in collection.get('datasets', []):
+                capabilities = dataset.get('capabilities', {})
+                if capabilities.get('clades', 0) <= 0:
+                    continue
+                attributes = dataset.get('attributes', {})
+                clades = {"clade": capabilities['clades'], **(capabilities.get('customClades') or {})}
+                entries.append({
+                    "path": dataset.get('path'),
+                    "name": attributes.get('name'),
+                    "segment": attributes.get('segment'),
+                    "clades": clades
+                })
+        return entries
+
+    def refresh(self) -> bool:
+        """Reload the index if it changed since the last fetch, keeping the old one on errors; returns whether one is loaded"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        try:
+            response = requests.get(NEXTCLADE_INDEX_URL, headers=headers, timeout=30)
+            if response.status_code == 304:
+                return self.loaded
+            response.raise_for_status()
+            datasets = self.entries(response.json())
+        except (requests.RequestException, ValueError) as e:
+            print(f"Warning: Could not fetch Nextclade index: {e}", file=sys.stderr)
+            return self.loaded
+
+        haystacks = []
+        token_index = {}
+        for i, dataset in enumerate(datasets):
+            haystack = f"{(dataset['name'] or '').lower()}\n{(dataset['path'] or '').lower()}"
+            haystacks.append(haystack)
+            for token in set(re.split(r'[^a-z0-9]+', haystack)):
+                if token:
+                    token_index.setdefault(token, []).append(i)
+
+        with self.lock:
+            self.datasets = datasets
+            self.haystacks = haystacks
+            self.token_index = token_index
+            self.query_cache.clear()
+            self.etag = response.headers.get('ETag')
+            self.last_modified = response.headers.get('Last-Modified')
+            self.loaded = True
+        return True
+
+    def _substring_matches(self, text: str) -> List[int]:
+        """Indices of datasets whose name or path contains text.
+
+        Text without separators can only match inside a single token, so it is
+        answered from the (much smaller) set of distinct tokens rather than by
+        scanning every dataset.
+        """
+        if re.fullmatch(r'[a-z0-9]+', text):
+            indices = set()
+            for token, token_indices in self.token_index.items():
+                if text in token:
+                    indices.update(token_indices)
+            return sorted(indices)
+        return [i for i, haystack in enumerate(self.haystacks) if text in haystack]
+
+    def search(self, species: str) -> list:
+        """Datasets matching a species name, following the matching rules of viral_usher init"""
+        species_lower = species.lower()
+        with self.lock:
+            cached = self.query_cache.get(species_lower)
+            if cached is not None:
+                self.query_cache.move_to_end(species_lower)
+                return cached
+
+            indices = self._substring_matches(species_lower)
+
+            # If no matches and species has multiple words, try individual words
+            if not indices and ' ' in species_lower:
+                for word in species_lower.split(' '):
+                    if word in self.IGNORED_WORDS or len(word) < 3:
+                        continue
+                    indices = self._substring_matches(word)
+                    if indices:
+                        break
+
+            matches = [self.datasets[i] for i in indices]
+            self.query_cache[species_lower] = matches
+            while len(self.query_cache) > self.max_queries:
+                self.query_cache.popitem(last=False)
+            return matches
+
+
+nextclade_index = NextcladeIndex()
+
+
+async def refresh_nextclade_index_periodically():
+    """Keep the Nextclade index fresh without fetching it on the request path"""
+    retry = NEXTCLADE_INDEX_RETRY
+    while True:
+        if await asyncio.to_thread(nextclade_index.refresh):
+            retry = NEXTCLADE_INDEX_RETRY
+            await asyncio.sleep(NEXTCLADE_INDEX_TTL)
+        else:
+            # Never loaded yet, so dataset searches come back empty; try again soon
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, NEXTCLADE_INDEX_TTL)
+
+
+taxonomy_cache = LookupCache("taxonomy", NCBI_CACHE_TTL, NCBI_CACHE_MAX_ENTRIES, NCBI_CACHE_DB)
+refseq_cache = LookupCache("refseqs", NCBI_CACHE_TTL, NCBI_CACHE_MAX_ENTRIES, NCBI_CACHE_DB)
+assembly_cache = LookupCache("assembly", NCBI_CACHE_TTL, NCBI_CACHE_MAX_ENTRIES, NCBI_CACHE_DB)
+
+
 # Request/Response models
 class SpeciesSearchRequest(BaseModel):
     term: str
@@ -103,6 +544,41 @@ class ConfigResponse(BaseModel):
     config_contents: dict
 
 
+class WorkerLeaseRequest(BaseModel):
+    worker: str
+
+
+class WorkerReport(BaseModel):
+    worker: str
+    log: str = ""
+    exit_code: Optional[int] = None  # Set on the final report
+    usage: Optional[dict] = None
+
+
+class MultipartUploadRequest(BaseModel):
+    filename: str
+    size: int
+    content_type: str = "application/octet-stream"
+
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+
+
+class CompleteUploadRequest(BaseModel):
+    s3_key: str
+    upload_id: str
+    upload_token: str
+    parts: List[UploadedPart]
+
+
+class AbortUploadRequest(BaseModel):
+    s3_key: str
+    upload_id: str
+    upload_token: str
+
+
 # API Endpoints
 
 
@@ -110,7 +586,8 @@ class ConfigResponse(BaseModel):
 async def search_species(request: SpeciesSearchRequest):
     """Search NCBI Taxonomy for species matching the search term"""
     try:
-        tax_entries = ncbi.get_taxonomy_entries(f'"{request.term}"')
+        term = ' '.join(request.term.split()).lower()
+        tax_entries = await taxonomy_cache.get_or_fetch(term, lambda: ncbi_pool.run(ncbi.get_taxonomy_entries, f'"{term}"'))
         return [
             TaxonomyEntry(tax_id=str(entry["tax_id"]), sci_name=entry["sci_name"])
             for entry in tax_entries
@@ -123,7 +600,7 @@ async def search_species(request: SpeciesSearchRequest):
 async def get_refseqs(taxid: str):
     """Get RefSeq entries for a given taxonomy ID"""
     try:
-        refseq_entries = ncbi.get_refseqs_for_taxid(taxid)
+        refseq_entries = await refseq_cache.get_or_fetch(taxid, lambda: ncbi_pool.run(ncbi.get_refseqs_for_taxid, taxid))
         return [
             RefSeqEntry(
                 accession=entry["accession"],
@@ -140,7 +617,9 @@ async def get_refseqs(taxid: str):
 async def get_assembly(refseq_acc: str):
     """Get assembly ID for a RefSeq accession"""
     try:
-        assembly_id = ncbi.get_assembly_acc_for_refseq_acc(refseq_acc)
+        assembly_id = await assembly_cache.get_or_fetch(
+            refseq_acc, lambda: ncbi_pool.run(ncbi.get_assembly_acc_for_refseq_acc, refseq_acc)
+        )
         if not assembly_id:
             raise HTTPException(status_code=404, detail="Assembly ID not found")
         return {"assembly_id": assembly_id}
@@ -150,33 +629,24 @@ async def get_assembly(refseq_acc: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    """Hit/miss counters for the NCBI lookup caches"""
+    return {
+        "taxonomy": taxonomy_cache.stats(),
+        "refseqs": refseq_cache.stats(),
+        "assembly": assembly_cache.stats()
+    }
+
+
 @app.get("/api/nextclade-datasets", response_model=List[NextcladeDataset])
 async def get_nextclade_datasets(species: Optional[str] = None):
     """Get Nextclade datasets, optionally filtered by species"""
     try:
-        datasets = nextclade_helper.nextclade_get_index()
+        if not nextclade_index.loaded:
+            await asyncio.to_thread(nextclade_index.refresh)
 
-        if species:
-            # Search logic from init.py
-            matches = []
-            species_lower = species.lower()
-            for dataset in datasets:
-                if species_lower in dataset["name"].lower() or species_lower in dataset["path"].lower():
-                    matches.append(dataset)
-
-            # If no matches and species has multiple words, try individual words
-            if len(matches) == 0 and ' ' in species:
-                for word in species.lower().split(' '):
-                    if word in ["human", "virus", "fever", "genotype"] or len(word) < 3:
-                        continue
-                    for dataset in datasets:
-                        if word in dataset["name"].lower() or word in dataset["path"].lower():
-                            if dataset not in matches:
-                                matches.append(dataset)
-                    if matches:
-                        break
-
-            datasets = matches
+        datasets = nextclade_index.search(species) if species else nextclade_index.datasets
 
         return [
             NextcladeDataset(
@@ -190,16 +660,53 @@ async def get_nextclade_datasets(species: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def upload_to_s3(file_content: bytes, filename: str, content_type: str = 'text/plain') -> str:
-    """Upload file to S3 and return the S3 key"""
-    if not s3_client:
-        raise HTTPException(status_code=500, detail="S3 not configured")
-
+def new_upload_key(filename: str) -> str:
+    """Build a unique S3 key under uploads/ for a user-supplied file"""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     unique_id = str(uuid.uuid4())[:8]
-    s3_key = f"uploads/{timestamp}_{unique_id}_{filename}"
+    return f"uploads/{timestamp}_{unique_id}_{filename}"
+
+
+def content_addressed_key(sha256_hex: str, filename: str) -> str:
+    """Build the cas/ key for content with the given SHA-256.
+
+    The file extension is kept because viral_usher decides whether to
+    decompress an input from its name (.gz/.xz).
+    """
+    extensions = [re.sub(r'[^a-z0-9]', '', ext) for ext in os.path.basename(filename).lower().split('.')[1:]]
+    suffix = ''.join(f".{ext}" for ext in extensions[-2:] if ext)
+    return f"cas/{sha256_hex}{suffix}"
+
+
+def s3_object_exists(s3_key: str) -> bool:
+    """Check whether an object exists in the configured bucket"""
+    try:
+        s3_client.head_object(Bucket=S3_BUCKET, Key=s3_key)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+
+def upload_to_s3(file_content: bytes, filename: str, content_type: str = 'text/plain',
+                 content_addressed: bool = S3_CONTENT_ADDRESSED_UPLOADS) -> str:
+    """Upload file to S3 and return the S3 key.
+
+    With content_addressed, the key is derived from the SHA-256 of the
+    content and the upload is skipped if that object already exists.
+    """
+    if not s3_client:
+        raise HTTPException(status_code=500, detail="S3 not configured")
 
     try:
+        if content_addressed:
+            s3_key = content_addressed_key(hashlib.sha256(file_content).hexdigest(), filename)
+            if s3_object_exists(s3_key):
+                return s3_key
+        else:
+            s3_key = new_upload_key(filename)
+
         s3_client.put_object(
             Bucket=S3_BUCKET,
             Key=s3_key,
@@ -211,58 +718,488 @@ def upload_to_s3(file_content: bytes, filename: str, content_type: str = 'text/p
         raise HTTPException(status_code=500, detail=f"S3 upload failed: {str(e)}")
 
 
-def ensure_upload_script_configmap():
-    """Create or update the ConfigMap containing the upload sidecar script"""
+async def read_part(upload: UploadFile, size: int) -> bytes:
+    """Read up to size bytes from an upload, returning fewer only at end of file"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = await upload.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+async def upload_stream_to_s3(upload: UploadFile, filename: str, content_type: str = 'text/plain') -> str:
+    """Stream an uploaded file to S3 part by part and return the S3 key.
+
+    Only one part (S3_UPLOAD_PART_SIZE bytes) is held in memory at a time, so
+    memory use does not grow with the size of the file. Files that fit in a
+    single part are sent with a plain put_object. If any part fails, the
+    multipart upload is aborted so no orphaned parts are left in the bucket.
+
+    With S3_CONTENT_ADDRESSED_UPLOADS, the already-spooled upload is hashed
+    in a first pass and nothing is sent if its cas/ object already exists.
+    """
+    if not s3_client:
+        raise HTTPException(status_code=500, detail="S3 not configured")
+
+    part = await read_part(upload, S3_UPLOAD_PART_SIZE)
+    if len(part) < S3_UPLOAD_PART_SIZE:
+        return await s3_pool.run(upload_to_s3, part, filename, content_type)
+
+    try:
+        if S3_CONTENT_ADDRESSED_UPLOADS:
+            digest = hashlib.sha256(part)
+            while chunk := await upload.read(S3_UPLOAD_PART_SIZE):
+                await asyncio.to_thread(digest.update, chunk)
+            s3_key = content_addressed_key(digest.hexdigest(), filename)
+            if await s3_pool.run(s3_object_exists, s3_key):
+                return s3_key
+            await upload.seek(0)
+            part = await read_part(upload, S3_UPLOAD_PART_SIZE)
+        else:
+            s3_key = new_upload_key(filename)
+
+        multipart = await s3_pool.run(
+            s3_client.create_multipart_upload,
+            Bucket=S3_BUCKET,
+            Key=s3_key,
+            ContentType=content_type
+        )
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"S3 upload failed: {str(e)}")
+
+    upload_id = multipart['UploadId']
+    parts = []
     try:
-        # Load kubernetes config
+        part_number = 1
+        while part:
+            response = await s3_pool.run(
+                s3_client.upload_part,
+                Bucket=S3_BUCKET,
+                Key=s3_key,
+                PartNumber=part_number,
+                UploadId=upload_id,
+                Body=part
+            )
+            parts.append({"ETag": response['ETag'], "PartNumber": part_number})
+            part = await read_part(upload, S3_UPLOAD_PART_SIZE)
+            part_number += 1
+
+        await s3_pool.run(
+            s3_client.complete_multipart_upload,
+            Bucket=S3_BUCKET,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts}
+        )
+        return s3_key
+    except Exception as e:
         try:
-            k8s_config.load_incluster_config()
-        except k8s_config.ConfigException:
-            k8s_config.load_kube_config()
+            await s3_pool.run(s3_client.abort_multipart_upload, Bucket=S3_BUCKET, Key=s3_key, UploadId=upload_id)
+        except ClientError as abort_error:
+            print(f"Warning: Failed to abort multipart upload {upload_id}: {abort_error}", file=sys.stderr)
+        raise HTTPException(status_code=500, detail=f"S3 upload failed: {str(e)}")
+
 
-        core_v1 = client.CoreV1Api()
+def upload_token(s3_key: str, upload_id: str = "") -> str:
+    """Sign an upload key (and, while the upload is in progress, its upload ID) for the client that started it"""
+    return hmac.new(UPLOAD_TOKEN_SECRET.encode(), f"{s3_key}\n{upload_id}".encode(), hashlib.sha256).hexdigest()
 
-        # Read the upload script
-        script_path = os.path.join(os.path.dirname(__file__), "../upload_sidecar.py")
-        with open(script_path, 'r') as f:
-            script_content = f.read()
 
-        # Create ConfigMap
+def check_upload_token(s3_key: str, token: str, upload_id: str = ""):
+    """Reject an upload key the client was not issued, so it cannot touch another user's upload"""
+    if not s3_key.startswith("uploads/") or ".." in s3_key:
+        raise HTTPException(status_code=400, detail=f"Invalid upload key: {s3_key}")
+    if not hmac.compare_digest(token, upload_token(s3_key, upload_id)):
+        raise HTTPException(status_code=403, detail=f"Invalid upload token for {s3_key}")
+
+
+def validate_upload_key(s3_key: str, token: str) -> str:
+    """Check that a client-supplied S3 key was issued to this client and refers to an existing object under uploads/"""
+    if not s3_client:
+        raise HTTPException(status_code=500, detail="S3 not configured")
+    check_upload_token(s3_key, token)
+    try:
+        s3_client.head_object(Bucket=S3_BUCKET, Key=s3_key)
+    except ClientError:
+        raise HTTPException(status_code=400, detail=f"Uploaded file not found: {s3_key}")
+    return s3_key
+
+
+@app.post("/api/uploads/initiate")
+async def initiate_upload(request: MultipartUploadRequest):
+    """Start a multipart upload and return presigned URLs for the browser to PUT each part to S3"""
+    if not s3_client:
+        raise HTTPException(status_code=500, detail="S3 not configured")
+    if request.size <= 0:
+        raise HTTPException(status_code=400, detail="File is empty")
+
+    # Grow the part size if the default would need more parts than S3 allows
+    part_size = max(S3_UPLOAD_PART_SIZE, -(-request.size // S3_MAX_PARTS))
+    part_count = -(-request.size // part_size)
+    s3_key = new_upload_key(os.path.basename(request.filename) or "upload")
+
+    try:
+        multipart = await s3_pool.run(
+            s3_client.create_multipart_upload,
+            Bucket=S3_BUCKET,
+            Key=s3_key,
+            ContentType=request.content_type
+        )
+        parts = [
+            {
+                "part_number": part_number,
+                "url": s3_presign_client.generate_presigned_url(
+                    'upload_part',
+                    Params={
+                        'Bucket': S3_BUCKET,
+                        'Key': s3_key,
+                        'UploadId': multipart['UploadId'],
+                        'PartNumber': part_number
+                    },
+                    ExpiresIn=S3_PRESIGNED_URL_EXPIRY
+                )
+            }
+            for part_number in range(1, part_count + 1)
+        ]
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"S3 upload failed: {str(e)}")
+
+    return {
+        "s3_key": s3_key,
+        "upload_id": multipart['UploadId'],
+        "upload_token": upload_token(s3_key, multipart['UploadId']),
+        "part_size": part_size,
+        "parts": parts
+    }
+
+
+@app.post("/api/uploads/complete")
+async def complete_upload(request: CompleteUploadRequest):
+    """Assemble the parts of a browser multipart upload into the final S3 object"""
+    if not s3_client:
+        raise HTTPException(status_code=500, detail="S3 not configured")
+    check_upload_token(request.s3_key, request.upload_token, request.upload_id)
+
+    try:
+        await s3_pool.run(
+            s3_client.complete_multipart_upload,
+            Bucket=S3_BUCKET,
+            Key=request.s3_key,
+            UploadId=request.upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"ETag": part.etag, "PartNumber": part.part_number}
+                    for part in sorted(request.parts, key=lambda part: part.part_number)
+                ]
+            }
+        )
+    except ClientError as e:
+        raise HTTPException(status_code=400, detail=f"Could not complete upload: {str(e)}")
+
+    # The finished object is then referenced by key alone, with a token that no longer names the upload ID
+    return {"s3_key": request.s3_key, "upload_token": upload_token(request.s3_key)}
+
+
+@app.post("/api/uploads/abort")
+async def abort_upload(request: AbortUploadRequest):
+    """Abort a browser multipart upload and discard its parts"""
+    if not s3_client:
+        raise HTTPException(status_code=500, detail="S3 not configured")
+    check_upload_token(request.s3_key, request.upload_token, request.upload_id)
+
+    try:
+        await s3_pool.run(s3_client.abort_multipart_upload, Bucket=S3_BUCKET, Key=request.s3_key, UploadId=request.upload_id)
+    except ClientError as e:
+        raise HTTPException(status_code=400, detail=f"Could not abort upload: {str(e)}")
+
+    return {"aborted": True}
+
+
+def load_k8s_config(configuration: client.Configuration):
+    """Load kubernetes config into configuration (try in-cluster first, fallback to local kubeconfig)"""
+    try:
+        # Installs a hook that re-reads the projected service account token when it rotates
+        k8s_config.load_incluster_config(client_configuration=configuration, try_refresh_token=True)
+    except k8s_config.ConfigException:
+        k8s_config.load_kube_config(client_configuration=configuration)
+
+
+class KubernetesClients:
+    """Kubernetes API objects sharing one ApiClient and connection pool.
+
+    Config is loaded once, on first use or at startup, rather than on every
+    request. Service account tokens are refreshed by the client itself.
+    """
+
+    def __init__(self, pool_size: int):
+        self.pool_size = pool_size
+        self.api_client = None
+        self._core_v1 = None
+        self._batch_v1 = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Load config and create the shared API client, if not done already"""
+        with self._lock:
+            if self.api_client is not None:
+                return
+            configuration = client.Configuration()
+            load_k8s_config(configuration)
+            # One connection per concurrent call the kubernetes pool can make
+            configuration.connection_pool_maxsize = self.pool_size
+            self.api_client = client.ApiClient(configuration)
+            self._core_v1 = client.CoreV1Api(self.api_client)
+            self._batch_v1 = client.BatchV1Api(self.api_client)
+
+    @property
+    def core_v1(self) -> client.CoreV1Api:
+        self.connect()
+        return self._core_v1
+
+    @property
+    def batch_v1(self) -> client.BatchV1Api:
+        self.connect()
+        return self._batch_v1
+
+    def close(self):
+        """Close pooled connections; the next call reconnects"""
+        with self._lock:
+            if self.api_client is not None:
+                self.api_client.close()
+            self.api_client = None
+            self._core_v1 = None
+            self._batch_v1 = None
+
+
+k8s = KubernetesClients(K8S_MAX_CONCURRENCY)
+
+
+class JobStatusInformer:
+    """In-memory table of viral-usher Jobs and Pods, kept current by Kubernetes watches.
+
+    One list-then-watch thread per resource type. Polls for job status read
+    from the table instead of the API server, so their cost does not grow
+    with the number of people watching jobs.
+    """
+
+    def __init__(self, namespace: str, labels: dict):
+        self.namespace = namespace
+        self.label_selector = ",".join(f"{key}={value}" for key, value in labels.items())
+        self.jobs = {}  # job name -> V1Job
+        self.pods = {}  # pod name -> V1Pod
+        self.synced = {"jobs": threading.Event(), "pods": threading.Event()}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.watches = []
+
+    def start(self):
+        """Start the watch threads (idempotent)"""
+        if self.watches:
+            return
+        for kind in ("jobs", "pods"):
+            w = watch.Watch()
+            self.watches.append(w)
+            threading.Thread(target=self._run, args=(kind, w), name=f"watch-{kind}", daemon=True).start()
+
+    def stop(self):
+        self.stopping.set()
+        for w in self.watches:
+            w.stop()
+
+    def _list_func(self, kind: str) -> Callable:
+        if kind == "jobs":
+            return k8s.batch_v1.list_namespaced_job
+        return k8s.core_v1.list_namespaced_pod
+
+    def _run(self, kind: str, w: watch.Watch):
+        """List once, then apply watch events; relist whenever the watch falls too far behind"""
+        store = getattr(self, kind)
+        while not self.stopping.is_set():
+            try:
+                list_func = self._list_func(kind)
+                listing = list_func(namespace=self.namespace, label_selector=self.label_selector)
+                with self.lock:
+                    store.clear()
+                    store.update({item.metadata.name: item for item in listing.items})
+                self.synced[kind].set()
+
+                # Each watch request ends after K8S_WATCH_TIMEOUT; resume from the last version seen
+                resource_version = listing.metadata.resource_version
+                while not self.stopping.is_set():
+                    for event in w.stream(list_func, namespace=self.namespace, label_selector=self.label_selector,
+                                          resource_version=resource_version, timeout_seconds=K8S_WATCH_TIMEOUT):
+                        obj = event["object"]
+                        resource_version = obj.metadata.resource_version
+                        with self.lock:
+                            if event["type"] == "DELETED":
+                                store.pop(obj.metadata.name, None)
+                            else:
+                                store[obj.metadata.name] = obj
+            except client.exceptions.ApiException as e:
+                if e.status != 410:  # 410 Gone: resource version expired, relist straight away
+                    self._wait_before_retry(kind, e)
+            except Exception as e:
+                self._wait_before_retry(kind, e)
+
+    def _wait_before_retry(self, kind: str, error: Exception):
+        # Until the watch recovers, pollers fall back to reading the API directly
+        self.synced[kind].clear()
+        if not self.stopping.is_set():
+            print(f"Warning: {kind} watch failed, retrying: {error}", file=sys.stderr)
+            self.stopping.wait(5)
+
+    def record_job(self, job: client.V1Job):
+        """Add a job just created by this backend, so polls find it before its watch event arrives"""
+        with self.lock:
+            self.jobs.setdefault(job.metadata.name, job)
+
+    def lookup(self, job_name: str) -> Optional[tuple]:
+        """Return (job, pods oldest first) from the table, or None if the table cannot answer"""
+        if not all(event.is_set() for event in self.synced.values()):
+            return None
+        with self.lock:
+            job = self.jobs.get(job_name)
+            if job is None:
+                return None
+            pods = [pod for pod in self.pods.values() if (pod.metadata.labels or {}).get("job-name") == job_name]
+        pods.sort(key=lambda pod: pod.metadata.creation_timestamp or datetime.min)
+        return job, pods
+
+
+job_informer = JobStatusInformer(K8S_NAMESPACE, K8S_JOB_LABELS)
+
+
+# Upload sidecar scripts mounted into job pods, published as an immutable ConfigMap named by their content hash
+UPLOAD_SCRIPT_FILES = ("upload_sidecar.py", "s3_upload_engine.py")
+upload_script_configmap_name = None
+upload_script_configmap_lock = threading.Lock()
+
+
+def ensure_upload_script_configmap() -> str:
+    """Create the ConfigMap for this version of the upload sidecar scripts, once per process, and return its name"""
+    global upload_script_configmap_name
+    with upload_script_configmap_lock:
+        if upload_script_configmap_name:
+            return upload_script_configmap_name
+
+        # Read the upload script and the shared upload engine it imports
+        scripts = {}
+        for script_name in UPLOAD_SCRIPT_FILES:
+            script_path = os.path.join(os.path.dirname(__file__), "..", script_name)
+            with open(script_path, 'r') as f:
+                scripts[script_name] = f.read()
+
+        digest = hashlib.sha256(json.dumps(scripts, sort_keys=True).encode()).hexdigest()
+        name = f"upload-sidecar-script-{digest[:12]}"
         configmap = client.V1ConfigMap(
-            metadata=client.V1ObjectMeta(name="upload-sidecar-script"),
-            data={"upload_sidecar.py": script_content}
+            metadata=client.V1ObjectMeta(name=name, labels={"app": "viral-usher-upload-sidecar"}),
+            data=scripts,
+            immutable=True
         )
 
-        # Try to create or update
         try:
-            core_v1.create_namespaced_config_map(namespace=K8S_NAMESPACE, body=configmap)
+            k8s.core_v1.create_namespaced_config_map(namespace=K8S_NAMESPACE, body=configmap)
         except client.exceptions.ApiException as e:
-            if e.status == 409:  # Already exists, update it
-                core_v1.replace_namespaced_config_map(
-                    name="upload-sidecar-script",
-                    namespace=K8S_NAMESPACE,
-                    body=configmap
-                )
-            else:
+            if e.status != 409:  # Already exists: same name means same content
                 raise
-    except Exception as e:
-        print(f"Warning: Failed to create/update upload script ConfigMap: {e}", file=sys.stderr)
 
+        upload_script_configmap_name = name
+        return name
+
+
+def estimate_job_resources(inputs: dict, use_update_mode: bool) -> dict:
+    """Size a build from its input stats (see config_input_stats) with the JOB_SIZING model"""
+    sizing = JOB_SIZING
+    sequences = inputs.get("fasta_sequences", 0)
+    if use_update_mode:
+        sequences *= sizing["update_sequence_factor"]
+    input_mib = (inputs.get("fasta_bytes", 0) + inputs.get("metadata_bytes", 0) + inputs.get("tree_bytes", 0)) / (1024 * 1024)
+
+    cpu = min(sizing["cpu_max"], sizing["cpu_base"] + sizing["cpu_per_1k_sequences"] * sequences / 1000)
+    memory_mib = min(
+        sizing["memory_max_mib"],
+        sizing["memory_base_mib"] + sizing["memory_per_1k_sequences_mib"] * sequences / 1000
+        + sizing["memory_per_input_mib"] * input_mib
+    )
+    storage_mib = sizing["storage_base_mib"] + sizing["storage_per_input_mib"] * input_mib
+    # Round up to half cores and 256 MiB so similar builds get identical requests
+    cpu = math.ceil(cpu * 2) / 2
+    return {
+        "cpu": cpu,
+        "memory_mib": math.ceil(memory_mib / 256) * 256,
+        "storage_mib": math.ceil(storage_mib / 256) * 256,
+        "threads": max(1, math.ceil(cpu)),
+    }
 
-def start_kubernetes_job(config_s3_key: str, job_name: str, no_genbank: bool = False, use_update_mode: bool = False) -> dict:
-    """Start a Kubernetes job to process the config file"""
-    try:
-        # Ensure the upload script ConfigMap exists
-        ensure_upload_script_configmap()
 
-        # Load kubernetes config (try in-cluster first, fallback to local kubeconfig)
-        try:
-            k8s_config.load_incluster_config()
-        except k8s_config.ConfigException:
-            k8s_config.load_kube_config()
+def job_resource_requirements(estimate: Optional[dict]) -> tuple:
+    """Resource requirements for the build and upload containers, or (None, None) when not sized"""
+    if not estimate:
+        return None, None
+    sizing = JOB_SIZING
+    build = client.V1ResourceRequirements(
+        requests={
+            "cpu": f"{estimate['cpu']:g}",
+            "memory": f"{estimate['memory_mib']}Mi",
+            "ephemeral-storage": f"{estimate['storage_mib']}Mi",
+        },
+        limits={
+            "cpu": f"{estimate['cpu'] * sizing['cpu_limit_factor']:g}",
+            "memory": f"{math.ceil(estimate['memory_mib'] * sizing['memory_limit_factor'])}Mi",
+        }
+    )
+    upload = client.V1ResourceRequirements(
+        requests={"cpu": f"{sizing['sidecar_cpu']:g}", "memory": f"{sizing['sidecar_memory_mib']}Mi"},
+        limits={"memory": f"{math.ceil(sizing['sidecar_memory_mib'] * sizing['memory_limit_factor'])}Mi"}
+    )
+    return build, upload
+
+
+# Printed by the build container when viral_usher_build exits, from its cgroup (v2, with v1 fallbacks)
+JOB_USAGE_REPORT = (
+    "peak=$(cat /sys/fs/cgroup/memory.peak 2>/dev/null || cat /sys/fs/cgroup/memory/memory.max_usage_in_bytes 2>/dev/null); "
+    "cpu_usec=; [ -r /sys/fs/cgroup/cpu.stat ] && while read key value; do "
+    "[ \"$key\" = usage_usec ] && cpu_usec=$value; done < /sys/fs/cgroup/cpu.stat; "
+    "[ -z \"$cpu_usec\" ] && [ -r /sys/fs/cgroup/cpuacct/cpuacct.usage ] && "
+    "cpu_usec=$(( $(cat /sys/fs/cgroup/cpuacct/cpuacct.usage) / 1000 )); "
+    "echo \"viral-usher resource usage: peak_memory_bytes=$peak cpu_usec=$cpu_usec\""
+)
+JOB_USAGE_PATTERN = re.compile(r"viral-usher resource usage: peak_memory_bytes=(\d*) cpu_usec=(\d*)")
+
+
+def artifact_cache_env(cache_dir: str) -> dict:
+    """Environment for a build that takes its downloads from the artifact cache at cache_dir"""
+    env = {"VIRAL_USHER_CACHE_DIR": cache_dir, "VIRAL_USHER_BUILD_COMMAND": ARTIFACT_CACHE_BUILD_COMMAND}
+    for name in ARTIFACT_CACHE_ENV_VARS:
+        if os.getenv(name):
+            env[name] = os.getenv(name)
+    return env
 
-        # Create API client
-        batch_v1 = client.BatchV1Api()
+
+def s3_object_url(s3_key: str) -> str:
+    """URL a job uses to fetch an object from the bucket"""
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL}/{S3_BUCKET}/{s3_key}"
+    return f"https://s3.{S3_REGION}.amazonaws.com/{S3_BUCKET}/{s3_key}"
+
+
+def start_kubernetes_job(config_s3_key: str, job_name: str, no_genbank: bool = False, use_update_mode: bool = False,
+                         inputs: Optional[dict] = None, estimate: Optional[dict] = None,
+                         single_container: bool = K8S_JOB_MODE == 'single') -> dict:
+    """Start a Kubernetes job to process the config file, with resources from estimate when given.
+
+    By default the build runs next to an upload sidecar sharing an emptyDir
+    workspace. With single_container the job image's viral_usher_build_wrapper.py
+    runs the build and uploads the results itself, so the pod has one container.
+    With K8S_ARTIFACT_CACHE_PVC set, the build takes its downloads from the
+    shared cache mounted at /cache.
+    """
+    try:
+        batch_v1 = k8s.batch_v1
 
         # Build environment variables for the job
         env_vars = [
@@ -274,6 +1211,10 @@ def start_kubernetes_job(config_s3_key: str, job_name: str, no_genbank: bool = F
         if S3_ENDPOINT_URL:
             env_vars.append(client.V1EnvVar(name="S3_ENDPOINT_URL", value=S3_ENDPOINT_URL))
 
+        for name in K8S_UPLOAD_TUNING_ENV_VARS:
+            if os.getenv(name):
+                env_vars.append(client.V1EnvVar(name=name, value=os.getenv(name)))
+
         # If using Kubernetes secret for S3 credentials, use envFrom
         # Otherwise, pass credentials as env vars (less secure but works for dev)
         env_from = []
@@ -289,83 +1230,100 @@ def start_kubernetes_job(config_s3_key: str, job_name: str, no_genbank: bool = F
             ])
 
         # Build S3 URL for config file
-        if S3_ENDPOINT_URL:
-            config_url = f"{S3_ENDPOINT_URL}/{S3_BUCKET}/{config_s3_key}"
+        config_url = s3_object_url(config_s3_key)
+
+        build_resources, upload_resources = job_resource_requirements(estimate)
+        threads_flag = f" --threads {estimate['threads']}" if estimate and JOB_BUILD_THREADS else ""
+        annotations = {K8S_RESULTS_PREFIX_ANNOTATION: results_prefix_for_config(config_s3_key)}
+        if estimate:
+            annotations[K8S_SIZING_ANNOTATION] = json.dumps({"inputs": inputs or {}, "estimate": estimate}, sort_keys=True)
+
+        # The build container alone mounts the download cache; the wrapper picks up the cached build command from its env
+        build_env = env_vars
+        build_mounts = [] if single_container else [client.V1VolumeMount(name="workspace", mount_path="/workspace")]
+        volumes = [] if single_container else [client.V1Volume(name="workspace", empty_dir=client.V1EmptyDirVolumeSource())]
+        build_executable = 'viral_usher_build'
+        if K8S_ARTIFACT_CACHE_PVC:
+            build_env = env_vars + [client.V1EnvVar(name=name, value=value) for name, value in artifact_cache_env("/cache").items()]
+            build_mounts.append(client.V1VolumeMount(name="artifact-cache", mount_path="/cache"))
+            volumes.append(client.V1Volume(
+                name="artifact-cache",
+                persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=K8S_ARTIFACT_CACHE_PVC)
+            ))
+            build_executable = ARTIFACT_CACHE_BUILD_COMMAND
+
+        # Run viral_usher_build (or the uploading wrapper) with config URL and optional flags, then report its usage
+        build_command = (
+            f"{K8S_WRAPPER_COMMAND if single_container else build_executable} --config {config_url}"
+            f"{' --no_genbank' if no_genbank else ''}"
+            f"{' --update' if use_update_mode else ''}"
+            f"{threads_flag}"
+        )
+        if single_container:
+            build_args = f"cd /workspace && {build_command}; status=$?; {JOB_USAGE_REPORT}; exit $status"
         else:
-            config_url = f"https://s3.{S3_REGION}.amazonaws.com/{S3_BUCKET}/{config_s3_key}"
+            build_args = (
+                f"cd /workspace && {build_command}; status=$?; {JOB_USAGE_REPORT}; "
+                "[ $status -eq 0 ] && touch /workspace/.job_complete; exit $status"
+            )
+
+        # Main container: viral_usher
+        containers = [
+            client.V1Container(
+                name="viral-usher",
+                image=K8S_JOB_IMAGE,
+                image_pull_policy=K8S_JOB_IMAGE_PULL_POLICY,
+                command=["/bin/sh", "-c"],
+                args=[build_args],
+                resources=build_resources,
+                env=build_env,
+                env_from=env_from if env_from else None,
+                working_dir="/workspace",
+                volume_mounts=build_mounts or None
+            )
+        ]
+        if not single_container:
+            # Sidecar container: S3 upload, from the uploader image's entry point; the workspace emptyDir is shared
+            upload_command = None
+            upload_mounts = [client.V1VolumeMount(name="workspace", mount_path="/workspace")]
+            if K8S_UPLOAD_SCRIPT_CONFIGMAP:
+                # Published once per process; later jobs only reference it
+                upload_command = ["python3", "/scripts/upload_sidecar.py"]
+                upload_mounts.append(client.V1VolumeMount(name="upload-script", mount_path="/scripts"))
+                volumes.append(client.V1Volume(
+                    name="upload-script",
+                    config_map=client.V1ConfigMapVolumeSource(name=ensure_upload_script_configmap(), default_mode=0o755)
+                ))
+            containers.append(client.V1Container(
+                name="upload-sidecar",
+                image=K8S_UPLOAD_IMAGE,
+                image_pull_policy=K8S_UPLOAD_IMAGE_PULL_POLICY,
+                command=upload_command,
+                resources=upload_resources,
+                env=env_vars + [
+                    client.V1EnvVar(name="WORKDIR", value="/workspace")
+                ],
+                env_from=env_from if env_from else None,
+                volume_mounts=upload_mounts
+            ))
 
         # Create job without initContainer - pass config URL directly
         job = client.V1Job(
             api_version="batch/v1",
             kind="Job",
-            metadata=client.V1ObjectMeta(name=job_name),
+            metadata=client.V1ObjectMeta(
+                name=job_name,
+                labels=K8S_JOB_LABELS,
+                annotations=annotations
+            ),
             spec=client.V1JobSpec(
                 backoff_limit=3,
                 template=client.V1PodTemplateSpec(
+                    metadata=client.V1ObjectMeta(labels=K8S_JOB_LABELS),
                     spec=client.V1PodSpec(
                         restart_policy="Never",
-                        # Main container to run viral_usher + sidecar for upload
-                        containers=[
-                            # Main container: viral_usher
-                            client.V1Container(
-                                name="viral-usher",
-                                image=K8S_JOB_IMAGE,
-                                image_pull_policy=K8S_JOB_IMAGE_PULL_POLICY,
-                                command=["/bin/sh", "-c"],
-                                args=[
-                                    # Run viral_usher_build with config URL and optional flags
-                                    "cd /workspace && "
-                                    f"viral_usher_build --config {config_url}"
-                                    f"{' --no_genbank' if no_genbank else ''}"
-                                    f"{' --update' if use_update_mode else ''} && "
-                                    "touch /workspace/.job_complete"
-                                ],
-                                env=env_vars,
-                                env_from=env_from if env_from else None,
-                                working_dir="/workspace",
-                                volume_mounts=[
-                                    client.V1VolumeMount(
-                                        name="workspace",
-                                        mount_path="/workspace"
-                                    )
-                                ]
-                            ),
-                            # Sidecar container: S3 upload
-                            client.V1Container(
-                                name="upload-sidecar",
-                                image=K8S_UPLOAD_IMAGE,
-                                image_pull_policy=K8S_UPLOAD_IMAGE_PULL_POLICY,
-                                command=["python3", "/scripts/upload_sidecar.py"],
-                                env=env_vars + [
-                                    client.V1EnvVar(name="WORKDIR", value="/workspace")
-                                ],
-                                env_from=env_from if env_from else None,
-                                volume_mounts=[
-                                    client.V1VolumeMount(
-                                        name="workspace",
-                                        mount_path="/workspace"
-                                    ),
-                                    client.V1VolumeMount(
-                                        name="upload-script",
-                                        mount_path="/scripts"
-                                    )
-                                ]
-                            )
-                        ],
-                        # Shared volume for passing config between containers
-                        volumes=[
-                            client.V1Volume(
-                                name="workspace",
-                                empty_dir=client.V1EmptyDirVolumeSource()
-                            ),
-                            client.V1Volume(
-                                name="upload-script",
-                                config_map=client.V1ConfigMapVolumeSource(
-                                    name="upload-sidecar-script",
-                                    default_mode=0o755
-                                )
-                            )
-                        ]
+                        containers=containers,
+                        volumes=volumes or None
                     )
                 )
             )
@@ -376,6 +1334,7 @@ def start_kubernetes_job(config_s3_key: str, job_name: str, no_genbank: bool = F
             body=job,
             namespace=K8S_NAMESPACE
         )
+        job_informer.record_job(api_response)
 
         return {
             "success": True,
@@ -387,215 +1346,1765 @@ def start_kubernetes_job(config_s3_key: str, job_name: str, no_genbank: bool = F
         raise HTTPException(status_code=500, detail=f"Kubernetes job creation failed: {str(e)}")
 
 
-@app.get("/api/job-logs/{job_name}")
-async def get_job_logs(job_name: str, request: Request):
-    """Get logs from a Kubernetes job"""
+# Presigned download URLs, cached per object until close to expiry: (bucket, key) -> (url, expires_at)
+presigned_url_cache = {}
+presigned_url_cache_lock = threading.Lock()
+
+
+def presigned_download_url(bucket: str, s3_key: str) -> str:
+    """Return a presigned GET URL for an S3 object, reusing a cached one while it is still fresh"""
+    now = time.time()
+    cache_key = (bucket, s3_key)
+    with presigned_url_cache_lock:
+        cached = presigned_url_cache.get(cache_key)
+        if cached and cached[1] - now > S3_PRESIGNED_URL_REFRESH_MARGIN:
+            return cached[0]
+
+    url = s3_presign_client.generate_presigned_url(
+        'get_object',
+        Params={
+            'Bucket': bucket,
+            'Key': s3_key,
+            'ResponseContentDisposition': f'attachment; filename="{s3_key.split("/")[-1]}"'
+        },
+        ExpiresIn=S3_PRESIGNED_URL_EXPIRY
+    )
+
+    with presigned_url_cache_lock:
+        # Drop expired entries so the cache does not grow without bound
+        for key in [k for k, (_, expires_at) in presigned_url_cache.items() if expires_at <= now]:
+            del presigned_url_cache[key]
+        presigned_url_cache[cache_key] = (url, now + S3_PRESIGNED_URL_EXPIRY)
+    return url
+
+
+def result_file_url(bucket: str, s3_key: str) -> str:
+    """Get the download URL for a result file according to S3_DOWNLOAD_MODE"""
+    if S3_DOWNLOAD_MODE == 'presigned' and s3_presign_client:
+        return presigned_download_url(bucket, s3_key)
+    return f"{S3_PROXY_BASE_URL}/api/s3-proxy/{bucket}/{s3_key}"
+
+
+def result_file_entry(bucket: str, filename: str, s3_key: str) -> dict:
+    """Describe a result file for the frontend, with its download URL"""
+    file_entry = {
+        "filename": filename,
+        "url": result_file_url(bucket, s3_key),
+        "s3_key": s3_key
+    }
+
+    # For .jsonl.gz files, mark it for Taxonium (let frontend construct the URL)
+    if filename.endswith(".jsonl.gz"):
+        file_entry["is_taxonium"] = True
+
+    return file_entry
+
+
+def results_prefix_for_config(config_s3_key: str) -> str:
+    """The S3 prefix the upload sidecar will write results to for a config key"""
+    name = config_s3_key.replace('uploads/', '').replace('_config.toml', '').replace('.toml', '')
+    return f"results/{name}"
+
+
+# Result manifests by (bucket, prefix) -> {"etag", "manifest", "checked_at"}; finished manifests are not re-read
+result_manifests = OrderedDict()
+result_manifests_lock = threading.Lock()
+
+
+def read_results_manifest(bucket: str, prefix: str) -> Optional[dict]:
+    """Fetch the manifest.json of a build's results, revalidating the cached copy by ETag"""
+    key = (bucket, prefix)
+    with result_manifests_lock:
+        cached = result_manifests.get(key)
+    if cached and ((cached["manifest"] or {}).get("complete") or time.time() - cached["checked_at"] < RESULT_MANIFEST_RECHECK):
+        return cached["manifest"]
+
+    params = {"Bucket": bucket, "Key": f"{prefix}/{RESULT_MANIFEST_NAME}"}
+    if cached and cached["etag"]:
+        params["IfNoneMatch"] = cached["etag"]
     try:
-        # Load kubernetes config
-        try:
-            k8s_config.load_incluster_config()
-        except k8s_config.ConfigException:
-            k8s_config.load_kube_config()
+        response = s3_client.get_object(**params)
+        manifest = json.loads(response["Body"].read())
+        etag = response["ETag"]
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("304", "NotModified"):
+            manifest, etag = cached["manifest"], cached["etag"]
+        elif code in ("404", "NoSuchKey"):
+            manifest, etag = None, None  # Not written yet, or a build from before manifests
+        else:
+            raise
+
+    with result_manifests_lock:
+        result_manifests[key] = {"etag": etag, "manifest": manifest, "checked_at": time.time()}
+        result_manifests.move_to_end(key)
+        while len(result_manifests) > RESULT_MANIFEST_CACHE_MAX:
+            result_manifests.popitem(last=False)
+    return manifest
+
+
+def manifest_s3_results(manifest: dict) -> dict:
+    """Build the s3_results structure from a results manifest"""
+    file_urls = []
+    for f in manifest["files"]:
+        file_entry = result_file_entry(manifest["bucket"], f["filename"], f["s3_key"])
+        file_entry.update(size=f["size"], sha256=f["sha256"], content_type=f["content_type"], role=f["role"])
+        file_urls.append(file_entry)
+    return {
+        "bucket": manifest["bucket"],
+        "prefix": manifest["prefix"],
+        "total_files": len(file_urls),
+        "files": file_urls,
+        "upload_complete": manifest["complete"]
+    }
+
+
+result_cache_db = None
+result_cache_lock = threading.Lock()
+result_cache_settled = OrderedDict()  # Finished jobs whose outcome is already in the cache, oldest first
+
+
+def get_result_cache_db():
+    """Open the result cache database on first use; returns None if caching is unavailable"""
+    global result_cache_db, RESULT_CACHE_ENABLED
+    if not RESULT_CACHE_ENABLED:
+        return None
+    if result_cache_db is None:
+        with result_cache_lock:
+            if result_cache_db is not None:
+                return result_cache_db  # Opened by another thread while this one waited
+            try:
+                os.makedirs(os.path.dirname(RESULT_CACHE_DB) or '.', exist_ok=True)
+                db = sqlite3.connect(RESULT_CACHE_DB, check_same_thread=False)
+                db.execute("""
+                    CREATE TABLE IF NOT EXISTS result_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        job_name TEXT NOT NULL,
+                        bucket TEXT NOT NULL,
+                        results_prefix TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        files TEXT,
+                        created_at REAL NOT NULL,
+                        last_used_at REAL NOT NULL
+                    )
+                """)
+                db.execute("CREATE INDEX IF NOT EXISTS result_cache_job_name ON result_cache (job_name)")
+                db.execute("""
+                    CREATE TABLE IF NOT EXISTS build_lineage (
+                        job_name TEXT PRIMARY KEY,
+                        lineage_key TEXT NOT NULL,
+                        fingerprint TEXT NOT NULL,
+                        bucket TEXT NOT NULL,
+                        results_prefix TEXT NOT NULL,
+                        root_job TEXT NOT NULL,
+                        chain_length INTEGER NOT NULL,
+                        status TEXT NOT NULL,
+                        tree_key TEXT,
+                        tips INTEGER,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                db.execute("CREATE INDEX IF NOT EXISTS build_lineage_key ON build_lineage (lineage_key, created_at)")
+                db.commit()
+                result_cache_db = db
+            except (OSError, sqlite3.Error) as e:
+                print(f"Warning: Result cache disabled, could not open {RESULT_CACHE_DB}: {e}", file=sys.stderr)
+                RESULT_CACHE_ENABLED = False
+                return None
+    return result_cache_db
+
+
+def build_image() -> str:
+    """The image builds run in; local builds use the backend's own viral_usher, already named in the config"""
+    if RESULT_CACHE_BUILD_IMAGE:
+        return RESULT_CACHE_BUILD_IMAGE
+    return "" if JOB_EXECUTOR == "local" else (K8S_JOB_IMAGE or "")
+
+
+def build_cache_key(config_contents: dict, no_genbank: bool, use_update_mode: bool) -> str:
+    """Canonical hash of everything that determines a build's output.
+
+    Content-addressed inputs (cas/) already carry their hash in the config
+    URL. For inputs uploaded directly to uploads/ the object's ETag is
+    included so that a different file under a reused name misses. The
+    build image is included too, since builds run it rather than the
+    viral_usher installed in the backend.
+    """
+    inputs = {}
+    for name, value in config_contents.items():
+        if isinstance(value, str) and f"/{S3_BUCKET}/uploads/" in value:
+            s3_key = value.split(f"/{S3_BUCKET}/", 1)[1]
+            inputs[name] = s3_client.head_object(Bucket=S3_BUCKET, Key=s3_key)['ETag']
+
+    canonical = {
+        "config": {name: value for name, value in config_contents.items() if name != "workdir"},
+        "inputs": inputs,
+        "no_genbank": no_genbank,
+        "update": use_update_mode,
+        "build_image": build_image()
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def result_cache_lookup(cache_key: str, ttl: int = RESULT_CACHE_TTL) -> Optional[dict]:
+    """Find an entry (running or complete) for a build started within ttl seconds, marking it as recently used"""
+    db = get_result_cache_db()
+    if db is None:
+        return None
+    now = time.time()
+    with result_cache_lock:
+        # Other entries may be kept longer (see result_cache_add), so only this one is expired here
+        db.execute("DELETE FROM result_cache WHERE cache_key = ? AND created_at < ?", (cache_key, now - ttl))
+        row = db.execute(
+            "SELECT job_name, bucket, results_prefix, status, files FROM result_cache WHERE cache_key = ?",
+            (cache_key,)
+        ).fetchone()
+        if row:
+            db.execute("UPDATE result_cache SET last_used_at = ? WHERE cache_key = ?", (now, cache_key))
+        db.commit()
+    if not row:
+        return None
+    return {
+        "job_name": row[0],
+        "bucket": row[1],
+        "results_prefix": row[2],
+        "status": row[3],
+        "files": json.loads(row[4]) if row[4] else []
+    }
+
+
+def result_cache_add(cache_key: str, job_name: str, results_prefix: str):
+    """Record a newly launched build, evicting expired and least recently used entries"""
+    db = get_result_cache_db()
+    if db is None:
+        return
+    now = time.time()
+    with result_cache_lock:
+        db.execute(
+            "INSERT OR REPLACE INTO result_cache VALUES (?, ?, ?, ?, 'running', NULL, ?, ?)",
+            (cache_key, job_name, S3_BUCKET, results_prefix, now, now)
+        )
+        db.execute("DELETE FROM result_cache WHERE created_at < ?", (now - RESULT_CACHE_TTL,))
+        db.execute(
+            "DELETE FROM result_cache WHERE cache_key NOT IN "
+            "(SELECT cache_key FROM result_cache ORDER BY last_used_at DESC LIMIT ?)",
+            (RESULT_CACHE_MAX_ENTRIES,)
+        )
+        db.commit()
+
+
+def result_cache_complete(job_name: str, files: list):
+    """Store the file list of a successfully finished build"""
+    db = get_result_cache_db()
+    if db is None:
+        return
+    stored_files = [{"filename": f["filename"], "s3_key": f["s3_key"]} for f in files]
+    with result_cache_lock:
+        db.execute(
+            "UPDATE result_cache SET status = 'complete', files = ? WHERE job_name = ? AND status = 'running'",
+            (json.dumps(stored_files), job_name)
+        )
+        db.commit()
+
+
+def result_cache_discard(job_name: str):
+    """Forget a build that failed so the next identical submission runs again"""
+    db = get_result_cache_db()
+    if db is None:
+        return
+    with result_cache_lock:
+        db.execute("DELETE FROM result_cache WHERE job_name = ? AND status = 'running'", (job_name,))
+        db.commit()
+
+
+def result_cache_for_job(job_name: str) -> Optional[dict]:
+    """Find the completed cache entry created by a job, if any"""
+    db = get_result_cache_db()
+    if db is None:
+        return None
+    with result_cache_lock:
+        row = db.execute(
+            "SELECT bucket, results_prefix, files FROM result_cache WHERE job_name = ? AND status = 'complete'",
+            (job_name,)
+        ).fetchone()
+    if not row:
+        return None
+    return {"bucket": row[0], "results_prefix": row[1], "files": json.loads(row[2])}
+
+
+def cached_s3_results(bucket: str, results_prefix: str, files: list) -> dict:
+    """Build the s3_results structure for a cached build"""
+    file_urls = [result_file_entry(bucket, f["filename"], f["s3_key"]) for f in files]
+    return {
+        "bucket": bucket,
+        "prefix": results_prefix,
+        "total_files": len(file_urls),
+        "files": file_urls,
+        "upload_complete": True
+    }
+
+
+BUILD_LINEAGE_COLUMNS = (
+    "job_name", "lineage_key", "fingerprint", "bucket", "results_prefix", "root_job", "chain_length", "status",
+    "tree_key", "tips", "created_at"
+)
+
+
+def build_lineage_keys(config_contents: dict, no_genbank: bool) -> tuple:
+    """(lineage key, parameters fingerprint) for a build.
+
+    Builds share a lineage when they have the same taxid and reference, so one
+    can continue from another's tree. The fingerprint covers every other
+    config setting and input; a continued build must match its parent's.
+    """
+    reference = [config_contents.get(name, "") for name in ("refseq_acc", "refseq_assembly", "ref_fasta", "ref_gbff")]
+    lineage = json.dumps([config_contents.get("taxonomy_id", ""), no_genbank] + reference)
+    parameters = {name: value for name, value in config_contents.items() if name not in ("workdir", "update_tree_input")}
+    return (
+        hashlib.sha256(lineage.encode('utf-8')).hexdigest(),
+        hashlib.sha256(json.dumps(parameters, sort_keys=True).encode('utf-8')).hexdigest()
+    )
+
+
+def build_lineage_add(job_name: str, lineage_key: str, fingerprint: str, results_prefix: str, parent: Optional[dict]):
+    """Record a launched build under its lineage, as a full rebuild or continuing from parent"""
+    db = get_result_cache_db()
+    if db is None:
+        return
+    with result_cache_lock:
+        db.execute(
+            "INSERT OR REPLACE INTO build_lineage VALUES (?, ?, ?, ?, ?, ?, ?, 'running', NULL, NULL, ?)",
+            (job_name, lineage_key, fingerprint, S3_BUCKET, results_prefix,
+             parent["root_job"] if parent else job_name, parent["chain_length"] + 1 if parent else 0, time.time())
+        )
+        db.execute(
+            "DELETE FROM build_lineage WHERE lineage_key = ? AND job_name NOT IN "
+            "(SELECT job_name FROM build_lineage WHERE lineage_key = ? ORDER BY created_at DESC LIMIT ?)",
+            (lineage_key, lineage_key, BUILD_LINEAGE_KEEP)
+        )
+        db.commit()
 
-        core_v1 = client.CoreV1Api()
-        batch_v1 = client.BatchV1Api()
 
-        # Get the job to check its status
+def read_output_tips(bucket: str, s3_key: Optional[str]) -> Optional[int]:
+    """Tree tip count from a build's output_stats.tsv, or None if it is missing or unreadable"""
+    if not s3_key:
+        return None
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=s3_key)
+        encoding = response.get('ContentEncoding')
+        data = b"".join(iter_decoded_s3_body(response['Body'], encoding) if encoding else iter_s3_body(response['Body']))
+        header, values = data.decode('utf-8').splitlines()[:2]
+        return int(dict(zip(header.split('\t'), values.split('\t')))["tree_tip_count"])
+    except (ClientError, ValueError, KeyError) as e:
+        print(f"Could not read tree size from {s3_key}: {e}", file=sys.stderr)
+        return None
+
+
+def build_lineage_get(job_name: str) -> Optional[dict]:
+    """A lineage build as recorded, or None"""
+    db = get_result_cache_db()
+    if db is None:
+        return None
+    with result_cache_lock:
+        row = db.execute(
+            f"SELECT {', '.join(BUILD_LINEAGE_COLUMNS)} FROM build_lineage WHERE job_name = ?", (job_name,)
+        ).fetchone()
+    return dict(zip(BUILD_LINEAGE_COLUMNS, row)) if row else None
+
+
+def build_lineage_settle(build: dict):
+    """Store the outcome of a lineage build read from its results"""
+    db = get_result_cache_db()
+    with result_cache_lock:
+        db.execute(
+            "UPDATE build_lineage SET status = ?, tree_key = ?, tips = ? WHERE job_name = ?",
+            (build["status"], build["tree_key"], build["tips"], build["job_name"])
+        )
+        db.commit()
+
+
+def build_lineage_jobs(lineage_key: str) -> Optional[list]:
+    """Builds of a lineage, newest first, or None if build history is unavailable"""
+    db = get_result_cache_db()
+    if db is None:
+        return None
+    with result_cache_lock:
+        return [row[0] for row in db.execute(
+            "SELECT job_name FROM build_lineage WHERE lineage_key = ? ORDER BY created_at DESC", (lineage_key,)
+        )]
+
+
+async def build_lineage_row(job_name: str) -> Optional[dict]:
+    """A lineage build, checking an unfinished one against its results manifest first.
+
+    Builds are marked complete once their manifest is, so a tree can be
+    continued from whether or not anyone followed the build to the end.
+    """
+    build = await db_pool.run(build_lineage_get, job_name)
+    if build is None or build["status"] != "running":
+        return build
+
+    manifest = await s3_pool.run(read_results_manifest, build["bucket"], build["results_prefix"])
+    if not manifest or not manifest.get("complete"):
+        return build  # Still running, or failed
+    files = {f["filename"]: f["s3_key"] for f in manifest["files"]}
+    build["tree_key"] = files.get("optimized.pb.gz")
+    build["tips"] = await s3_pool.run(read_output_tips, build["bucket"], files.get("output_stats.tsv"))
+    build["status"] = "complete" if build["tree_key"] else "no_tree"
+    await db_pool.run(build_lineage_settle, build)
+    return build
+
+
+async def find_continuation(lineage_key: str, fingerprint: str) -> tuple:
+    """The build a new one should continue from, or None and why it needs a full rebuild instead"""
+    job_names = await db_pool.run(build_lineage_jobs, lineage_key)
+    if job_names is None:
+        return None, "Build history is unavailable"
+
+    latest = None
+    for job_name in job_names:
+        build = await build_lineage_row(job_name)
+        if build and build["status"] == "complete":
+            latest = build
+            break
+    if latest is None:
+        return None, "No earlier successful build of this taxid and reference"
+    if latest["fingerprint"] != fingerprint:
+        return None, "Build settings or inputs changed since the last build"
+    if latest["chain_length"] >= CONTINUE_MAX_CHAIN:
+        return None, f"Reached the limit of {CONTINUE_MAX_CHAIN} incremental builds since the last full rebuild"
+    root = latest if latest["root_job"] == latest["job_name"] else await build_lineage_row(latest["root_job"])
+    if root and root["tips"] and latest["tips"] and latest["tips"] > root["tips"] * (1 + CONTINUE_MAX_GROWTH):
+        growth = latest["tips"] / root["tips"] - 1
+        return None, f"Tree has grown by {growth:.0%} since the last full rebuild"
+    return latest, None
+
+
+def fasta_sequence_estimate(s3_key: str, size: int) -> int:
+    """Estimate how many sequences an uploaded FASTA holds from its first JOB_SIZING_SAMPLE_BYTES"""
+    response = s3_client.get_object(Bucket=S3_BUCKET, Key=s3_key, Range=f"bytes=0-{JOB_SIZING_SAMPLE_BYTES - 1}")
+    sample = response['Body'].read()
+    text = sample
+    try:
+        if sample[:2] == b'\x1f\x8b':
+            text = zlib.decompressobj(47).decompress(sample)
+        elif sample[:6] == b'\xfd7zXZ\x00':
+            text = lzma.LZMADecompressor().decompress(sample)
+    except (zlib.error, lzma.LZMAError):
+        return 0
+    count = text.count(b'\n>') + text.startswith(b'>')
+    if not sample or len(sample) >= size:
+        return count
+    # The compressed sample covers the same share of the file as of its sequences
+    return round(count * size / len(sample))
+
+
+def config_input_stats(config_contents: dict) -> dict:
+    """Sizes of the input files a config reads from this bucket, for queue priority and job sizing"""
+    stats = {"input_bytes": 0, "fasta_bytes": 0, "fasta_sequences": 0, "metadata_bytes": 0, "tree_bytes": 0}
+    for name, value in config_contents.items():
+        if isinstance(value, str) and f"/{S3_BUCKET}/" in value:
+            s3_key = value.split(f"/{S3_BUCKET}/", 1)[1]
+            if not s3_key.startswith(("uploads/", "cas/")):
+                continue
+            size = s3_client.head_object(Bucket=S3_BUCKET, Key=s3_key)['ContentLength']
+            stats["input_bytes"] += size
+            if name == "extra_fasta":
+                stats["fasta_bytes"] = size
+                stats["fasta_sequences"] = fasta_sequence_estimate(s3_key, size)
+            elif name == "extra_metadata":
+                stats["metadata_bytes"] = size
+            elif name == "update_tree_input":
+                stats["tree_bytes"] = size
+    return stats
+
+
+def request_user(request: Request) -> str:
+    """Who a submission counts against for the per-user job limit.
+
+    Only JOB_USER_HEADER (set by a trusted proxy) and the connection's
+    address are used. X-Forwarded-For is left to uvicorn, which applies it
+    only for proxies listed in FORWARDED_ALLOW_IPS, since clients can send
+    any value and would otherwise get around the per-user limit.
+    """
+    if JOB_USER_HEADER and request.headers.get(JOB_USER_HEADER):
+        return request.headers[JOB_USER_HEADER]
+    return request.client.host if request.client else "unknown"
+
+
+def observed_job_usage(job_name: str) -> Optional[dict]:
+    """Outcome and resource usage of a finished build, from its last pod and the usage line it logged"""
+    found = job_informer.lookup(job_name)
+    if not found or not found[1]:
+        return None
+    job, pods = found
+    pod = pods[-1]
+    usage = {"outcome": "succeeded" if job.status and job.status.succeeded else "failed"}
+    for status in (pod.status.container_statuses or []):
+        terminated = status.state.terminated if status.name == "viral-usher" and status.state else None
+        if terminated:
+            if terminated.reason == "OOMKilled":
+                usage["outcome"] = "oom_killed"
+            if terminated.started_at and terminated.finished_at:
+                usage["wall_seconds"] = (terminated.finished_at - terminated.started_at).total_seconds()
+    try:
+        tail = k8s.core_v1.read_namespaced_pod_log(
+            name=pod.metadata.name, namespace=K8S_NAMESPACE, container="viral-usher", tail_lines=20
+        )
+    except client.exceptions.ApiException:
+        return usage
+    match = JOB_USAGE_PATTERN.search(tail or "")
+    if match:
+        if match.group(1):
+            usage["peak_memory_bytes"] = int(match.group(1))
+        if match.group(2):
+            usage["cpu_seconds"] = int(match.group(2)) / 1e6
+    return usage
+
+
+class JobExecutor(ABC):
+    """Where released builds run, selected by JOB_EXECUTOR.
+
+    The job queue hands each build to start() (or, for executors that lease,
+    lets workers take it), asks is_running() whether it still occupies
+    capacity and usage() what it used once finished. read_job_logs asks
+    read_status() for its status, logs and results.
+    """
+
+    leases = False  # Workers take builds through JobQueue.lease instead of start()
+    max_running = None  # Builds this executor can run at once, if below JOB_MAX_RUNNING
+
+    async def startup(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+    @abstractmethod
+    async def start(self, job_name: str, config_s3_key: str, no_genbank: bool, use_update_mode: bool,
+                    inputs: dict, estimate: Optional[dict]):
+        """Launch a released build"""
+
+    @abstractmethod
+    def is_running(self, job_name: str) -> bool:
+        """Whether a started build still occupies capacity"""
+
+    async def usage(self, job_name: str) -> Optional[dict]:
+        return None
+
+    @abstractmethod
+    async def read_status(self, job_name: str, log_pod: Optional[str], main_offset: int, upload_offset: int) -> dict:
+        """Status, logs and results of a build, in the /api/job-logs shape"""
+
+
+class KubernetesExecutor(JobExecutor):
+    """A Kubernetes Job per build (start_kubernetes_job), followed through the watched Job table"""
+
+    async def startup(self):
         try:
-            job = batch_v1.read_namespaced_job(name=job_name, namespace=K8S_NAMESPACE)
-        except client.exceptions.ApiException as e:
-            if e.status == 404:
-                # Job doesn't exist yet or was deleted
-                return {
-                    "job_name": job_name,
-                    "status": "not_found",
-                    "logs": "Job not found. It may not have been created yet or has been deleted."
-                }
-            raise HTTPException(status_code=500, detail=f"Error reading job: {str(e)}")
+            await k8s_pool.run(k8s.connect)
+            job_informer.start()
+            if K8S_UPLOAD_SCRIPT_CONFIGMAP:
+                await k8s_pool.run(ensure_upload_script_configmap)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error reading job: {str(e)}")
+            # Not fatal: the backend can run without a cluster, and both are retried on first use
+            print(f"Warning: Kubernetes setup not completed at startup: {e}", file=sys.stderr)
 
-        # Get pods for this job
-        pods = core_v1.list_namespaced_pod(
-            namespace=K8S_NAMESPACE,
-            label_selector=f"job-name={job_name}"
-        )
+    def shutdown(self):
+        job_informer.stop()
+        k8s.close()
 
-        if not pods.items:
-            return {
-                "job_name": job_name,
-                "status": "pending",
-                "logs": "No pods found yet for this job"
+    async def start(self, job_name, config_s3_key, no_genbank, use_update_mode, inputs, estimate):
+        await k8s_pool.run(start_kubernetes_job, config_s3_key, job_name, no_genbank, use_update_mode, inputs, estimate)
+
+    def is_running(self, job_name):
+        if not all(event.is_set() for event in job_informer.synced.values()):
+            return True  # Cannot tell yet; assume it is still running
+        with job_informer.lock:
+            job = job_informer.jobs.get(job_name)
+        return job is not None and not (job.status and (job.status.succeeded or job.status.failed))
+
+    async def usage(self, job_name):
+        return await k8s_pool.run(observed_job_usage, job_name)
+
+    async def read_status(self, job_name, log_pod, main_offset, upload_offset):
+        return await read_kubernetes_job(job_name, log_pod, main_offset, upload_offset)
+
+
+class WorkerPoolExecutor(JobExecutor):
+    """Long-lived build_worker.py processes that lease builds from the queue and report back to it"""
+
+    leases = True
+
+    async def start(self, job_name, config_s3_key, no_genbank, use_update_mode, inputs, estimate):
+        raise RuntimeError("Worker builds are leased through JobQueue.lease, not started")
+
+    def is_running(self, job_name):
+        build = job_queue.worker_build(job_name)
+        return build is not None and build["status"] == 'running'
+
+    async def usage(self, job_name):
+        build = await db_pool.run(job_queue.worker_build, job_name)
+        return {"outcome": build["status"], **(build["usage"] or {})} if build else None
+
+    async def read_status(self, job_name, log_pod, main_offset, upload_offset):
+        build = await db_pool.run(job_queue.worker_build, job_name)
+        if build is None:
+            return await job_not_found(job_name)
+        return await read_worker_build(job_name, build, log_pod, main_offset)
+
+
+class LocalExecutor(JobExecutor):
+    """Builds run as subprocesses of the backend, for hosts without Kubernetes.
+
+    Each build gets a directory under LOCAL_JOBS_DIR holding its workspace and
+    its build and upload logs. upload_sidecar.py runs next to the build as it
+    would in a Job pod, so results and the manifest are uploaded the same
+    way. The workspace is removed when the build finishes; the logs and
+    outcome (status.json) are kept for LOCAL_JOB_RETENTION.
+    """
+
+    max_running = LOCAL_MAX_JOBS
+
+    def __init__(self):
+        self.running = set()
+        self.lock = threading.Lock()
+
+    async def startup(self):
+        os.makedirs(LOCAL_JOBS_DIR, exist_ok=True)
+        self._prune()
+
+    def _prune(self):
+        """Remove the directories of builds that finished more than LOCAL_JOB_RETENTION ago"""
+        cutoff = time.time() - LOCAL_JOB_RETENTION
+        for name in os.listdir(LOCAL_JOBS_DIR):
+            path = os.path.join(LOCAL_JOBS_DIR, name)
+            if not self.is_running(name) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _path(self, job_name: str, *parts) -> str:
+        return os.path.join(LOCAL_JOBS_DIR, job_name, *parts)
+
+    async def start(self, job_name, config_s3_key, no_genbank, use_update_mode, inputs, estimate):
+        try:
+            self._prune()
+            os.makedirs(self._path(job_name, "workspace"), exist_ok=True)
+            with open(self._path(job_name, "job.json"), "w") as f:
+                json.dump({"config_s3_key": config_s3_key, "results_prefix": results_prefix_for_config(config_s3_key),
+                           "started_at": time.time()}, f)
+        except OSError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create local build directory: {str(e)}")
+        with self.lock:
+            self.running.add(job_name)
+        threading.Thread(
+            target=self._run, args=(job_name, config_s3_key, no_genbank, use_update_mode, estimate),
+            name=f"build-{job_name}", daemon=True
+        ).start()
+
+    def _run(self, job_name: str, config_s3_key: str, no_genbank: bool, use_update_mode: bool, estimate: Optional[dict]):
+        """Run one build and its uploader to completion, then record the outcome"""
+        workspace = self._path(job_name, "workspace")
+        command = ["viral_usher_build", "--config", s3_object_url(config_s3_key)]
+        if no_genbank:
+            command.append("--no_genbank")
+        if use_update_mode:
+            command.append("--update")
+        if estimate and JOB_BUILD_THREADS:
+            command += ["--threads", str(estimate["threads"])]
+        env = dict(os.environ, CONFIG_S3_KEY=config_s3_key, WORKDIR=workspace)
+        if ARTIFACT_CACHE_DIR:
+            env.update(artifact_cache_env(ARTIFACT_CACHE_DIR))
+            command[0] = ARTIFACT_CACHE_BUILD_COMMAND
+        upload_script = os.path.join(os.path.dirname(__file__), "..", "upload_sidecar.py")
+        outcome = {"status": "failed"}
+        started = time.time()
+        try:
+            with open(self._path(job_name, "main.log"), "wb") as main_log, \
+                    open(self._path(job_name, "upload.log"), "wb") as upload_log:
+                build = subprocess.Popen(command, cwd=workspace, env=env, stdout=main_log, stderr=subprocess.STDOUT)
+                try:
+                    uploader = subprocess.Popen([sys.executable, upload_script], env=env,
+                                                stdout=upload_log, stderr=subprocess.STDOUT)
+                except OSError:
+                    build.kill()
+                    build.wait()
+                    raise
+                # wait4 gives this build's own peak memory and CPU time, including the tools it ran
+                _, wait_status, rusage = os.wait4(build.pid, 0)
+                build.returncode = exit_code = os.waitstatus_to_exitcode(wait_status)
+                if exit_code == 0:
+                    open(os.path.join(workspace, ".job_complete"), "w").close()
+                else:
+                    uploader.terminate()
+                upload_exit_code = uploader.wait()
+            outcome = {
+                "status": "succeeded" if exit_code == 0 and upload_exit_code == 0 else "failed",
+                "exit_code": exit_code,
+                "upload_exit_code": upload_exit_code,
+                "usage": {
+                    "peak_memory_bytes": rusage.ru_maxrss * 1024,
+                    "cpu_seconds": rusage.ru_utime + rusage.ru_stime,
+                    "wall_seconds": time.time() - started,
+                },
             }
+        except Exception as e:
+            outcome["error"] = str(e)
+            print(f"Error running local build {job_name}: {e}", file=sys.stderr)
+        finally:
+            outcome["finished_at"] = time.time()
+            status_path = self._path(job_name, "status.json")
+            with open(status_path + ".tmp", "w") as f:
+                json.dump(outcome, f)
+            os.replace(status_path + ".tmp", status_path)
+            shutil.rmtree(workspace, ignore_errors=True)
+            with self.lock:
+                self.running.discard(job_name)
+
+    def _outcome(self, job_name: str) -> Optional[dict]:
+        try:
+            with open(self._path(job_name, "status.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
 
-        # Get the most recent pod
-        pod = pods.items[-1]
-        pod_name = pod.metadata.name
+    def is_running(self, job_name):
+        with self.lock:
+            return job_name in self.running
 
-        # Determine job status
-        job_status = "running"
-        if job.status.succeeded:
-            job_status = "succeeded"
-        elif job.status.failed:
-            job_status = "failed"
+    async def usage(self, job_name):
+        outcome = self._outcome(job_name)
+        return {"outcome": outcome["status"], **outcome.get("usage", {})} if outcome else None
+
+    async def read_status(self, job_name, log_pod, main_offset, upload_offset):
+        try:
+            with open(self._path(job_name, "job.json")) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return await job_not_found(job_name)
 
-        # Get logs from all containers
         logs = {}
+        if self.is_running(job_name):
+            job_status = "running"
+        else:
+            outcome = self._outcome(job_name)
+            job_status = outcome["status"] if outcome else "failed"
+            if outcome is None:
+                logs["info"] = "The build was interrupted by a backend restart."
+            elif outcome.get("error"):
+                logs["info"] = f"The build could not be run: {outcome['error']}"
+
+        # Offsets are byte positions in the log files
+        pod_name = f"local/{job_name}"
+        requested = {"main": main_offset, "upload": upload_offset} if log_pod == pod_name else {}
+        log_starts = {}
+        log_offsets = {}
+        for name in ("main", "upload"):
+            try:
+                with open(self._path(job_name, f"{name}.log"), "rb") as f:
+                    size = os.fstat(f.fileno()).st_size
+                    start = requested.get(name, 0)
+                    if not 0 <= start <= size:
+                        start = 0
+                    f.seek(start)
+                    data = f.read(size - start)
+            except OSError:
+                continue
+            logs[name] = data.decode("utf-8", errors="replace")
+            log_starts[name] = start
+            log_offsets[name] = start + len(data)
+
+        return {
+            "job_name": job_name,
+            "status": job_status,
+            "pod_name": pod_name,
+            "logs": logs,
+            "log_starts": log_starts,
+            "log_offsets": log_offsets,
+            "s3_results": await job_s3_results(job_name, job_status, job["results_prefix"])
+        }
 
-        # Check pod phase to provide better messages
-        pod_phase = pod.status.phase
-        if pod_phase in ["Pending"]:
-            logs["info"] = f"Pod is in {pod_phase} phase. Containers have not started yet."
-            # Try to get more details about why it's pending
-            if pod.status.conditions:
-                for condition in pod.status.conditions:
-                    if condition.status == "False":
-                        logs["info"] += f" {condition.reason}: {condition.message}"
-
-        # Get main container logs (viral-usher)
+
+JOB_EXECUTORS = {"kubernetes": KubernetesExecutor, "workers": WorkerPoolExecutor, "local": LocalExecutor}
+if JOB_EXECUTOR not in JOB_EXECUTORS:
+    raise ValueError(f"Unknown JOB_EXECUTOR {JOB_EXECUTOR!r}; expected one of {', '.join(JOB_EXECUTORS)}")
+job_executor = JOB_EXECUTORS[JOB_EXECUTOR]()
+
+
+class JobQueue:
+    """Persistent admission queue in front of start_kubernetes_job.
+
+    Submissions are released as capacity frees up, within a global and a
+    per-user cap on running jobs. Small submissions go ahead of large ones
+    (by input size), large ones are promoted after JOB_PRIORITY_AGING so
+    they cannot starve, and order is FIFO within a priority.
+
+    Released jobs are sized by estimate_job_resources, and the estimate is
+    kept in job_usage alongside what the build actually used, so the
+    JOB_SIZING model can be recalibrated from real runs.
+    """
+
+    def __init__(self, db_path: str):
+        self.wakeup = asyncio.Event()
+        self.dispatch_lock = asyncio.Lock()
+        self.lock = threading.Lock()  # The database is used from db_pool threads
         try:
-            main_logs = core_v1.read_namespaced_pod_log(
-                name=pod_name,
-                namespace=K8S_NAMESPACE,
-                container="viral-usher"
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: Job queue is in-memory only, could not open {db_path}: {e}", file=sys.stderr)
+            self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS job_queue (
+                job_name TEXT PRIMARY KEY,
+                user TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                input_bytes INTEGER NOT NULL,
+                config_s3_key TEXT NOT NULL,
+                no_genbank INTEGER NOT NULL,
+                use_update_mode INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                submitted_at REAL NOT NULL,
+                started_at REAL,
+                inputs TEXT
             )
-            logs["main"] = main_logs
-        except client.exceptions.ApiException as e:
-            if e.status == 400 and "ContainerCreating" in str(e):
-                logs["main"] = "Main container is being created..."
-            elif e.status == 400:
-                logs["main"] = "Main container has not started yet"
+        """)
+        try:
+            self.db.execute("ALTER TABLE job_queue ADD COLUMN inputs TEXT")  # Queues created before job sizing
+        except sqlite3.OperationalError:
+            pass
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS worker_builds (
+                job_name TEXT PRIMARY KEY,
+                worker TEXT NOT NULL,
+                attempt INTEGER NOT NULL,
+                results_prefix TEXT NOT NULL,
+                status TEXT NOT NULL,
+                log TEXT NOT NULL,
+                exit_code INTEGER,
+                usage TEXT,
+                lease_expires REAL NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS job_usage (
+                job_name TEXT PRIMARY KEY,
+                use_update_mode INTEGER NOT NULL,
+                inputs TEXT NOT NULL,
+                estimate TEXT,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                outcome TEXT,
+                peak_memory_bytes INTEGER,
+                cpu_seconds REAL,
+                wall_seconds REAL
+            )
+        """)
+        self.db.commit()
+
+    def _queued(self) -> list:
+        """Waiting submissions in release order"""
+        rows = self.db.execute(
+            "SELECT job_name, user, priority, submitted_at FROM job_queue WHERE status = 'queued'"
+        ).fetchall()
+        now = time.time()
+
+        def rank(row):
+            job_name, user, priority, submitted_at = row
+            if now - submitted_at >= JOB_PRIORITY_AGING:
+                priority = 0
+            return priority, submitted_at
+
+        return sorted(rows, key=rank)
+
+    def status(self, job_name: str) -> Optional[dict]:
+        """Queue state of a submission, or None once it has been released and finished"""
+        with self.lock:
+            row = self.db.execute("SELECT status, error FROM job_queue WHERE job_name = ?", (job_name,)).fetchone()
+            if row is None:
+                return None
+            status, error = row
+            if status != "queued":
+                return {"status": status, "error": error}
+            queued = [r[0] for r in self._queued()]
+        return {"status": status, "position": queued.index(job_name) + 1, "length": len(queued)}
+
+    def _add(self, job_name: str, user: str, inputs: dict, config_s3_key: str, no_genbank: bool, use_update_mode: bool):
+        priority = 0 if inputs["input_bytes"] < JOB_SMALL_INPUT_BYTES else 1
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO job_queue (job_name, user, priority, input_bytes, config_s3_key, no_genbank, use_update_mode, status, submitted_at, inputs) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_name, user, priority, inputs["input_bytes"], config_s3_key, int(no_genbank), int(use_update_mode),
+                 time.time(), json.dumps(inputs))
+            )
+            self.db.commit()
+
+    async def submit(self, job_name: str, user: str, inputs: dict, config_s3_key: str,
+                     no_genbank: bool, use_update_mode: bool) -> dict:
+        """Queue a build (inputs from config_input_stats) and release whatever fits now; returns job_info for the response"""
+        await db_pool.run(self._add, job_name, user, inputs, config_s3_key, no_genbank, use_update_mode)
+        await self.dispatch()
+
+        state = await db_pool.run(self.status, job_name)
+        if state and state["status"] == "failed":
+            return {"success": False, "error": state["error"]}
+        job_info = {"success": True, "job_name": job_name, "namespace": K8S_NAMESPACE}
+        if state and state["status"] == "queued":
+            job_info.update(queued=True, queue_position=state["position"])
+        return job_info
+
+    def _expire_leases(self):
+        """Requeue builds whose worker stopped reporting, or fail them after WORKER_MAX_ATTEMPTS"""
+        now = time.time()
+        expired = self.db.execute(
+            "SELECT job_name, attempt FROM worker_builds WHERE status = 'running' AND lease_expires < ?", (now,)
+        ).fetchall()
+        for job_name, attempt in expired:
+            if attempt < WORKER_MAX_ATTEMPTS:
+                self.db.execute("UPDATE worker_builds SET status = 'lost' WHERE job_name = ?", (job_name,))
+                self.db.execute("UPDATE job_queue SET status = 'queued' WHERE job_name = ?", (job_name,))
+            else:
+                self.db.execute(
+                    "UPDATE worker_builds SET status = 'failed', finished_at = ?, log = log || ? WHERE job_name = ?",
+                    (now, f"\nWorker stopped responding; giving up after {attempt} attempts\n", job_name)
+                )
+        self.db.execute(
+            "DELETE FROM worker_builds WHERE finished_at < ?", (now - WORKER_BUILD_RETENTION,)
+        )
+
+    def _released(self) -> list:
+        """Released submissions as (job_name, user), after expiring lost leases and old failures"""
+        with self.lock:
+            if job_executor.leases:
+                self._expire_leases()
+            # Submissions that could not be started are kept a day so their status can be reported
+            self.db.execute("DELETE FROM job_queue WHERE status = 'failed' AND submitted_at < ?", (time.time() - 86400,))
+            self.db.commit()
+            return self.db.execute("SELECT job_name, user FROM job_queue WHERE status = 'started'").fetchall()
+
+    async def _release_finished(self) -> dict:
+        """Drop finished jobs from the queue and count the running ones per user"""
+        running = {}
+        for job_name, user in await db_pool.run(self._released):
+            if await db_pool.run(job_executor.is_running, job_name):
+                running[user] = running.get(user, 0) + 1
+            else:
+                await self._record_usage(job_name)
+        return running
+
+    def _next_release(self, running: dict) -> Optional[tuple]:
+        """The first queued submission that fits within the caps, or None; callers count each one they start"""
+        max_running = min(JOB_MAX_RUNNING, job_executor.max_running or JOB_MAX_RUNNING)
+        if sum(running.values()) >= max_running:
+            return None
+        with self.lock:
+            for job_name, user, _, _ in self._queued():
+                if running.get(user, 0) >= JOB_MAX_RUNNING_PER_USER:
+                    continue
+                config_s3_key, no_genbank, use_update_mode, inputs = self.db.execute(
+                    "SELECT config_s3_key, no_genbank, use_update_mode, inputs FROM job_queue WHERE job_name = ?", (job_name,)
+                ).fetchone()
+                break
+            else:
+                return None
+        inputs = json.loads(inputs) if inputs else {}
+        estimate = estimate_job_resources(inputs, bool(use_update_mode)) if JOB_SIZING_ENABLED else None
+        return job_name, user, config_s3_key, bool(no_genbank), bool(use_update_mode), inputs, estimate
+
+    def _mark_started(self, job_name: str, use_update_mode: bool, inputs: dict, estimate: Optional[dict]):
+        self.db.execute("UPDATE job_queue SET status = 'started', started_at = ? WHERE job_name = ?", (time.time(), job_name))
+        self.db.execute(
+            "INSERT OR REPLACE INTO job_usage (job_name, use_update_mode, inputs, estimate, started_at) VALUES (?, ?, ?, ?, ?)",
+            (job_name, int(use_update_mode), json.dumps(inputs), json.dumps(estimate) if estimate else None, time.time())
+        )
+        self.db.commit()
+
+    def _record_start(self, job_name: str, use_update_mode: bool, inputs: dict, estimate: Optional[dict]):
+        with self.lock:
+            self._mark_started(job_name, use_update_mode, inputs, estimate)
+
+    def _start_failed(self, job_name: str, error: str):
+        with self.lock:
+            self.db.execute("UPDATE job_queue SET status = 'failed', error = ? WHERE job_name = ?", (error, job_name))
+            self.db.commit()
+
+    async def dispatch(self):
+        """Release queued submissions while there is capacity"""
+        async with self.dispatch_lock:
+            running = await self._release_finished()
+            if job_executor.leases:
+                return  # Workers take builds themselves through lease()
+
+            while True:
+                release = await db_pool.run(self._next_release, running)
+                if release is None:
+                    break
+                job_name, user, config_s3_key, no_genbank, use_update_mode, inputs, estimate = release
+                try:
+                    await job_executor.start(job_name, config_s3_key, no_genbank, use_update_mode, inputs, estimate)
+                except HTTPException as e:
+                    await db_pool.run(self._start_failed, job_name, str(e.detail))
+                    await db_pool.run(result_cache_discard, job_name)
+                    continue
+                await db_pool.run(self._record_start, job_name, use_update_mode, inputs, estimate)
+                running[user] = running.get(user, 0) + 1
+
+    def _leased(self, worker: str, job_name: str, config_s3_key: str, use_update_mode: bool,
+                inputs: dict, estimate: Optional[dict]) -> int:
+        """Record a worker's lease on a build; returns the attempt number"""
+        with self.lock:
+            previous = self.db.execute("SELECT attempt FROM worker_builds WHERE job_name = ?", (job_name,)).fetchone()
+            attempt = previous[0] + 1 if previous else 1
+            now = time.time()
+            self.db.execute(
+                "INSERT OR REPLACE INTO worker_builds (job_name, worker, attempt, results_prefix, status, log, lease_expires, started_at) "
+                "VALUES (?, ?, ?, ?, 'running', '', ?, ?)",
+                (job_name, worker, attempt, results_prefix_for_config(config_s3_key), now + WORKER_LEASE_SECONDS, now)
+            )
+            self._mark_started(job_name, use_update_mode, inputs, estimate)
+        return attempt
+
+    async def lease(self, worker: str) -> Optional[dict]:
+        """Hand the next releasable build to a worker, or None if nothing fits"""
+        if not job_executor.leases:
+            return None  # dispatch() starts builds instead
+        async with self.dispatch_lock:
+            running = await self._release_finished()
+            release = await db_pool.run(self._next_release, running)
+            if release is None:
+                return None
+            job_name, user, config_s3_key, no_genbank, use_update_mode, inputs, estimate = release
+            attempt = await db_pool.run(self._leased, worker, job_name, config_s3_key, use_update_mode, inputs, estimate)
+            return {
+                "job_name": job_name,
+                "attempt": attempt,
+                "config_url": s3_object_url(config_s3_key),
+                "config_s3_key": config_s3_key,
+                "results_prefix": results_prefix_for_config(config_s3_key),
+                "no_genbank": no_genbank,
+                "update": use_update_mode,
+                "threads": estimate["threads"] if estimate and JOB_BUILD_THREADS else None,
+                "lease_seconds": WORKER_LEASE_SECONDS,
+            }
+
+    def _store_report(self, job_name: str, report: WorkerReport) -> bool:
+        with self.lock:
+            row = self.db.execute("SELECT worker, status, length(log) FROM worker_builds WHERE job_name = ?", (job_name,)).fetchone()
+            if row is None or row[0] != report.worker or row[1] != 'running':
+                return False
+            log = report.log
+            room = WORKER_LOG_MAX_CHARS - row[2]
+            if len(log) > room:
+                log = log[:max(room, 0)] + ("\n[log truncated]\n" if room > 0 else "")
+            now = time.time()
+            if report.exit_code is None:
+                self.db.execute(
+                    "UPDATE worker_builds SET log = log || ?, lease_expires = ? WHERE job_name = ?",
+                    (log, now + WORKER_LEASE_SECONDS, job_name)
+                )
             else:
-                logs["main"] = f"Could not get main container logs: {str(e)}"
+                status = 'succeeded' if report.exit_code == 0 else 'failed'
+                self.db.execute(
+                    "UPDATE worker_builds SET log = log || ?, status = ?, exit_code = ?, usage = ?, finished_at = ? WHERE job_name = ?",
+                    (log, status, report.exit_code, json.dumps(report.usage or {}), now, job_name)
+                )
+            self.db.commit()
+        return True
+
+    async def report(self, job_name: str, report: WorkerReport) -> bool:
+        """Append a worker's log output and renew its lease, or record the outcome; False if the lease was lost"""
+        if not await db_pool.run(self._store_report, job_name, report):
+            return False
+        if report.exit_code is not None:
+            self.wakeup.set()
+        return True
+
+    def worker_build(self, job_name: str) -> Optional[dict]:
+        """A build's worker, attempt, status and log, if a worker has leased it"""
+        columns = ("worker", "attempt", "results_prefix", "status", "log", "usage", "started_at", "finished_at")
+        with self.lock:
+            row = self.db.execute(
+                f"SELECT {', '.join(columns)} FROM worker_builds WHERE job_name = ?", (job_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        build = dict(zip(columns, row))
+        build["usage"] = json.loads(build["usage"]) if build["usage"] else None
+        return build
+
+    def _finished(self, job_name: str, usage: dict):
+        """Drop a finished build from the queue, storing what it used next to its estimate"""
+        with self.lock:
+            self.db.execute(
+                "UPDATE job_usage SET finished_at = ?, outcome = ?, peak_memory_bytes = ?, cpu_seconds = ?, wall_seconds = ? "
+                "WHERE job_name = ?",
+                (time.time(), usage["outcome"], usage.get("peak_memory_bytes"), usage.get("cpu_seconds"),
+                 usage.get("wall_seconds"), job_name)
+            )
+            self.db.execute(
+                "DELETE FROM job_usage WHERE job_name NOT IN (SELECT job_name FROM job_usage ORDER BY started_at DESC LIMIT ?)",
+                (JOB_USAGE_MAX_RECORDS,)
+            )
+            self.db.execute("DELETE FROM job_queue WHERE job_name = ?", (job_name,))
+            self.db.commit()
+
+    async def _record_usage(self, job_name: str):
+        """Store what a finished build used and release its place in the queue"""
+        try:
+            usage = await job_executor.usage(job_name)
         except Exception as e:
-            logs["main"] = f"Could not get main container logs: {str(e)}"
+            print(f"Warning: Could not read resource usage of {job_name}: {e}", file=sys.stderr)
+            usage = None
+        await db_pool.run(self._finished, job_name, usage or {"outcome": "unknown"})
+
+    def usage_records(self, limit: int) -> list:
+        """Most recent builds with their inputs, estimate and observed usage"""
+        columns = ("job_name", "use_update_mode", "inputs", "estimate", "started_at", "finished_at",
+                   "outcome", "peak_memory_bytes", "cpu_seconds", "wall_seconds")
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {', '.join(columns)} FROM job_usage ORDER BY started_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        records = []
+        for row in rows:
+            record = dict(zip(columns, row))
+            record["use_update_mode"] = bool(record["use_update_mode"])
+            record["inputs"] = json.loads(record["inputs"])
+            record["estimate"] = json.loads(record["estimate"]) if record["estimate"] else None
+            records.append(record)
+        return records
+
+    async def run(self):
+        """Release queued jobs as running ones finish"""
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), JOB_QUEUE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.dispatch()
+            except Exception as e:
+                print(f"Error dispatching queued jobs: {e}", file=sys.stderr)
+
+
+job_queue = JobQueue(JOB_QUEUE_DB)
+
+
+def container_waiting_message(pod, container: str, label: str) -> Optional[str]:
+    """Explain why a container has no log yet, from the pod status alone"""
+    for status in (pod.status.container_statuses or []):
+        if status.name == container and status.state and status.state.waiting:
+            if status.state.waiting.reason == "ContainerCreating":
+                return f"{label} is being created..."
+            return f"{label} has not started yet"
+    if pod.status.phase == "Pending":  # No container has started yet
+        return f"{label} has not started yet"
+    return None
+
+
+def container_terminated(pod, container: str) -> bool:
+    """Whether the container has exited, so its log will not grow any further"""
+    for status in (pod.status.container_statuses or []):
+        if status.name == container:
+            return bool(status.state and status.state.terminated)
+    return False
+
+
+LOG_TIMESTAMP = re.compile(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(\.\d+)?Z")
+
+
+def log_timestamp_key(timestamp: str) -> str:
+    """Make an RFC3339Nano log timestamp sortable as a string (kubelet trims trailing zeros from the fraction)"""
+    whole, _, fraction = timestamp.rstrip("Z").partition(".")
+    return f"{whole}.{fraction.ljust(9, '0')}"
+
+
+class ContainerLog:
+    """Log of one container, read incrementally and parsed for upload markers as it grows.
+
+    Each read asks only for output since the last line held, using timestamped
+    logs to drop the overlap, so the cost of a poll depends on new output and
+    not on the length of the whole log.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.last_key = None  # Sortable timestamp of the last line held
+        self.last_epoch = None
+        self.lines_at_last_key = 0
+        self.fetched_at = 0.0
+        self.finished = False
+        self.lock = asyncio.Lock()
+        # Upload markers seen so far
+        self.files = []  # (bucket, filename, s3_key)
+        self.seen_keys = set()
+        self.bucket = None
+        self.prefix = None
+        self.upload_complete = False
+        self.batch_output = None  # Old-style single block of output, for backwards compatibility
+
+    def append(self, raw: str):
+        """Add the lines of a timestamped log read that are not already held"""
+        previous_key, previous_count = self.last_key, self.lines_at_last_key
+        duplicates = 0
+        new_lines = []
+        keep = True  # Whether the line being continued was new
+        # Only "\n" ends a line: progress output rewrites itself with "\r"
+        for line in re.findall(r"[^\n]*\n|[^\n]+\Z", raw):
+            timestamp, _, content = line.partition(" ")
+            if not LOG_TIMESTAMP.fullmatch(timestamp):
+                # Not a line the kubelet stamped, so it belongs with the one before
+                if keep:
+                    new_lines.append(line)
+                continue
+            key = log_timestamp_key(timestamp)
+            keep = False
+            if previous_key is not None and key < previous_key:
+                continue
+            if key == previous_key and duplicates < previous_count:
+                duplicates += 1
+                continue
+            keep = True
+            if key == self.last_key:
+                self.lines_at_last_key += 1
+            else:
+                self.last_key, self.lines_at_last_key = key, 1
+                whole = timestamp.partition(".")[0].rstrip("Z")
+                self.last_epoch = datetime.strptime(whole, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+            new_lines.append(content)
+
+        chunk = "".join(new_lines)
+        self.text += chunk
+        self._parse(chunk)
+
+    def _parse(self, chunk: str):
+        """Pick up upload markers from newly added output"""
+        # Find all incremental file uploads (a file re-uploaded after changing is listed once)
+        for match in re.finditer(r'__S3_FILE_UPLOADED__(.+?)__S3_FILE_END__', chunk):
+            try:
+                file_info = json.loads(match.group(1))
+                if file_info["s3_key"] in self.seen_keys:
+                    continue
+                self.seen_keys.add(file_info["s3_key"])
+                self.bucket = file_info["bucket"]
+                self.prefix = file_info["prefix"]
+                self.files.append((self.bucket, file_info["filename"], file_info["s3_key"]))
+            except Exception as e:
+                print(f"Error parsing S3 file info: {e}", file=sys.stderr)
+
+        # Check if upload is complete
+        if "__S3_UPLOAD_COMPLETE__" in chunk:
+            self.upload_complete = True
+
+        # Also check for old-style batch output; the block can span reads, so search the whole log once it ends
+        if "__VIRAL_USHER_S3_OUTPUT_END__" in chunk:
+            match = re.search(r'__VIRAL_USHER_S3_OUTPUT_START__\n(.*?)\n__VIRAL_USHER_S3_OUTPUT_END__', self.text, re.DOTALL)
+            if match:
+                try:
+                    self.batch_output = json.loads(match.group(1))
+                except Exception as e:
+                    print(f"Error parsing S3 output: {e}", file=sys.stderr)
 
-        # Get upload sidecar logs
+    def s3_results(self) -> Optional[dict]:
+        """Uploaded result files seen in this log, with download URLs"""
+        if self.files:
+            file_urls = [result_file_entry(bucket, filename, s3_key) for bucket, filename, s3_key in self.files]
+            return {
+                "bucket": self.bucket,
+                "prefix": self.prefix,
+                "total_files": len(file_urls),
+                "files": file_urls,
+                "upload_complete": self.upload_complete
+            }
+
+        if self.batch_output:
+            bucket = self.batch_output["s3_bucket"]
+            prefix = self.batch_output["s3_prefix"]
+
+            # Create download URLs for each file
+            file_urls = []
+            for file_key in self.batch_output["uploaded_files"]:
+                file_urls.append(result_file_entry(bucket, file_key.replace(f"{prefix}/", ""), file_key))
+
+            return {
+                "bucket": bucket,
+                "prefix": prefix,
+                "total_files": self.batch_output["total_files"],
+                "files": file_urls,
+                "upload_complete": True
+            }
+        return None
+
+
+# Container logs by (pod uid, container name), least recently used first
+container_logs = OrderedDict()
+
+
+def container_log_for(pod_uid: str, container: str) -> ContainerLog:
+    key = (pod_uid, container)
+    log = container_logs.get(key)
+    if log is None:
+        log = container_logs[key] = ContainerLog()
+        while len(container_logs) > K8S_LOG_CACHE_MAX_CONTAINERS:
+            container_logs.popitem(last=False)
+    container_logs.move_to_end(key)
+    return log
+
+
+async def read_container_log(core_v1, pod, container: str, label: str) -> tuple:
+    """Bring a container's log up to date and return (ContainerLog, None), or (None, a message explaining why it is not available yet)"""
+    waiting = container_waiting_message(pod, container, label)
+    if waiting:
+        return None, waiting
+
+    log = container_log_for(pod.metadata.uid, container)
+    async with log.lock:
+        # Once an exited container's log has been read in full, or while a recent read is still fresh, skip the API
+        if log.finished or time.time() - log.fetched_at < K8S_LOG_REFRESH_INTERVAL:
+            return log, None
+
+        terminated = container_terminated(pod, container)
+        params = {"timestamps": True}
+        if log.last_epoch is not None:
+            params["since_seconds"] = max(1, int(time.time() - log.last_epoch) + K8S_LOG_CLOCK_MARGIN)
         try:
-            upload_logs = core_v1.read_namespaced_pod_log(
-                name=pod_name,
+            raw = await k8s_pool.run(
+                core_v1.read_namespaced_pod_log,
+                name=pod.metadata.name,
                 namespace=K8S_NAMESPACE,
-                container="upload-sidecar"
+                container=container,
+                **params
             )
-            logs["upload"] = upload_logs
         except client.exceptions.ApiException as e:
+            if log.text:
+                return log, None
             if e.status == 400 and "ContainerCreating" in str(e):
-                logs["upload"] = "Upload sidecar is being created..."
+                return None, f"{label} is being created..."
             elif e.status == 400:
-                logs["upload"] = "Upload sidecar has not started yet"
+                return None, f"{label} has not started yet"
             else:
-                logs["upload"] = f"Could not get upload sidecar logs: {str(e)}"
+                return None, f"Could not get {label.lower()} logs: {str(e)}"
         except Exception as e:
-            logs["upload"] = f"Could not get upload sidecar logs: {str(e)}"
+            if log.text:
+                return log, None
+            return None, f"Could not get {label.lower()} logs: {str(e)}"
 
-        # Parse S3 output from logs if present (check both main and upload logs)
-        s3_results = None
-        log_to_check = None
-        if "upload" in logs and isinstance(logs["upload"], str):
-            log_to_check = logs["upload"]
-        elif "main" in logs and isinstance(logs["main"], str):
-            log_to_check = logs["main"]
+        log.append(raw)
+        log.fetched_at = time.time()
+        log.finished = terminated
+    return log, None
 
-        if log_to_check:
-            import re
-            import json
 
-            # Look for incremental file uploads
-            file_urls = []
-            bucket = None
-            prefix = None
-            upload_complete = False
+async def job_s3_results(job_name: str, job_status: str, results_prefix: Optional[str], marker_logs=()) -> Optional[dict]:
+    """A job's uploaded results, keeping the result cache in step with its outcome"""
+    # Results are listed in the manifest under the job's results prefix
+    s3_results = None
+    if results_prefix and s3_client:
+        try:
+            manifest = await s3_pool.run(read_results_manifest, S3_BUCKET, results_prefix)
+            if manifest:
+                s3_results = manifest_s3_results(manifest)
+        except Exception as e:
+            print(f"Error reading results manifest: {e}", file=sys.stderr)
+
+    # Jobs from before manifests report their output in log markers, from the upload sidecar
+    # or from the main container when it uploads itself
+    for log in marker_logs:
+        if log is not None and s3_results is None:
+            s3_results = log.s3_results()
+
+    # Keep the result cache in step with the job's outcome, once: finished jobs are polled many times
+    if job_name not in result_cache_settled:
+        if job_status == "succeeded" and s3_results and s3_results["upload_complete"]:
+            await db_pool.run(result_cache_complete, job_name, s3_results["files"])
+        elif job_status == "failed":
+            await db_pool.run(result_cache_discard, job_name)
+        else:
+            return s3_results
+        result_cache_settled[job_name] = True
+        while len(result_cache_settled) > RESULT_CACHE_MAX_ENTRIES:
+            result_cache_settled.popitem(last=False)
+    return s3_results
+
+
+async def read_worker_build(job_name: str, build: dict, log_pod: Optional[str], main_offset: int) -> dict:
+    """Job status for a build leased by a worker, in the same shape as for a Kubernetes Job"""
+    job_status = build["status"]
+    # The worker and attempt stand in for the pod: a retry starts a new log
+    pod_name = f"{build['worker']}/{build['attempt']}"
+    start = main_offset if log_pod == pod_name and 0 <= main_offset <= len(build["log"]) else 0
+    return {
+        "job_name": job_name,
+        "status": job_status,
+        "pod_name": pod_name,
+        "logs": {"main": build["log"][start:]},
+        "log_starts": {"main": start},
+        "log_offsets": {"main": len(build["log"])},
+        "s3_results": await job_s3_results(job_name, job_status, build["results_prefix"])
+    }
 
-            # Find all incremental file uploads
-            for match in re.finditer(r'__S3_FILE_UPLOADED__(.+?)__S3_FILE_END__', log_to_check):
-                try:
-                    file_info = json.loads(match.group(1))
-                    bucket = file_info["bucket"]
-                    prefix = file_info["prefix"]
 
-                    # Use hardcoded GitHub Codespaces URL for now
-                    url = f"https://bookish-space-happiness-x56rxw7x77q2p5rq-8081.app.github.dev/api/s3-proxy/{bucket}/{file_info['s3_key']}"
+async def job_not_found(job_name: str) -> dict:
+    """Status of a job that no longer exists (or not yet), with its results if the build was cached"""
+    # A deleted job whose build was cached can still report its results
+    cached = await db_pool.run(result_cache_for_job, job_name)
+    if cached:
+        return {
+            "job_name": job_name,
+            "status": "succeeded",
+            "logs": {"info": "Job has been cleaned up; showing its cached results."},
+            "s3_results": cached_s3_results(cached["bucket"], cached["results_prefix"], cached["files"])
+        }
+    # Job doesn't exist yet or was deleted
+    return {
+        "job_name": job_name,
+        "status": "not_found",
+        "logs": "Job not found. It may not have been created yet or has been deleted."
+    }
 
-                    file_entry = {
-                        "filename": file_info["filename"],
-                        "url": url,
-                        "s3_key": file_info["s3_key"]
-                    }
 
-                    # For .jsonl.gz files, mark it for Taxonium (let frontend construct the URL)
-                    if file_info["filename"].endswith(".jsonl.gz"):
-                        file_entry["is_taxonium"] = True
+async def read_kubernetes_job(job_name: str, log_pod: Optional[str] = None,
+                              main_offset: int = 0, upload_offset: int = 0) -> dict:
+    """Status, logs and uploaded results of a build run as a Kubernetes Job"""
+    await k8s_pool.run(k8s.connect)
+    core_v1 = k8s.core_v1
+    batch_v1 = k8s.batch_v1
 
-                    file_urls.append(file_entry)
-                except Exception as e:
-                    print(f"Error parsing S3 file info: {e}", file=sys.stderr)
-
-            # Check if upload is complete
-            if "__S3_UPLOAD_COMPLETE__" in log_to_check:
-                upload_complete = True
-
-            # If we have files, create s3_results
-            if file_urls:
-                s3_results = {
-                    "bucket": bucket,
-                    "prefix": prefix,
-                    "total_files": len(file_urls),
-                    "files": file_urls,
-                    "upload_complete": upload_complete
-                }
+    # Job and pod status come from the watched table; read the API only when it cannot answer
+    # (watch not synced yet, or a job submitted before jobs were labelled)
+    snapshot = job_informer.lookup(job_name)
+    if snapshot:
+        job, pods = snapshot
+    else:
+        try:
+            job = await k8s_pool.run(batch_v1.read_namespaced_job, name=job_name, namespace=K8S_NAMESPACE)
+        except client.exceptions.ApiException as e:
+            if e.status == 404:
+                return await job_not_found(job_name)
+            raise HTTPException(status_code=500, detail=f"Error reading job: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error reading job: {str(e)}")
 
-            # Also check for old-style batch output (for backwards compatibility)
-            if not s3_results:
-                match = re.search(r'__VIRAL_USHER_S3_OUTPUT_START__\n(.*?)\n__VIRAL_USHER_S3_OUTPUT_END__', log_to_check, re.DOTALL)
-                if match:
-                    try:
-                        s3_data = json.loads(match.group(1))
-                        bucket = s3_data["s3_bucket"]
-                        prefix = s3_data["s3_prefix"]
-
-                        # Create download URLs for each file
-                        file_urls = []
-                        for file_key in s3_data["uploaded_files"]:
-                            # Use hardcoded GitHub Codespaces URL for now
-                            url = f"https://bookish-space-happiness-x56rxw7x77q2p5rq-8081.app.github.dev/api/s3-proxy/{bucket}/{file_key}"
-                            filename = file_key.replace(f"{prefix}/", "")
-                            file_entry = {
-                                "filename": filename,
-                                "url": url,
-                                "s3_key": file_key
-                            }
-
-                            # For .jsonl.gz files, mark it for Taxonium (let frontend construct the URL)
-                            if filename.endswith(".jsonl.gz"):
-                                file_entry["is_taxonium"] = True
-
-                            file_urls.append(file_entry)
-
-                        s3_results = {
-                            "bucket": bucket,
-                            "prefix": prefix,
-                            "total_files": s3_data["total_files"],
-                            "files": file_urls,
-                            "upload_complete": True
-                        }
-                    except Exception as e:
-                        print(f"Error parsing S3 output: {e}", file=sys.stderr)
+        # Get pods for this job
+        pods = (await k8s_pool.run(
+            core_v1.list_namespaced_pod,
+            namespace=K8S_NAMESPACE,
+            label_selector=f"job-name={job_name}"
+        )).items
 
+    if not pods:
         return {
             "job_name": job_name,
-            "status": job_status,
-            "pod_name": pod_name,
-            "logs": logs,
-            "s3_results": s3_results
+            "status": "pending",
+            "logs": "No pods found yet for this job"
         }
+
+    # Get the most recent pod
+    pod = pods[-1]
+    pod_name = pod.metadata.name
+
+    # Determine job status
+    job_status = "running"
+    if job.status.succeeded:
+        job_status = "succeeded"
+    elif job.status.failed:
+        job_status = "failed"
+
+    # Get logs from all containers
+    logs = {}
+
+    # Check pod phase to provide better messages
+    pod_phase = pod.status.phase
+    if pod_phase in ["Pending"]:
+        logs["info"] = f"Pod is in {pod_phase} phase. Containers have not started yet."
+        # Try to get more details about why it's pending
+        if pod.status.conditions:
+            for condition in pod.status.conditions:
+                if condition.status == "False":
+                    logs["info"] += f" {condition.reason}: {condition.message}"
+
+    # Get main container (viral-usher) and upload sidecar logs concurrently; single-container jobs have no sidecar
+    if any(container.name == "upload-sidecar" for container in pod.spec.containers):
+        (main_log, logs["main"]), (upload_log, logs["upload"]) = await asyncio.gather(
+            read_container_log(core_v1, pod, "viral-usher", "Main container"),
+            read_container_log(core_v1, pod, "upload-sidecar", "Upload sidecar")
+        )
+    else:
+        main_log, logs["main"] = await read_container_log(core_v1, pod, "viral-usher", "Main container")
+        upload_log = None
+
+    # Send only output after the client's offsets, unless it was following another pod
+    requested = {"main": main_offset, "upload": upload_offset} if log_pod == pod_name else {}
+    log_starts = {}
+    log_offsets = {}
+    for name, log in (("main", main_log), ("upload", upload_log)):
+        if log is None:
+            continue
+        start = requested.get(name, 0)
+        if not 0 <= start <= len(log.text):
+            start = 0
+        logs[name] = log.text[start:]
+        log_starts[name] = start
+        log_offsets[name] = len(log.text)
+
+    results_prefix = (job.metadata.annotations or {}).get(K8S_RESULTS_PREFIX_ANNOTATION)
+    s3_results = await job_s3_results(job_name, job_status, results_prefix, (upload_log, main_log))
+
+    return {
+        "job_name": job_name,
+        "status": job_status,
+        "pod_name": pod_name,
+        "logs": logs,
+        "log_starts": log_starts,
+        "log_offsets": log_offsets,
+        "s3_results": s3_results
+    }
+
+
+async def read_job_logs(job_name: str, log_pod: Optional[str] = None,
+                        main_offset: int = 0, upload_offset: int = 0) -> dict:
+    """Status, logs and uploaded results of a job, shared by polling and the event stream"""
+    try:
+        # Submissions waiting for capacity have no Kubernetes Job yet
+        queued = await db_pool.run(job_queue.status, job_name)
+        if queued and queued["status"] == "queued":
+            return {
+                "job_name": job_name,
+                "status": "queued",
+                "queue_position": queued["position"],
+                "queue_length": queued["length"],
+                "logs": f"Waiting for cluster capacity: position {queued['position']} of {queued['length']} in the queue."
+            }
+        if queued and queued["status"] == "failed":
+            return {
+                "job_name": job_name,
+                "status": "failed",
+                "logs": f"Job could not be started: {queued['error']}"
+            }
+
+        # The executor the build was handed to reports its status
+        return await job_executor.read_status(job_name, log_pod, main_offset, upload_offset)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get job logs: {str(e)}")
 
 
+@app.get("/api/job-usage")
+async def get_job_usage(request: Request, limit: int = 500):
+    """Estimated and observed resource usage of recent builds, for recalibrating JOB_SIZING. Needs the worker token."""
+    check_worker_token(request)
+    records = await db_pool.run(job_queue.usage_records, max(1, min(limit, JOB_USAGE_MAX_RECORDS)))
+    return {"sizing": JOB_SIZING, "jobs": records}
+
+
+def check_worker_token(request: Request):
+    """Reject worker calls without the shared WORKER_TOKEN"""
+    token = request.headers.get('x-worker-token', '')
+    if not WORKER_TOKEN or not hmac.compare_digest(token, WORKER_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid worker token")
+
+
+@app.post("/api/worker/lease")
+async def lease_worker_build(lease: WorkerLeaseRequest, request: Request):
+    """Give a worker the next queued build, or 204 if there is none it may take"""
+    check_worker_token(request)
+    item = await job_queue.lease(lease.worker)
+    if item is None:
+        return Response(status_code=204)
+    return item
+
+
+@app.post("/api/worker/builds/{job_name}")
+async def report_worker_build(job_name: str, report: WorkerReport, request: Request):
+    """Log output of a leased build, renewing the lease, and finally its outcome.
+
+    409 tells the worker its lease has expired and the build was requeued, so
+    it should stop.
+    """
+    check_worker_token(request)
+    if not await job_queue.report(job_name, report):
+        raise HTTPException(status_code=409, detail="Lease expired; the build has been requeued")
+    return {"ok": True}
+
+
+@app.get("/api/job-logs/{job_name}")
+async def get_job_logs(job_name: str, request: Request, log_pod: Optional[str] = None,
+                       main_offset: int = 0, upload_offset: int = 0):
+    """Get logs from a Kubernetes job.
+
+    Pass back the pod_name and log_offsets of the previous response as
+    log_pod, main_offset and upload_offset to receive only new log output;
+    log_starts says where each returned log begins (0 means the whole log).
+    """
+    return await read_job_logs(job_name, log_pod, main_offset, upload_offset)
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class JobEventStream:
+    """One upstream reader per job, fanned out to every browser subscribed to it.
+
+    The reader follows the job with incremental log cursors and publishes
+    only what changed: status transitions, new log output and newly
+    uploaded result files. It stops when the last subscriber leaves.
+    """
+
+    def __init__(self, job_name: str):
+        self.job_name = job_name
+        self.subscribers = set()
+        self.latest = None  # Last full state, sent to new subscribers as a snapshot
+        self.task = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=JOB_EVENTS_QUEUE_SIZE)
+        if self.latest:
+            queue.put_nowait(sse_event("snapshot", self.latest))
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, event: str, data: Any):
+        message = sse_event(event, data)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind to catch up from deltas; end its stream so it reconnects to a fresh snapshot
+                self.close(queue)
+
+    def close(self, queue: asyncio.Queue):
+        """Unsubscribe a queue and tell its response to finish once the queued events are sent"""
+        self.unsubscribe(queue)
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def run(self):
+        try:
+            while self.subscribers:
+                try:
+                    await self.update()
+                except HTTPException as e:
+                    self.publish("error", {"detail": e.detail})
+                if self.latest and self.latest["status"] in ("succeeded", "failed"):
+                    self.publish("end", {"status": self.latest["status"]})
+                    for queue in list(self.subscribers):
+                        self.close(queue)
+                    break
+                await asyncio.sleep(JOB_EVENTS_INTERVAL)
+        finally:
+            if job_event_streams.get(self.job_name) is self and not self.subscribers:
+                del job_event_streams[self.job_name]
+
+    async def update(self):
+        """Read the job once and publish what changed since the last read"""
+        latest = self.latest
+        cursor = {}
+        if latest and latest.get("log_offsets"):
+            cursor = {
+                "log_pod": latest["pod_name"],
+                "main_offset": latest["log_offsets"].get("main", 0),
+                "upload_offset": latest["log_offsets"].get("upload", 0)
+            }
+        data = await read_job_logs(self.job_name, **cursor)
+
+        # Fold the new output into the full logs kept for later snapshots
+        logs = data.get("logs")
+        if isinstance(logs, dict) and latest and isinstance(latest.get("logs"), dict):
+            logs = dict(logs)
+            for name, start in data.get("log_starts", {}).items():
+                if start > 0:
+                    logs[name] = latest["logs"].get(name, "") + logs[name]
+        state = {**data, "logs": logs}
+        state.pop("log_starts", None)
+        self.latest = state
+
+        # Without logs from both reads to compare (no job or pod yet), resend the whole state
+        if latest is None or not (isinstance(data.get("logs"), dict) and isinstance(latest.get("logs"), dict)):
+            if state != latest:
+                self.publish("snapshot", state)
+            return
+
+        if (data["status"], data.get("pod_name")) != (latest["status"], latest.get("pod_name")):
+            self.publish("status", {"status": data["status"], "pod_name": data.get("pod_name")})
+
+        # New log chunks, or replacement text when a log restarted or is still a status message
+        changed = {}
+        starts = data.get("log_starts", {})
+        for name, text in data["logs"].items():
+            if starts.get(name, 0) > 0:
+                if text:
+                    changed[name] = {"append": text}
+            elif text != latest["logs"].get(name):
+                changed[name] = {"replace": text}
+        for name in latest["logs"].keys() - data["logs"].keys():
+            changed[name] = {"replace": None}
+        if changed:
+            self.publish("logs", changed)
+
+        # Newly uploaded result files
+        results = data.get("s3_results")
+        previous_results = latest.get("s3_results") or {}
+        if results:
+            known = {f["s3_key"] for f in previous_results.get("files", [])}
+            new_files = [f for f in results["files"] if f["s3_key"] not in known]
+            if new_files or results["upload_complete"] != previous_results.get("upload_complete"):
+                self.publish("files", {**results, "files": new_files})
+
+
+# Active event streams by job name
+job_event_streams = {}
+
+
+@app.get("/api/job-events/{job_name}")
+async def job_events(job_name: str, request: Request):
+    """Stream job progress as Server-Sent Events.
+
+    Sends a snapshot (same shape as /api/job-logs) followed by status, logs
+    (append/replace per log) and files (newly uploaded) events, then end.
+    """
+    stream = job_event_streams.get(job_name)
+    if stream is None:
+        stream = job_event_streams[job_name] = JobEventStream(job_name)
+    queue = stream.subscribe()
+
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), JOB_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            stream.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/api/generate-config")
 async def generate_config(
+    request: Request,
     no_genbank: str = Form("false"),
     refseq_acc: str = Form(""),
     refseq_assembly: str = Form(""),
@@ -619,7 +3128,19 @@ async def generate_config(
     metadata_file: Optional[UploadFile] = File(None),
     metadata_date_column: str = Form(""),
     starting_tree_file: Optional[UploadFile] = File(None),
-    starting_tree_url: str = Form("")
+    starting_tree_url: str = Form(""),
+    fasta_s3_key: str = Form(""),
+    fasta_upload_token: str = Form(""),
+    ref_fasta_s3_key: str = Form(""),
+    ref_fasta_upload_token: str = Form(""),
+    ref_gbff_s3_key: str = Form(""),
+    ref_gbff_upload_token: str = Form(""),
+    metadata_s3_key: str = Form(""),
+    metadata_upload_token: str = Form(""),
+    starting_tree_s3_key: str = Form(""),
+    starting_tree_upload_token: str = Form(""),
+    force_rebuild: str = Form("false"),
+    continue_from_latest: str = Form("false")
 ):
     """Generate and save a viral_usher config file, optionally with FASTA upload to S3"""
     try:
@@ -630,45 +3151,46 @@ async def generate_config(
         # Parse no_genbank flag
         no_genbank_mode = no_genbank.lower() == 'true'
 
-        # Handle reference file uploads or text (for no_genbank mode)
-        ref_fasta_s3_key = None
-        ref_gbff_s3_key = None
+        # Handle reference file uploads or text (for no_genbank mode).
+        # *_s3_key fields name files the browser already uploaded directly to S3.
         if no_genbank_mode:
-            if ref_fasta_file:
-                ref_fasta_content = await ref_fasta_file.read()
-                ref_fasta_s3_key = upload_to_s3(ref_fasta_content, ref_fasta_file.filename or "ref.fasta", "text/plain")
+            if ref_fasta_s3_key:
+                ref_fasta_s3_key = await s3_pool.run(validate_upload_key, ref_fasta_s3_key, ref_fasta_upload_token)
+            elif ref_fasta_file:
+                ref_fasta_s3_key = await upload_stream_to_s3(ref_fasta_file, ref_fasta_file.filename or "ref.fasta", "text/plain")
             elif ref_fasta_text:
                 ref_fasta_content = ref_fasta_text.encode('utf-8')
-                ref_fasta_s3_key = upload_to_s3(ref_fasta_content, "ref.fasta", "text/plain")
+                ref_fasta_s3_key = await s3_pool.run(upload_to_s3, ref_fasta_content, "ref.fasta", "text/plain")
 
-            if ref_gbff_file:
-                ref_gbff_content = await ref_gbff_file.read()
-                ref_gbff_s3_key = upload_to_s3(ref_gbff_content, ref_gbff_file.filename or "ref.gbff", "text/plain")
+            if ref_gbff_s3_key:
+                ref_gbff_s3_key = await s3_pool.run(validate_upload_key, ref_gbff_s3_key, ref_gbff_upload_token)
+            elif ref_gbff_file:
+                ref_gbff_s3_key = await upload_stream_to_s3(ref_gbff_file, ref_gbff_file.filename or "ref.gbff", "text/plain")
             elif ref_gbff_text:
                 ref_gbff_content = ref_gbff_text.encode('utf-8')
-                ref_gbff_s3_key = upload_to_s3(ref_gbff_content, "ref.gbff", "text/plain")
+                ref_gbff_s3_key = await s3_pool.run(upload_to_s3, ref_gbff_content, "ref.gbff", "text/plain")
 
         # Handle FASTA upload to S3 (sequences to place)
-        fasta_s3_key = None
-        if fasta_file:
-            fasta_content = await fasta_file.read()
-            fasta_s3_key = upload_to_s3(fasta_content, fasta_file.filename or "sequences.fasta", "text/plain")
+        if fasta_s3_key:
+            fasta_s3_key = await s3_pool.run(validate_upload_key, fasta_s3_key, fasta_upload_token)
+        elif fasta_file:
+            fasta_s3_key = await upload_stream_to_s3(fasta_file, fasta_file.filename or "sequences.fasta", "text/plain")
         elif fasta_text:
             fasta_content = fasta_text.encode('utf-8')
-            fasta_s3_key = upload_to_s3(fasta_content, "sequences.fasta", "text/plain")
+            fasta_s3_key = await s3_pool.run(upload_to_s3, fasta_content, "sequences.fasta", "text/plain")
 
         # Handle metadata file upload
-        metadata_s3_key = None
-        if metadata_file:
-            metadata_content = await metadata_file.read()
-            metadata_s3_key = upload_to_s3(metadata_content, metadata_file.filename or "metadata.tsv", "text/tab-separated-values")
+        if metadata_s3_key:
+            metadata_s3_key = await s3_pool.run(validate_upload_key, metadata_s3_key, metadata_upload_token)
+        elif metadata_file:
+            metadata_s3_key = await upload_stream_to_s3(metadata_file, metadata_file.filename or "metadata.tsv", "text/tab-separated-values")
 
         # Handle starting tree upload (protobuf for update mode)
-        starting_tree_s3_key = None
         starting_tree_source_url = None
-        if starting_tree_file:
-            starting_tree_content = await starting_tree_file.read()
-            starting_tree_s3_key = upload_to_s3(starting_tree_content, starting_tree_file.filename or "optimized.pb.gz", "application/gzip")
+        if starting_tree_s3_key:
+            starting_tree_s3_key = await s3_pool.run(validate_upload_key, starting_tree_s3_key, starting_tree_upload_token)
+        elif starting_tree_file:
+            starting_tree_s3_key = await upload_stream_to_s3(starting_tree_file, starting_tree_file.filename or "optimized.pb.gz", "application/gzip")
         elif starting_tree_url:
             starting_tree_source_url = starting_tree_url
 
@@ -736,6 +3258,26 @@ async def generate_config(
         elif starting_tree_source_url:
             config_contents["update_tree_input"] = starting_tree_source_url
 
+        # Builds from scratch or continuing our own trees are recorded by taxid and reference, so later
+        # builds can continue from them; continue_from_latest picks up the most recent one's tree
+        lineage = None
+        parent_build = None
+        incremental = None
+        result_cache_available = s3_client is not None and await db_pool.run(get_result_cache_db) is not None
+        if "update_tree_input" not in config_contents and result_cache_available:
+            lineage = build_lineage_keys(config_contents, no_genbank_mode)
+            if continue_from_latest.lower() == 'true':
+                parent_build, full_rebuild_reason = await find_continuation(*lineage)
+                if parent_build:
+                    config_contents["update_tree_input"] = s3_object_url(parent_build["tree_key"])
+                    incremental = {
+                        "continued_from": parent_build["job_name"],
+                        "results_prefix": parent_build["results_prefix"],
+                        "chain_length": parent_build["chain_length"] + 1
+                    }
+                else:
+                    incremental = {"full_rebuild_reason": full_rebuild_reason}
+
         # Create workdir if it doesn't exist
         os.makedirs(workdir, exist_ok=True)
 
@@ -750,59 +3292,218 @@ async def generate_config(
         # Upload config to S3
         config_s3_key = None
         job_info = None
+        cached_results = None
         if s3_client:
-            with open(config_path, 'rb') as f:
-                config_s3_key = upload_to_s3(f.read(), config_filename, "application/toml")
+            # Use update mode if a starting tree was provided or found
+            use_update_mode = "update_tree_input" in config_contents
+
+            # Reuse an identical earlier build (finished or still running) unless a rebuild is forced
+            cache_key = None
+            if result_cache_available:
+                cache_key = await s3_pool.run(build_cache_key, config_contents, no_genbank_mode, use_update_mode)
+            cache_ttl = RESULT_CACHE_TTL if no_genbank_mode else min(RESULT_CACHE_TTL, RESULT_CACHE_GENBANK_TTL)
+            cached = None
+            if cache_key and force_rebuild.lower() != 'true':
+                cached = await db_pool.run(result_cache_lookup, cache_key, cache_ttl)
+
+            if cached:
+                job_info = {
+                    "success": True,
+                    "job_name": cached["job_name"],
+                    "namespace": K8S_NAMESPACE,
+                    "cached": True
+                }
+                if cached["status"] == "complete":
+                    cached_results = cached_s3_results(cached["bucket"], cached["results_prefix"], cached["files"])
+            else:
+                with open(config_path, 'rb') as f:
+                    # Configs keep a unique key: the job's results prefix is derived from it
+                    config_s3_key = await s3_pool.run(
+                        upload_to_s3, f.read(), config_filename, "application/toml", content_addressed=False
+                    )
 
-            # Start Kubernetes job to process the config
-            job_name = f"viral-usher-{taxonomy_id}-{uuid.uuid4().hex[:8]}"
-            # Use update mode if a starting tree was provided
-            use_update_mode = bool(starting_tree_s3_key or starting_tree_source_url)
-            try:
-                job_info = start_kubernetes_job(config_s3_key, job_name, no_genbank_mode, use_update_mode)
-            except HTTPException as e:
-                # Job creation failed, but config was still created
-                job_info = {"success": False, "error": str(e.detail)}
+                # Queue a Kubernetes job to process the config; it starts now if there is capacity
+                job_name = f"viral-usher-{taxonomy_id}-{uuid.uuid4().hex[:8]}"
+                try:
+                    inputs = await s3_pool.run(config_input_stats, config_contents)
+                    if cache_key:
+                        await db_pool.run(result_cache_add, cache_key, job_name, results_prefix_for_config(config_s3_key))
+                    job_info = await job_queue.submit(
+                        job_name, request_user(request), inputs, config_s3_key, no_genbank_mode, use_update_mode
+                    )
+                    if lineage:
+                        await db_pool.run(
+                            build_lineage_add, job_name, *lineage, results_prefix_for_config(config_s3_key), parent_build
+                        )
+                except HTTPException as e:
+                    # Job creation failed, but config was still created
+                    job_info = {"success": False, "error": str(e.detail)}
 
         return {
             "config_path": config_path,
             "config_s3_key": config_s3_key,
-            "fasta_s3_key": fasta_s3_key,
+            "fasta_s3_key": fasta_s3_key or None,
             "config_contents": config_contents,
             "s3_bucket": S3_BUCKET if s3_client else None,
-            "job_info": job_info
+            "job_info": job_info,
+            "cached_results": cached_results,
+            "incremental": incremental
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/s3-proxy/{bucket}/{s3_key:path}")
-async def s3_proxy(bucket: str, s3_key: str):
-    """Proxy S3 downloads through the backend"""
+def s3_object_headers(s3_response: dict, s3_key: str) -> dict:
+    """Build HTTP response headers from a get_object/head_object response"""
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'attachment; filename="{s3_key.split("/")[-1]}"'
+    }
+    if 'ContentLength' in s3_response:
+        headers['Content-Length'] = str(s3_response['ContentLength'])
+    if s3_response.get('ContentRange'):
+        headers['Content-Range'] = s3_response['ContentRange']
+    if s3_response.get('ETag'):
+        headers['ETag'] = s3_response['ETag']
+    if s3_response.get('LastModified'):
+        headers['Last-Modified'] = s3_response['LastModified'].strftime('%a, %d %b %Y %H:%M:%S GMT')
+    if s3_response.get('ContentEncoding'):
+        headers['Content-Encoding'] = s3_response['ContentEncoding']
+        headers['Vary'] = 'Accept-Encoding'
+    return headers
+
+
+def accepts_encoding(request: Request, encoding: str) -> bool:
+    """Whether the client's Accept-Encoding allows a response in this content coding"""
+    weights = {}
+    for item in request.headers.get('accept-encoding', '').split(','):
+        name, *params = item.split(';')
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    # A coding named outright overrides the "*" wildcard, wherever each appears
+    weight = weights.get(encoding.lower(), weights.get('*', 0.0))
+    return weight > 0
+
+
+def decoded_s3_headers(s3_response: dict, s3_key: str) -> dict:
+    """Headers for an encoded object sent decoded, whose length is not known up front.
+
+    The ETag belongs to the stored (encoded) bytes, so it is dropped too.
+    """
+    headers = s3_object_headers(s3_response, s3_key)
+    for name in ('Content-Encoding', 'Content-Length', 'Content-Range', 'Accept-Ranges', 'ETag'):
+        headers.pop(name, None)
+    return headers
+
+
+def iter_s3_body(body):
+    """Yield chunks of an S3 streaming body as they arrive, closing it when done"""
+    try:
+        for chunk in body.iter_chunks(chunk_size=S3_DOWNLOAD_CHUNK_SIZE):
+            yield chunk
+    finally:
+        body.close()
+
+
+def iter_decoded_s3_body(body, encoding: str):
+    """Yield an S3 body stored with a Content-Encoding as plain content, for clients that do not accept it"""
+    if encoding == 'zstd':
+        import zstandard
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        decompressor = zlib.decompressobj(47)  # wbits 47: gzip or zlib header, detected automatically
+    for chunk in iter_s3_body(body):
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    if encoding != 'zstd':
+        data = decompressor.flush()
+        if data:
+            yield data
+
+
+@app.api_route("/api/s3-proxy/{bucket}/{s3_key:path}", methods=["GET", "HEAD"])
+async def s3_proxy(bucket: str, s3_key: str, request: Request):
+    """Proxy S3 downloads through the backend.
+
+    The object is streamed to the client as S3 delivers it, so the backend
+    never holds a whole file in memory. Range and If-None-Match headers are
+    forwarded to S3, giving 206 Partial Content and 304 Not Modified
+    responses for partial/resumable downloads and revalidation. Objects
+    stored compressed are sent with their Content-Encoding, or decoded on
+    the fly for clients whose Accept-Encoding does not allow it.
+    """
     if not s3_client:
         raise HTTPException(status_code=500, detail="S3 not configured")
 
+    params = {"Bucket": bucket, "Key": s3_key}
+    if request.headers.get('if-none-match'):
+        params["IfNoneMatch"] = request.headers['if-none-match']
+
     try:
-        # Get the file from S3
-        response = s3_client.get_object(Bucket=bucket, Key=s3_key)
+        if request.method == "HEAD":
+            response = await s3_pool.run(s3_client.head_object, **params)
+            encoding = response.get('ContentEncoding')
+            decoded = encoding and not accepts_encoding(request, encoding)
+            head_response = Response(
+                media_type=response.get('ContentType', 'application/octet-stream'),
+                headers=decoded_s3_headers(response, s3_key) if decoded else s3_object_headers(response, s3_key)
+            )
+            if decoded:
+                del head_response.headers['content-length']  # Decoded length is unknown without reading the object
+            return head_response
 
-        # Stream the file content
-        file_content = response['Body'].read()
+        range_header = request.headers.get('range')
+        if range_header:
+            params["Range"] = range_header
 
-        # Determine content type
-        content_type = response.get('ContentType', 'application/octet-stream')
+        # Get the file from S3
+        response = await s3_pool.run(s3_client.get_object, **params)
+
+        encoding = response.get('ContentEncoding')
+        if encoding and not accepts_encoding(request, encoding):
+            # A range of compressed bytes cannot be decoded on its own, so send the whole object
+            if range_header:
+                response['Body'].close()
+                del params["Range"]
+                response = await s3_pool.run(s3_client.get_object, **params)
+            return StreamingResponse(
+                iter_decoded_s3_body(response['Body'], encoding),
+                media_type=response.get('ContentType', 'application/octet-stream'),
+                headers=decoded_s3_headers(response, s3_key)
+            )
 
-        # Return the file
-        return Response(
-            content=file_content,
-            media_type=content_type,
-            headers={
-                'Content-Disposition': f'attachment; filename="{s3_key.split("/")[-1]}"'
-            }
+        # Stream the file content
+        return StreamingResponse(
+            iter_s3_body(response['Body']),
+            status_code=206 if response.get('ContentRange') else 200,
+            media_type=response.get('ContentType', 'application/octet-stream'),
+            headers=s3_object_headers(response, s3_key)
         )
     except ClientError as e:
-        if e.response['Error']['Code'] == 'NoSuchKey':
+        error_code = e.response['Error']['Code']
+        status_code = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        if status_code == 304 or error_code == '304':
+            etag = e.response.get('ResponseMetadata', {}).get('HTTPHeaders', {}).get('etag')
+            return Response(status_code=304, headers={'ETag': etag} if etag else None)
+        if error_code in ('NoSuchKey', '404'):
             raise HTTPException(status_code=404, detail="File not found")
+        elif error_code == 'InvalidRange':
+            # A 416 states the object's length so the client can ask for a range that fits (RFC 9110)
+            headers = None
+            try:
+                head = await s3_pool.run(s3_client.head_object, Bucket=bucket, Key=s3_key)
+                headers = {'Content-Range': f"bytes */{head['ContentLength']}"}
+            except ClientError:
+                pass
+            raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers=headers)
         else:
             raise HTTPException(status_code=500, detail=f"S3 error: {str(e)}")
     except Exception as e:
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Measure /api/job-logs latency while many clients poll at once.
+
+Each simulated browser tab polls the job-logs endpoint for one job on a
+fixed interval, like the frontend does. Optionally, other clients hit a
+cheap endpoint at the same time to show whether slow log fetches hold up
+unrelated requests. Run it against a backend before and after a change
+and compare the reported percentiles.
+
+Example:
+    python benchmark_job_logs.py --url http://localhost:8000 --job viral-usher-123-abcd1234 --clients 50
+"""
+
+import argparse
+import threading
+import time
+import urllib.request
+import urllib.error
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def poll(url, interval, deadline, latencies, errors, lock):
+    """Request url every interval seconds until deadline, recording latencies in ms"""
+    while time.time() < deadline:
+        start = time.time()
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response:
+                response.read()
+            elapsed = (time.time() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+        except (urllib.error.URLError, OSError):
+            with lock:
+                errors.append(url)
+        time.sleep(max(0.0, interval - (time.time() - start)))
+
+
+def run_clients(url, clients, interval, duration):
+    """Run concurrent pollers against url and return (latencies, errors)"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.time() + duration
+    threads = [
+        threading.Thread(target=poll, args=(url, interval, deadline, latencies, errors, lock))
+        for _ in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads, latencies, errors
+
+
+def report(name, latencies, errors):
+    print(f"{name}: {len(latencies)} requests, {len(errors)} errors")
+    print(f"  p50 {percentile(latencies, 50):8.1f} ms")
+    print(f"  p95 {percentile(latencies, 95):8.1f} ms")
+    print(f"  p99 {percentile(latencies, 99):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/job-logs under concurrent polling")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--job", required=True, help="Job name to poll")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent pollers (default: 20)")
+    parser.add_argument("--interval", type=float, default=3.0, help="Seconds between polls per client (default: 3)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run (default: 30)")
+    parser.add_argument(
+        "--probe-clients",
+        type=int,
+        default=2,
+        help="Clients polling a cheap endpoint to detect event-loop stalls (default: 2)"
+    )
+    parser.add_argument("--probe-path", default="/openapi.json", help="Cheap endpoint to probe")
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip("/")
+    print(f"Polling {base_url}/api/job-logs/{args.job} with {args.clients} clients for {args.duration:g}s")
+
+    threads, latencies, errors = run_clients(
+        f"{base_url}/api/job-logs/{args.job}", args.clients, args.interval, args.duration
+    )
+    probe_threads, probe_latencies, probe_errors = run_clients(
+        f"{base_url}{args.probe_path}", args.probe_clients, 0.1, args.duration
+    )
+    for thread in threads + probe_threads:
+        thread.join()
+
+    report("job-logs", latencies, errors)
+    if args.probe_clients:
+        report(args.probe_path, probe_latencies, probe_errors)
+
+
+if __name__ == "__main__":
+    main()
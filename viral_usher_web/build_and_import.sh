@@ -6,13 +6,18 @@ set -e
 
 CLUSTER_NAME="${1:-viral-usher}"
 WEB_IMAGE_NAME="viral-usher-web:latest"
+# Tagged as the chart's default uploadImage, so jobs use the imported copy (pullPolicy IfNotPresent)
+UPLOAD_IMAGE_NAME="ghcr.io/theosanderson/project23/viral-usher-uploader:latest"
 
 echo "Building Docker image: $WEB_IMAGE_NAME"
 docker build -t $WEB_IMAGE_NAME -f Dockerfile .
 
+echo "Building Docker image: $UPLOAD_IMAGE_NAME"
+docker build -t $UPLOAD_IMAGE_NAME -f Dockerfile.uploader .
+
 echo ""
-echo "Importing web image into k3d cluster: $CLUSTER_NAME"
-k3d image import $WEB_IMAGE_NAME -c $CLUSTER_NAME
+echo "Importing web and uploader images into k3d cluster: $CLUSTER_NAME"
+k3d image import $WEB_IMAGE_NAME $UPLOAD_IMAGE_NAME -c $CLUSTER_NAME
 
 echo ""
 echo "✓ Image built and imported successfully"
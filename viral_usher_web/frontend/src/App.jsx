@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 
 function App() {
   // Mode selection: 'genbank' or 'no_genbank'
@@ -38,7 +38,7 @@ function App() {
   // Starting tree (protobuf) upload state
   const [startingTreeFile, setStartingTreeFile] = useState(null);
   const [startingTreeUrl, setStartingTreeUrl] = useState('');
-  const [startingTreeInputMethod, setStartingTreeInputMethod] = useState('file'); // 'file' or 'url'
+  const [startingTreeInputMethod, setStartingTreeInputMethod] = useState('file'); // 'file', 'url' or 'latest'
 
   // Configuration parameters
   const [minLengthProportion, setMinLengthProportion] = useState('0.8');
@@ -54,11 +54,78 @@ function App() {
   const [error, setError] = useState('');
   const [jobLogs, setJobLogs] = useState(null);
   const [pollingInterval, setPollingInterval] = useState(null);
+  // Logs received so far for the job being followed, so each poll only fetches new output
+  const jobLogCursor = useRef(null);
+  // Server-Sent Events stream for the job being followed
+  const jobEventSource = useRef(null);
   const [formCollapsed, setFormCollapsed] = useState(false);
 
   // API base URL
   const API_BASE = '/api';
 
+  // Number of parts uploaded to S3 at once during direct uploads
+  const UPLOAD_CONCURRENCY = 4;
+
+  // Upload a file straight to S3 using presigned multipart URLs and return its S3 key and upload token
+  const uploadFileDirect = async (file) => {
+    const initResponse = await fetch(`${API_BASE}/uploads/initiate`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        filename: file.name,
+        size: file.size,
+        content_type: file.type || 'application/octet-stream'
+      })
+    });
+    if (!initResponse.ok) throw new Error(`Failed to start upload of ${file.name}`);
+    const upload = await initResponse.json();
+
+    try {
+      const completedParts = [];
+      const queue = [...upload.parts];
+      const worker = async () => {
+        while (queue.length > 0) {
+          const part = queue.shift();
+          const start = (part.part_number - 1) * upload.part_size;
+          const partResponse = await fetch(part.url, {
+            method: 'PUT',
+            body: file.slice(start, start + upload.part_size)
+          });
+          if (!partResponse.ok) throw new Error(`Failed to upload part ${part.part_number} of ${file.name}`);
+          completedParts.push({ part_number: part.part_number, etag: partResponse.headers.get('ETag') });
+        }
+      };
+      await Promise.all(Array.from({ length: UPLOAD_CONCURRENCY }, worker));
+
+      const completeResponse = await fetch(`${API_BASE}/uploads/complete`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ s3_key: upload.s3_key, upload_id: upload.upload_id, upload_token: upload.upload_token, parts: completedParts })
+      });
+      if (!completeResponse.ok) throw new Error(`Failed to complete upload of ${file.name}`);
+      return await completeResponse.json();
+    } catch (err) {
+      fetch(`${API_BASE}/uploads/abort`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ s3_key: upload.s3_key, upload_id: upload.upload_id, upload_token: upload.upload_token })
+      }).catch(() => {});
+      throw err;
+    }
+  };
+
+  // Attach a file to the form, preferring a direct S3 upload and falling back to sending it with the form
+  const appendFile = async (formData, fieldPrefix, file) => {
+    try {
+      const { s3_key, upload_token } = await uploadFileDirect(file);
+      formData.append(`${fieldPrefix}_s3_key`, s3_key);
+      formData.append(`${fieldPrefix}_upload_token`, upload_token);
+    } catch (err) {
+      console.warn(`Direct upload failed, sending ${file.name} through the backend:`, err);
+      formData.append(`${fieldPrefix}_file`, file);
+    }
+  };
+
   // Search for species (GenBank mode)
   const searchSpecies = async () => {
     if (!speciesSearch.trim()) return;
@@ -248,13 +315,13 @@ GGGCGGCTTCCGGAATAGCGTACGCGCCTTTGGGTCCACTCGACAGCTTGAGGCATAGGG`);
         formData.append('taxonomy_id', manualTaxonomyId);
 
         if (refFastaInputMethod === 'file' && refFastaFile) {
-          formData.append('ref_fasta_file', refFastaFile);
+          await appendFile(formData, 'ref_fasta', refFastaFile);
         } else if (refFastaInputMethod === 'text' && refFastaText) {
           formData.append('ref_fasta_text', refFastaText);
         }
 
         if (refGbffInputMethod === 'file' && refGbffFile) {
-          formData.append('ref_gbff_file', refGbffFile);
+          await appendFile(formData, 'ref_gbff', refGbffFile);
         } else if (refGbffInputMethod === 'text' && refGbffText) {
           formData.append('ref_gbff_text', refGbffText);
         }
@@ -270,14 +337,14 @@ GGGCGGCTTCCGGAATAGCGTACGCGCCTTTGGGTCCACTCGACAGCTTGAGGCATAGGG`);
 
       // Add FASTA data (sequences to place)
       if (fastaInputMethod === 'file' && fastaFile) {
-        formData.append('fasta_file', fastaFile);
+        await appendFile(formData, 'fasta', fastaFile);
       } else if (fastaInputMethod === 'text' && fastaText) {
         formData.append('fasta_text', fastaText);
       }
 
       // Add metadata file if provided
       if (metadataFile) {
-        formData.append('metadata_file', metadataFile);
+        await appendFile(formData, 'metadata', metadataFile);
       }
       if (metadataDateColumn) {
         formData.append('metadata_date_column', metadataDateColumn);
@@ -285,9 +352,11 @@ GGGCGGCTTCCGGAATAGCGTACGCGCCTTTGGGTCCACTCGACAGCTTGAGGCATAGGG`);
 
       // Add starting tree (protobuf) if provided
       if (startingTreeInputMethod === 'file' && startingTreeFile) {
-        formData.append('starting_tree_file', startingTreeFile);
+        await appendFile(formData, 'starting_tree', startingTreeFile);
       } else if (startingTreeInputMethod === 'url' && startingTreeUrl) {
         formData.append('starting_tree_url', startingTreeUrl);
+      } else if (startingTreeInputMethod === 'latest') {
+        formData.append('continue_from_latest', 'true');
       }
 
       const response = await fetch(`${API_BASE}/generate-config`, {
@@ -314,10 +383,30 @@ GGGCGGCTTCCGGAATAGCGTACGCGCCTTTGGGTCCACTCGACAGCTTGAGGCATAGGG`);
   // Fetch job logs
   const fetchJobLogs = async (jobName) => {
     try {
-      const response = await fetch(`${API_BASE}/job-logs/${jobName}`);
+      const cursor = jobLogCursor.current;
+      const params = new URLSearchParams();
+      if (cursor && cursor.jobName === jobName && cursor.podName) {
+        params.set('log_pod', cursor.podName);
+        params.set('main_offset', cursor.offsets.main || 0);
+        params.set('upload_offset', cursor.offsets.upload || 0);
+      }
+      const response = await fetch(`${API_BASE}/job-logs/${jobName}?${params}`);
       if (!response.ok) return;
 
       const data = await response.json();
+
+      // Append new output to the logs already shown; a start of 0 means the whole log was sent
+      if (data.logs && typeof data.logs === 'object' && data.log_starts) {
+        const previous = cursor && cursor.jobName === jobName ? cursor.logs : {};
+        const logs = { ...data.logs };
+        for (const [name, start] of Object.entries(data.log_starts)) {
+          if (start > 0) {
+            logs[name] = (previous[name] || '') + data.logs[name];
+          }
+        }
+        data.logs = logs;
+        jobLogCursor.current = { jobName, podName: data.pod_name, offsets: data.log_offsets, logs };
+      }
       setJobLogs(data);
 
       // Stop polling if job is complete
@@ -329,11 +418,45 @@ GGGCGGCTTCCGGAATAGCGTACGCGCCTTTGGGTCCACTCGACAGCTTGAGGCATAGGG`);
     }
   };
 
-  // Start polling for job logs
-  const startJobLogPolling = (jobName) => {
-    // Clear any existing interval
-    stopJobLogPolling();
+  // Follow job progress, pushed from the server as it happens
+  const followJobEvents = (jobName) => {
+    const source = new EventSource(`${API_BASE}/job-events/${jobName}`);
+    jobEventSource.current = source;
+    let received = false;
+
+    const on = (event, handler) => source.addEventListener(event, (e) => {
+      received = true;
+      handler(JSON.parse(e.data));
+    });
+
+    // Full state on connect (and after any reconnect), then only changes
+    on('snapshot', (data) => setJobLogs(data));
+    on('status', ({ status, pod_name }) => setJobLogs((prev) => ({ ...prev, status, pod_name })));
+    on('logs', (changes) => setJobLogs((prev) => {
+      const logs = { ...prev.logs };
+      for (const [name, change] of Object.entries(changes)) {
+        logs[name] = change.append !== undefined ? (logs[name] || '') + change.append : change.replace;
+      }
+      return { ...prev, logs };
+    }));
+    on('files', (results) => setJobLogs((prev) => ({
+      ...prev,
+      s3_results: { ...results, files: [...((prev.s3_results && prev.s3_results.files) || []), ...results.files] }
+    })));
+    on('end', () => stopJobLogPolling());
+
+    source.onerror = () => {
+      // The browser reconnects by itself; fall back to polling only if the stream never worked
+      if (!received) {
+        source.close();
+        jobEventSource.current = null;
+        startPolling(jobName);
+      }
+    };
+  };
 
+  // Poll for job logs, for browsers or proxies without Server-Sent Events
+  const startPolling = (jobName) => {
     // Fetch immediately
     fetchJobLogs(jobName);
 
@@ -342,8 +465,25 @@ GGGCGGCTTCCGGAATAGCGTACGCGCCTTTGGGTCCACTCGACAGCTTGAGGCATAGGG`);
     setPollingInterval(interval);
   };
 
-  // Stop polling
+  // Start following job logs
+  const startJobLogPolling = (jobName) => {
+    // Clear any existing stream or interval
+    stopJobLogPolling();
+    jobLogCursor.current = null;
+
+    if (window.EventSource) {
+      followJobEvents(jobName);
+    } else {
+      startPolling(jobName);
+    }
+  };
+
+  // Stop following
   const stopJobLogPolling = () => {
+    if (jobEventSource.current) {
+      jobEventSource.current.close();
+      jobEventSource.current = null;
+    }
     if (pollingInterval) {
       clearInterval(pollingInterval);
       setPollingInterval(null);
@@ -857,9 +997,23 @@ GGGCGGCTTCCGGAATAGCGTACGCGCCTTTGGGTCCACTCGACAGCTTGAGGCATAGGG`);
                       >
                         Provide URL
                       </button>
+                      <button
+                        onClick={() => setStartingTreeInputMethod('latest')}
+                        className={`px-4 py-2 rounded-lg transition ${
+                          startingTreeInputMethod === 'latest'
+                            ? 'bg-purple-600 text-white'
+                            : 'bg-gray-200 text-gray-700 hover:bg-gray-300'
+                        }`}
+                      >
+                        Continue from Latest Build
+                      </button>
                     </div>
 
-                    {startingTreeInputMethod === 'file' ? (
+                    {startingTreeInputMethod === 'latest' ? (
+                      <p className="text-sm text-gray-600">
+                        Extends the most recent tree built here for this species and reference. A full rebuild runs instead if there is none, if its settings differ, or if it has drifted too far from the last full build.
+                      </p>
+                    ) : startingTreeInputMethod === 'file' ? (
                       <div>
                         <label className="block text-sm font-medium text-gray-700 mb-2">
                           Upload Protobuf File
@@ -1122,6 +1276,11 @@ GGGCGGCTTCCGGAATAGCGTACGCGCCTTTGGGTCCACTCGACAGCTTGAGGCATAGGG`);
                   {jobLogs.pod_name && <p className="text-sm text-gray-600">Pod: <code className="text-gray-800">{jobLogs.pod_name}</code></p>}
                 </div>
 
+                {/* Queue position, or why there are no logs yet */}
+                {typeof jobLogs.logs === 'string' && (
+                  <p className="text-sm text-gray-600">{jobLogs.logs}</p>
+                )}
+
                 {jobLogs.logs && typeof jobLogs.logs === 'object' && (
                   <>
                     {jobLogs.logs.main && (
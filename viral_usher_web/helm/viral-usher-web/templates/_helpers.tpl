@@ -69,3 +69,19 @@ Get the S3 secret name
 {{- .Values.s3.existingSecret }}
 {{- end }}
 {{- end }}
+
+{{/*
+Artifact cache size cap and TTLs, for the backend to pass on to build Jobs and for workers
+*/}}
+{{- define "viral-usher-web.artifactCacheEnv" -}}
+- name: VIRAL_USHER_CACHE_MAX_GB
+  value: {{ .Values.artifactCache.maxGb | quote }}
+{{- if .Values.artifactCache.genbankTtl }}
+- name: VIRAL_USHER_CACHE_GENBANK_TTL
+  value: {{ .Values.artifactCache.genbankTtl | quote }}
+{{- end }}
+{{- if .Values.artifactCache.refseqTtl }}
+- name: VIRAL_USHER_CACHE_REFSEQ_TTL
+  value: {{ .Values.artifactCache.refseqTtl | quote }}
+{{- end }}
+{{- end }}
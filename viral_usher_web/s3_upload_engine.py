@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Shared S3 upload engine used by the upload sidecar and the viral_usher_build wrapper.
+Files are uploaded concurrently from a bounded thread pool, large files are sent as
+multipart transfers, and failed files are retried with exponential backoff.
+Progress markers are printed for the backend as each file finishes, and a
+manifest.json describing every uploaded file is kept up to date under the prefix.
+"""
+import os
+import sys
+import time
+import json
+import io
+import zlib
+import hashlib
+import mimetypes
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from pathlib import Path
+
+# Tuning, all overridable from the environment
+UPLOAD_WORKERS = int(os.environ.get('S3_UPLOAD_WORKERS', '8'))  # Files uploaded at once
+MULTIPART_THRESHOLD = int(os.environ.get('S3_MULTIPART_THRESHOLD', str(64 * 1024 * 1024)))  # Bytes
+MULTIPART_CHUNKSIZE = int(os.environ.get('S3_MULTIPART_CHUNKSIZE', str(16 * 1024 * 1024)))  # Bytes
+MULTIPART_CONCURRENCY = int(os.environ.get('S3_MULTIPART_CONCURRENCY', '4'))  # Parts per file at once
+UPLOAD_RETRIES = int(os.environ.get('S3_UPLOAD_RETRIES', '3'))  # Attempts per file
+UPLOAD_RETRY_BACKOFF = float(os.environ.get('S3_UPLOAD_RETRY_BACKOFF', '2'))  # Seconds, doubled each retry
+MANIFEST_INTERVAL = float(os.environ.get('S3_MANIFEST_INTERVAL', '2'))  # Min seconds between manifest rewrites
+COMPRESS_ENCODING = os.environ.get('S3_COMPRESS_ENCODING', 'gzip')  # 'gzip', 'zstd' (needs zstandard) or 'none'
+COMPRESS_MIN_SIZE = int(os.environ.get('S3_COMPRESS_MIN_SIZE', str(64 * 1024)))  # Bytes; smaller files are stored as is
+COMPRESS_CHUNK_SIZE = 1024 * 1024  # Bytes read from the source file per compression step
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Result file roles by extension (after any .gz/.xz), for the manifest
+FILE_ROLES = {
+    '.jsonl': 'taxonium',
+    '.pb': 'protobuf',
+    '.fa': 'fasta',
+    '.fasta': 'fasta',
+    '.nwk': 'newick',
+    '.newick': 'newick',
+    '.vcf': 'vcf',
+    '.tsv': 'table',
+    '.csv': 'table',
+    '.toml': 'config',
+    '.json': 'json',
+    '.log': 'log',
+    '.txt': 'log',
+}
+
+# Roles of text files worth compressing on upload, unless already compressed
+COMPRESSIBLE_ROLES = {'fasta', 'newick', 'vcf', 'table', 'config', 'json', 'log'}
+COMPRESSED_SUFFIXES = ('.gz', '.xz', '.zst', '.bz2', '.zip')
+
+
+def file_role(filename):
+    """Classify a result file by its name, ignoring a compression suffix"""
+    name = filename.lower()
+    for suffix in ('.gz', '.xz'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return FILE_ROLES.get(os.path.splitext(name)[1], 'other')
+
+
+def content_type_for(filename):
+    """MIME type for a result file; compressed files are served as what they are on disk"""
+    mime_type, encoding = mimetypes.guess_type(filename)
+    if encoding == 'gzip':
+        return 'application/gzip'
+    if encoding == 'xz':
+        return 'application/x-xz'
+    return mime_type or 'application/octet-stream'
+
+
+def upload_encoding(file_path, size):
+    """Content-Encoding to store a file with, or None to upload it as is"""
+    name = file_path.name.lower()
+    if COMPRESS_ENCODING == 'none' or size < COMPRESS_MIN_SIZE or name.endswith(COMPRESSED_SUFFIXES):
+        return None
+    if file_role(name) not in COMPRESSIBLE_ROLES:
+        return None
+    if COMPRESS_ENCODING == 'zstd':
+        try:
+            import zstandard  # noqa: F401
+            return 'zstd'
+        except ImportError:
+            print("  zstandard not installed, compressing with gzip instead", file=sys.stderr)
+    return 'gzip'
+
+
+class CompressingReader(io.RawIOBase):
+    """Read a file's contents compressed, a chunk at a time, so memory stays bounded for any file size"""
+
+    def __init__(self, file_path, encoding):
+        self.source = open(file_path, 'rb')
+        if encoding == 'zstd':
+            import zstandard
+            self.compressor = zstandard.ZstdCompressor().compressobj()
+        else:
+            self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        self.buffer = b''
+        self.eof = False
+        self.bytes_out = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while not self.eof and (size is None or size < 0 or len(self.buffer) < size):
+            chunk = self.source.read(COMPRESS_CHUNK_SIZE)
+            if chunk:
+                self.buffer += self.compressor.compress(chunk)
+            else:
+                self.buffer += self.compressor.flush()
+                self.eof = True
+        if size is None or size < 0:
+            data, self.buffer = self.buffer, b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        self.bytes_out += len(data)
+        return data
+
+    def close(self):
+        self.source.close()
+        super().close()
+
+
+def sha256_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_s3_client(workers: int = UPLOAD_WORKERS):
+    """Create an S3 client from environment variables, sized for concurrent uploads"""
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        's3',
+        endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
+        aws_access_key_id=os.environ.get('S3_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.environ.get('S3_SECRET_ACCESS_KEY'),
+        region_name=os.environ.get('S3_REGION', 'us-east-1'),
+        config=Config(max_pool_connections=workers * MULTIPART_CONCURRENCY)
+    )
+
+
+def make_transfer_config():
+    """Multipart settings applied to every upload_file call"""
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=MULTIPART_THRESHOLD,
+        multipart_chunksize=MULTIPART_CHUNKSIZE,
+        max_concurrency=MULTIPART_CONCURRENCY,
+        use_threads=True
+    )
+
+
+class UploadEngine:
+    """Upload files under a local directory to an S3 prefix using a pool of worker threads.
+
+    Call submit() for each file, then finish() to wait for the rest. The
+    __S3_FILE_UPLOADED__ marker for each file is printed from the calling
+    thread in the order uploads complete, and manifest.json is rewritten at
+    most every MANIFEST_INTERVAL seconds, and once more when finished.
+    """
+
+    def __init__(self, local_directory, bucket, s3_prefix, workers: int = UPLOAD_WORKERS):
+        self.local_path = Path(local_directory)
+        self.bucket = bucket
+        self.s3_prefix = s3_prefix
+        self.s3_client = make_s3_client(workers)
+        self.transfer_config = make_transfer_config()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = {}  # future -> relative path
+        self.uploaded_files = []
+        self.uploaded_keys = set()
+        self.failed_files = []
+        self.bytes_uploaded = 0
+        self.start_time = time.time()
+        self.manifest_files = {}  # s3_key -> manifest entry, in upload order
+        self.manifest_dirty = False
+        self.manifest_written_at = 0.0
+
+    def submit(self, file_path):
+        """Queue a file for upload, keyed by its path relative to the local directory"""
+        file_path = Path(file_path)
+        relative_path = file_path.relative_to(self.local_path)
+        if str(relative_path) == MANIFEST_NAME:
+            return  # Written by the engine itself
+        s3_key = f"{self.s3_prefix}/{relative_path}"
+        future = self.executor.submit(self._upload, file_path, s3_key)
+        self.pending[future] = relative_path
+
+    def _upload(self, file_path, s3_key):
+        """Upload one file, retrying with exponential backoff, and return its manifest entry. Runs on a worker thread."""
+        for attempt in range(1, UPLOAD_RETRIES + 1):
+            try:
+                size = file_path.stat().st_size
+                entry = {
+                    "filename": str(file_path.relative_to(self.local_path)),
+                    "s3_key": s3_key,
+                    "size": size,
+                    "sha256": sha256_file(file_path),
+                    "content_type": content_type_for(file_path.name),
+                    "content_encoding": upload_encoding(file_path, size),
+                    "stored_size": size,
+                    "role": file_role(file_path.name)
+                }
+                extra_args = {'ContentType': entry["content_type"]}
+                if entry["content_encoding"]:
+                    # Stored compressed under the original name; HTTP clients decode it transparently
+                    extra_args['ContentEncoding'] = entry["content_encoding"]
+                    with CompressingReader(file_path, entry["content_encoding"]) as reader:
+                        self.s3_client.upload_fileobj(reader, self.bucket, s3_key, Config=self.transfer_config,
+                                                      ExtraArgs=extra_args)
+                        entry["stored_size"] = reader.bytes_out
+                else:
+                    self.s3_client.upload_file(str(file_path), self.bucket, s3_key, Config=self.transfer_config,
+                                               ExtraArgs=extra_args)
+                return entry
+            except Exception as e:
+                if attempt == UPLOAD_RETRIES:
+                    raise
+                delay = UPLOAD_RETRY_BACKOFF * 2 ** (attempt - 1)
+                print(f"  Retrying {file_path} in {delay:.0f}s (attempt {attempt} failed: {e})", file=sys.stderr)
+                time.sleep(delay)
+
+    def _record(self, future):
+        """Report the outcome of a finished upload"""
+        relative_path = self.pending.pop(future)
+        try:
+            entry = future.result()
+        except Exception as e:
+            if str(relative_path) not in self.failed_files:
+                self.failed_files.append(str(relative_path))
+                self.manifest_dirty = True
+            print(f"  ERROR uploading {relative_path}: {e}", file=sys.stderr)
+            return
+
+        # A file that failed earlier and has since changed (watch mode) is no longer failed
+        if str(relative_path) in self.failed_files:
+            self.failed_files.remove(str(relative_path))
+
+        # Files can be uploaded more than once if they change, but are listed once
+        s3_key = entry["s3_key"]
+        if s3_key not in self.uploaded_keys:
+            self.uploaded_keys.add(s3_key)
+            self.uploaded_files.append(s3_key)
+        self.bytes_uploaded += entry["stored_size"]
+        self.manifest_files[s3_key] = entry
+        self.manifest_dirty = True
+        print(f"  Uploaded {relative_path} -> s3://{self.bucket}/{s3_key}")
+
+        # Output incremental file info as JSON after each upload
+        file_info = {
+            "filename": str(relative_path),
+            "s3_key": s3_key,
+            "bucket": self.bucket,
+            "prefix": self.s3_prefix
+        }
+        print(f"__S3_FILE_UPLOADED__{json.dumps(file_info)}__S3_FILE_END__")
+        sys.stdout.flush()
+        self.write_manifest()
+
+    def write_manifest(self, complete: bool = False, force: bool = False):
+        """Rewrite manifest.json under the prefix if files were added since the last write"""
+        if not force and (not self.manifest_dirty or time.time() - self.manifest_written_at < MANIFEST_INTERVAL):
+            return
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "bucket": self.bucket,
+            "prefix": self.s3_prefix,
+            "complete": complete,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "files": list(self.manifest_files.values()),
+            "failed": self.failed_files
+        }
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=f"{self.s3_prefix}/{MANIFEST_NAME}",
+                Body=json.dumps(manifest).encode(),
+                ContentType='application/json',
+                CacheControl='no-cache'
+            )
+            self.manifest_dirty = False
+            self.manifest_written_at = time.time()
+        except Exception as e:
+            print(f"  WARNING: could not write {MANIFEST_NAME}: {e}", file=sys.stderr)
+
+    def poll(self):
+        """Report any uploads that have finished, without blocking"""
+        if self.pending:
+            done, _ = wait(list(self.pending), timeout=0, return_when=FIRST_COMPLETED)
+            for future in done:
+                self._record(future)
+        self.write_manifest()
+
+    def finish(self, complete: bool = True):
+        """Wait for all queued uploads, write the final manifest, print a throughput summary and return the uploaded S3 keys"""
+        for future in as_completed(list(self.pending)):
+            self._record(future)
+        self.executor.shutdown()
+        self.write_manifest(complete=complete, force=True)
+
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        megabytes = self.bytes_uploaded / (1024 * 1024)
+        print(f"\nUploaded {len(self.uploaded_files)} files ({megabytes:.1f} MiB) "
+              f"in {elapsed:.1f}s ({megabytes / elapsed:.1f} MiB/s)")
+        if self.failed_files:
+            print(f"WARNING: {len(self.failed_files)} files failed to upload: {', '.join(self.failed_files)}",
+                  file=sys.stderr)
+        sys.stdout.flush()
+        return self.uploaded_files
+
+
+def upload_directory_to_s3(local_directory, bucket, s3_prefix, exclude=()):
+    """Upload all files in a directory to S3, preserving directory structure"""
+    engine = UploadEngine(local_directory, bucket, s3_prefix)
+
+    print(f"\nUploading results from {local_directory} to s3://{bucket}/{s3_prefix}/")
+    print("__S3_UPLOAD_START__")
+    sys.stdout.flush()
+
+    for file_path in Path(local_directory).rglob('*'):
+        if file_path.is_file() and file_path.name not in exclude:
+            engine.submit(file_path)
+
+    uploaded_files = engine.finish()
+
+    print("__S3_UPLOAD_COMPLETE__")
+    print(f"\nSuccessfully uploaded {len(uploaded_files)} files to S3")
+    sys.stdout.flush()
+    return uploaded_files
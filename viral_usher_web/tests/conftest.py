@@ -0,0 +1,20 @@
+"""
+Test setup for the web backend and upload engine. The backend reads its
+settings from the environment when it is imported, so databases are pointed
+at a scratch directory and the persistent NCBI cache is turned off first.
+"""
+import os
+import sys
+import tempfile
+
+WEB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [WEB_DIR, os.path.join(WEB_DIR, 'backend')]
+
+DATA_DIR = tempfile.mkdtemp(prefix='viral_usher_web_tests_')
+os.environ.update({
+    'WORKDIR': DATA_DIR,
+    'RESULT_CACHE_DB': os.path.join(DATA_DIR, 'viral_usher_cache.db'),
+    'JOB_QUEUE_DB': os.path.join(DATA_DIR, 'viral_usher_jobs.db'),
+    'NCBI_CACHE_DB': '',
+    'JOB_EXECUTOR': 'kubernetes',
+})
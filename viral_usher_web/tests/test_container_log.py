@@ -0,0 +1,53 @@
+import json
+
+from main import ContainerLog, log_timestamp_key
+
+
+def test_timestamp_key_sorts_trimmed_fractions():
+    # kubelet drops trailing zeros, so .5 must sort after .123
+    assert log_timestamp_key("2024-05-01T10:00:00.5Z") > log_timestamp_key("2024-05-01T10:00:00.123Z")
+    assert log_timestamp_key("2024-05-01T10:00:01Z") > log_timestamp_key("2024-05-01T10:00:00.999999999Z")
+
+
+def test_overlapping_reads_are_deduplicated():
+    log = ContainerLog()
+    log.append("2024-05-01T10:00:00.1Z first\n2024-05-01T10:00:01Z second\n")
+    # The next read resumes a little before the last line held
+    log.append("2024-05-01T10:00:00.1Z first\n2024-05-01T10:00:01Z second\n2024-05-01T10:00:02Z third\n")
+    assert log.text == "first\nsecond\nthird\n"
+    assert log.last_key == log_timestamp_key("2024-05-01T10:00:02Z")
+
+
+def test_lines_sharing_a_timestamp_are_counted():
+    log = ContainerLog()
+    log.append("2024-05-01T10:00:00Z a\n2024-05-01T10:00:00Z b\n")
+    log.append("2024-05-01T10:00:00Z a\n2024-05-01T10:00:00Z b\n2024-05-01T10:00:00Z c\n")
+    assert log.text == "a\nb\nc\n"
+    assert log.lines_at_last_key == 3
+
+
+def test_repeated_upload_markers_are_listed_once():
+    marker = "__S3_FILE_UPLOADED__{}__S3_FILE_END__".format(json.dumps({
+        "filename": "tree.jsonl.gz", "s3_key": "results/run/tree.jsonl.gz", "bucket": "bucket", "prefix": "results/run"
+    }))
+    log = ContainerLog()
+    log.append(f"2024-05-01T10:00:00Z {marker}\n")
+    log.append(f"2024-05-01T10:00:00Z {marker}\n2024-05-01T10:00:05Z {marker}\n2024-05-01T10:00:06Z __S3_UPLOAD_COMPLETE__\n")
+    assert log.files == [("bucket", "tree.jsonl.gz", "results/run/tree.jsonl.gz")]
+    assert log.upload_complete
+
+
+def test_carriage_returns_stay_within_a_line():
+    log = ContainerLog()
+    log.append("2024-05-01T10:00:00Z progress 10%\r progress 50%\rprogress 100%\n2024-05-01T10:00:01Z done\n")
+    log.append("2024-05-01T10:00:01Z done\n2024-05-01T10:00:02Z next\r\n")
+    assert log.text == "progress 10%\r progress 50%\rprogress 100%\ndone\nnext\r\n"
+    assert log.last_key == log_timestamp_key("2024-05-01T10:00:02Z")
+
+
+def test_unstamped_output_joins_the_line_before():
+    log = ContainerLog()
+    log.append("2024-05-01T10:00:00Z first\ncontinued\n2024-05-01T10:00:01Z second\n")
+    # Overlap that repeats the continuation is dropped with its line
+    log.append("2024-05-01T10:00:01Z second\ncontinued\n2024-05-01T10:00:02Z third\n")
+    assert log.text == "first\ncontinued\nsecond\nthird\n"
@@ -0,0 +1,64 @@
+import gzip
+import io
+
+import pytest
+from starlette.requests import Request
+
+from main import accepts_encoding, iter_decoded_s3_body
+
+
+def request_with(accept_encoding=None):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.mark.parametrize("header, encoding, expected", [
+    ("gzip, deflate, br", "gzip", True),
+    ("GZIP", "gzip", True),
+    ("br;q=1.0, gzip;q=0.8", "gzip", True),
+    ("gzip;q=0", "gzip", False),
+    ("gzip; q=0.0", "gzip", False),
+    ("deflate, br", "gzip", False),
+    ("*", "zstd", True),
+    ("*;q=0, gzip", "gzip", True),
+    ("gzip;q=0, *", "gzip", False),
+    ("*, gzip;q=0", "gzip", False),
+    ("*;q=0", "gzip", False),
+    ("gzip;q=0.000, br", "gzip", False),
+    ("gzip;q=0.001", "gzip", True),
+    ("zstd, gzip", "zstd", True),
+    ("", "gzip", False),
+    (None, "gzip", False),
+])
+def test_accepts_encoding(header, encoding, expected):
+    assert accepts_encoding(request_with(header), encoding) is expected
+
+
+class ChunkedBody:
+    """An S3 StreamingBody that hands back a few bytes at a time"""
+
+    def __init__(self, data, chunk_size=7):
+        self.stream = io.BytesIO(data)
+        self.chunk_size = chunk_size
+
+    def iter_chunks(self, chunk_size=None):
+        return iter(lambda: self.stream.read(self.chunk_size), b"")
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def close(self):
+        pass
+
+
+def test_gzip_body_is_decoded_for_clients_without_gzip():
+    content = b"".join(f">seq{i}\nACGT{'N' * (i % 50)}\n".encode() for i in range(2000))
+    decoded = b"".join(iter_decoded_s3_body(ChunkedBody(gzip.compress(content)), "gzip"))
+    assert decoded == content
+
+
+def test_zstd_body_is_decoded_for_clients_without_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    content = b"(a:0.1,(b:0.2,c:0.3):0.4);\n" * 500
+    decoded = b"".join(iter_decoded_s3_body(ChunkedBody(zstandard.ZstdCompressor().compress(content)), "zstd"))
+    assert decoded == content
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+import main
+from main import HTTPException, JobExecutor, JobQueue
+
+SMALL = {"input_bytes": 1024}
+LARGE = {"input_bytes": 10 * 1024 ** 3}
+
+
+class FakeExecutor(JobExecutor):
+    """Records started builds; a build runs until finish() is called"""
+
+    def __init__(self, max_running=None, failing=()):
+        self.max_running = max_running
+        self.failing = set(failing)
+        self.started = []
+        self.finished = set()
+
+    async def start(self, job_name, config_s3_key, no_genbank, use_update_mode, inputs, estimate):
+        if job_name in self.failing:
+            raise HTTPException(status_code=500, detail="cluster unavailable")
+        self.started.append(job_name)
+
+    def is_running(self, job_name):
+        return job_name in self.started and job_name not in self.finished
+
+    def finish(self, job_name):
+        self.finished.add(job_name)
+
+    async def usage(self, job_name):
+        return {"outcome": "succeeded", "peak_memory_bytes": 2 ** 30, "cpu_seconds": 60.0, "wall_seconds": 30.0}
+
+    async def read_status(self, job_name, log_pod, main_offset, upload_offset):
+        return {"job_name": job_name, "status": "running"}
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = FakeExecutor()
+    monkeypatch.setattr(main, "job_executor", executor)
+    monkeypatch.setattr(main, "JOB_MAX_RUNNING", 3)
+    monkeypatch.setattr(main, "JOB_MAX_RUNNING_PER_USER", 2)
+    monkeypatch.setattr(main, "JOB_SMALL_INPUT_BYTES", 1024 ** 2)
+    monkeypatch.setattr(main, "JOB_PRIORITY_AGING", 1800)
+    monkeypatch.setattr(main, "JOB_SIZING_ENABLED", False)
+    return executor
+
+
+@pytest.fixture
+def queue(tmp_path, executor):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def submit(queue, job_name, user, inputs=SMALL):
+    return asyncio.run(queue.submit(job_name, user, inputs, f"uploads/{job_name}.toml", False, False))
+
+
+def test_global_and_per_user_caps(queue, executor):
+    for job_name in ("a1", "a2", "a3"):
+        submit(queue, job_name, "alice")
+    info = submit(queue, "b1", "bob")
+    submit(queue, "c1", "carol")
+
+    # Alice is held to two builds; Bob fills the last global slot
+    assert executor.started == ["a1", "a2", "b1"]
+    assert info == {"success": True, "job_name": "b1", "namespace": main.K8S_NAMESPACE}
+    assert queue.status("a3") == {"status": "queued", "position": 1, "length": 2}
+
+    executor.finish("a1")
+    asyncio.run(queue.dispatch())
+    assert executor.started == ["a1", "a2", "b1", "a3"]
+    assert queue.status("c1") == {"status": "queued", "position": 1, "length": 1}
+
+
+def test_executor_limit_below_global_cap(queue, executor):
+    executor.max_running = 1
+    submit(queue, "a1", "alice")
+    info = submit(queue, "b1", "bob")
+    assert executor.started == ["a1"]
+    assert info["queued"] and info["queue_position"] == 1
+
+
+def test_small_submissions_go_first(queue, executor):
+    executor.max_running = 1
+    submit(queue, "running", "carol")
+    submit(queue, "large", "alice", LARGE)
+    submit(queue, "small", "bob")
+    assert queue.status("small")["position"] == 1
+
+    executor.finish("running")
+    asyncio.run(queue.dispatch())
+    assert executor.started == ["running", "small"]
+
+
+def test_waiting_large_submission_is_aged_in(queue, executor):
+    executor.max_running = 1
+    submit(queue, "running", "carol")
+    submit(queue, "large", "alice", LARGE)
+    submit(queue, "small", "bob")
+    queue.db.execute("UPDATE job_queue SET submitted_at = submitted_at - 3600 WHERE job_name = 'large'")
+    queue.db.commit()
+    assert queue.status("large")["position"] == 1
+
+    executor.finish("running")
+    asyncio.run(queue.dispatch())
+    assert executor.started == ["running", "large"]
+
+
+def test_failed_start_is_reported_and_frees_the_slot(queue, executor):
+    executor.failing.add("a1")
+    assert submit(queue, "a1", "alice") == {"success": False, "error": "cluster unavailable"}
+    submit(queue, "a2", "alice")
+    submit(queue, "a3", "alice")
+    assert executor.started == ["a2", "a3"]
+
+
+def test_finished_build_usage_is_recorded(queue, executor):
+    submit(queue, "a1", "alice")
+    executor.finish("a1")
+    asyncio.run(queue.dispatch())
+    [record] = queue.usage_records(10)
+    assert record["job_name"] == "a1"
+    assert record["outcome"] == "succeeded"
+    assert record["inputs"] == SMALL
+    assert queue.status("a1") is None
@@ -0,0 +1,74 @@
+import requests
+
+import main
+from main import NextcladeIndex
+
+INDEX = {"collections": [{"datasets": [
+    {"path": "nextstrain/sars-cov-2/wuhan-hu-1/orfs", "attributes": {"name": "SARS-CoV-2"},
+     "capabilities": {"clades": 30, "customClades": {"Nextclade_pango": 2000}}},
+    {"path": "nextstrain/mpox/all-clades", "attributes": {"name": "Mpox virus"}, "capabilities": {"clades": 5}},
+    {"path": "community/no-clades", "attributes": {"name": "Unannotated"}, "capabilities": {}},
+]}]}
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+    def json(self):
+        return self.data
+
+
+def serve(monkeypatch, *responses):
+    """Answer successive index requests with the given responses (or exceptions), recording the headers sent"""
+    requests_sent = []
+    queue = list(responses)
+
+    def get(url, headers=None, **kwargs):
+        requests_sent.append(headers or {})
+        response = queue.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(main.requests, "get", get)
+    return requests_sent
+
+
+def test_index_is_read_from_the_validated_response(monkeypatch):
+    sent = serve(monkeypatch, FakeResponse(200, INDEX, {"ETag": '"v1"'}), FakeResponse(304))
+    index = NextcladeIndex()
+    assert index.refresh()
+    assert [dataset["path"] for dataset in index.search("sars-cov-2")] == ["nextstrain/sars-cov-2/wuhan-hu-1/orfs"]
+    assert index.search("mpox")[0]["clades"] == {"clade": 5}
+    assert index.search("unannotated") == []
+    assert index.etag == '"v1"'
+
+    # An unchanged index costs one conditional request and keeps what is held
+    assert index.refresh()
+    assert sent == [{}, {"If-None-Match": '"v1"'}]
+    assert len(index.datasets) == 2
+
+
+def test_failed_first_load_is_not_marked_loaded(monkeypatch):
+    serve(monkeypatch, requests.ConnectionError("unreachable"), FakeResponse(200, INDEX, {"ETag": '"v1"'}))
+    index = NextcladeIndex()
+    assert not index.refresh()
+    assert not index.loaded
+    assert index.refresh()
+    assert index.loaded
+
+
+def test_failed_refresh_keeps_the_loaded_index(monkeypatch):
+    serve(monkeypatch, FakeResponse(200, INDEX, {"ETag": '"v1"'}), FakeResponse(503))
+    index = NextcladeIndex()
+    index.refresh()
+    assert index.refresh()
+    assert len(index.datasets) == 2
+    assert index.etag == '"v1"'
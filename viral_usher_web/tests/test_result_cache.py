@@ -0,0 +1,36 @@
+import asyncio
+
+import main
+
+
+def test_lookup_expires_with_its_own_ttl():
+    main.result_cache_add("genbank-key", "job-genbank", "results/genbank")
+    main.result_cache_add("other-key", "job-other", "results/other")
+    main.result_cache_db.execute("UPDATE result_cache SET created_at = created_at - 7200")
+    main.result_cache_db.commit()
+
+    assert main.result_cache_lookup("genbank-key", ttl=3600) is None
+    # Entries kept for longer are untouched by a shorter TTL
+    assert main.result_cache_lookup("other-key", ttl=86400)["job_name"] == "job-other"
+
+
+def test_finished_job_is_written_once(monkeypatch):
+    main.result_cache_add("settled-key", "job-settled", "results/settled")
+    writes = []
+    complete = main.result_cache_complete
+
+    def counting_complete(job_name, files):
+        writes.append(job_name)
+        complete(job_name, files)
+
+    monkeypatch.setattr(main, "result_cache_complete", counting_complete)
+    results = {"upload_complete": True, "files": [{"filename": "tree.jsonl.gz", "s3_key": "results/settled/tree.jsonl.gz"}]}
+
+    class Log:
+        def s3_results(self):
+            return results
+
+    for _ in range(3):
+        asyncio.run(main.job_s3_results("job-settled", "succeeded", None, [Log()]))
+    assert writes == ["job-settled"]
+    assert main.result_cache_lookup("settled-key")["status"] == "complete"
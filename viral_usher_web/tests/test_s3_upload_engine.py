@@ -0,0 +1,101 @@
+import gzip
+import json
+import os
+from concurrent.futures import Future
+
+import pytest
+
+import s3_upload_engine
+from s3_upload_engine import CompressingReader, UploadEngine
+
+WEB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    path = tmp_path / "metadata.tsv"
+    path.write_bytes(b"".join(f"seq{i}\t2024-01-{i % 28 + 1:02d}\tclade{i % 7}\n".encode() for i in range(20000)))
+    return path
+
+
+def read_all(reader, size):
+    chunks = []
+    while True:
+        chunk = reader.read(size)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+@pytest.mark.parametrize("read_size", [1, 1000, 65536, -1])
+def test_gzip_round_trip(text_file, monkeypatch, read_size):
+    monkeypatch.setattr(s3_upload_engine, "COMPRESS_CHUNK_SIZE", 4096)  # Several source reads per file
+    with CompressingReader(text_file, "gzip") as reader:
+        compressed = read_all(reader, read_size)
+        assert reader.bytes_out == len(compressed)
+    assert gzip.decompress(compressed) == text_file.read_bytes()
+    assert len(compressed) < text_file.stat().st_size
+
+
+def test_zstd_round_trip(text_file):
+    zstandard = pytest.importorskip("zstandard")
+    with CompressingReader(text_file, "zstd") as reader:
+        compressed = read_all(reader, 1000)
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(compressed) == text_file.read_bytes()
+
+
+def test_empty_file_round_trip(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    with CompressingReader(path, "gzip") as reader:
+        assert gzip.decompress(reader.read()) == b""
+
+
+class RecordingS3Client:
+    """Stands in for boto3, keeping the objects put"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+
+    def upload_file(self, filename, bucket, key, **kwargs):
+        with open(filename, 'rb') as f:
+            self.objects[key] = f.read()
+
+
+def record(engine, relative_path, outcome):
+    future = Future()
+    if isinstance(outcome, Exception):
+        future.set_exception(outcome)
+    else:
+        future.set_result(outcome)
+    engine.pending[future] = relative_path
+    engine._record(future)
+
+
+def test_failed_file_is_cleared_once_reuploaded(tmp_path):
+    (tmp_path / "tree.nwk").write_text("(a,b);\n")
+    engine = UploadEngine(str(tmp_path), "bucket", "results/run", workers=1)
+    engine.s3_client = RecordingS3Client()
+
+    record(engine, "tree.nwk", RuntimeError("connection reset"))
+    record(engine, "tree.nwk", RuntimeError("connection reset"))
+    engine.write_manifest(force=True)
+    assert json.loads(engine.s3_client.objects["results/run/manifest.json"])["failed"] == ["tree.nwk"]
+
+    # Watch mode uploads the file again after it changes
+    record(engine, "tree.nwk", engine._upload(tmp_path / "tree.nwk", "results/run/tree.nwk"))
+    engine.finish()
+    manifest = json.loads(engine.s3_client.objects["results/run/manifest.json"])
+    assert manifest["failed"] == []
+    assert manifest["complete"]
+    assert [entry["filename"] for entry in manifest["files"]] == ["tree.nwk"]
+
+
+def test_worker_image_copy_matches():
+    # The worker image builds from supplemental_viral_usher_build, so it carries its own copy of the engine
+    worker_copy = os.path.join(os.path.dirname(WEB_DIR), "supplemental_viral_usher_build", "s3_upload_engine.py")
+    with open(s3_upload_engine.__file__, 'rb') as web, open(worker_copy, 'rb') as worker:
+        assert web.read() == worker.read()
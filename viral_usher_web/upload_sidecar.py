@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 """
 Sidecar container script for uploading viral_usher results to S3.
-This script waits for the main viral_usher container to complete,
-then uploads all results from the shared workspace to S3.
+In watch mode (the default) this script uploads each output from the
+shared workspace as soon as it stops changing, then flushes whatever is
+left once the main viral_usher container completes. In batch mode it
+waits for completion and uploads everything at once.
 """
 import os
 import sys
@@ -10,6 +12,13 @@ import time
 import json
 from pathlib import Path
 
+from s3_upload_engine import UploadEngine, upload_directory_to_s3
+
+UPLOAD_MODE = os.environ.get('UPLOAD_MODE', 'watch')  # 'watch' or 'batch'
+STABLE_SECONDS = float(os.environ.get('UPLOAD_STABLE_SECONDS', '15'))  # Quiet time before a file is uploaded
+POLL_INTERVAL = float(os.environ.get('UPLOAD_POLL_INTERVAL', '2'))  # Seconds between workspace checks
+MARKER_NAME = '.job_complete'
+
 
 def wait_for_completion(marker_file: str, timeout: int = 3600):
     """Wait for the main container to create a completion marker file"""
@@ -34,52 +43,148 @@ def wait_for_completion(marker_file: str, timeout: int = 3600):
         time.sleep(5)
 
 
-def upload_directory_to_s3(local_directory, bucket, s3_prefix):
-    """Upload all files in a directory to S3, preserving directory structure"""
-    import boto3
+class PollingWatcher:
+    """Detect changed files by comparing size and mtime between workspace scans"""
 
-    s3_client = boto3.client(
-        's3',
-        endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
-        aws_access_key_id=os.environ.get('S3_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.environ.get('S3_SECRET_ACCESS_KEY'),
-        region_name=os.environ.get('S3_REGION', 'us-east-1')
-    )
+    def __init__(self, workdir):
+        self.workdir = Path(workdir)
+        self.signatures = {}
 
-    local_path = Path(local_directory)
-    uploaded_files = []
+    def changed_paths(self, timeout):
+        time.sleep(timeout)
+        changed = set()
+        signatures = {}
+        for file_path in self.workdir.rglob('*'):
+            try:
+                if not file_path.is_file():
+                    continue
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue
+            signatures[file_path] = (stat.st_size, stat.st_mtime_ns)
+            if self.signatures.get(file_path) != signatures[file_path]:
+                changed.add(file_path)
+        self.signatures = signatures
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Detect changed files from inotify events, watching new subdirectories as they appear"""
+
+    def __init__(self, workdir):
+        from inotify_simple import INotify, flags
+
+        self.flags = flags
+        self.inotify = INotify()
+        self.mask = (flags.CREATE | flags.MODIFY | flags.CLOSE_WRITE | flags.MOVED_TO)
+        self.directories = {}
+        self.pending = set()
+        self._watch_tree(Path(workdir))
+
+    def _watch_tree(self, directory):
+        """Watch a directory and everything under it, reporting files already present"""
+        self.directories[self.inotify.add_watch(str(directory), self.mask)] = directory
+        for path in directory.iterdir():
+            if path.is_dir():
+                self._watch_tree(path)
+            elif path.is_file():
+                self.pending.add(path)
+
+    def changed_paths(self, timeout):
+        changed, self.pending = self.pending, set()
+        for event in self.inotify.read(timeout=int(timeout * 1000)):
+            directory = self.directories.get(event.wd)
+            if directory is None or not event.name:
+                continue
+            path = directory / event.name
+            if event.mask & self.flags.ISDIR:
+                if event.mask & (self.flags.CREATE | self.flags.MOVED_TO):
+                    self._watch_tree(path)
+                    changed |= self.pending
+                    self.pending = set()
+            else:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        self.inotify.close()
+
+
+def make_watcher(workdir):
+    """Use inotify when available, otherwise fall back to polling"""
+    try:
+        watcher = InotifyWatcher(workdir)
+        print("Watching workspace with inotify")
+        return watcher
+    except (ImportError, OSError) as e:
+        print(f"inotify unavailable ({e}), polling workspace every {POLL_INTERVAL}s")
+        return PollingWatcher(workdir)
 
-    print(f"\nUploading results from {local_directory} to s3://{bucket}/{s3_prefix}/")
-    print("__S3_UPLOAD_START__")
-    sys.stdout.flush()
 
-    for file_path in local_path.rglob('*'):
-        if file_path.is_file():
-            # Skip the completion marker file
-            if file_path.name == ".job_complete":
-                continue
+def file_signature(file_path):
+    """Size and mtime of a file, or None if it no longer exists"""
+    try:
+        stat = file_path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def watch_and_upload(workdir, marker_file, bucket, s3_prefix, timeout: int = 3600):
+    """Upload workspace files as they become stable, then flush the rest once the marker appears.
+
+    A file is uploaded once it has gone STABLE_SECONDS without changing. If it
+    changes again afterwards it is uploaded again. Returns the uploaded S3
+    keys, or None if the completion marker did not appear within the timeout.
+    """
+    engine = UploadEngine(workdir, bucket, s3_prefix)
+    watcher = make_watcher(workdir)
+    last_changed = {}  # path -> time of most recent change
+    uploaded = {}  # path -> signature at the time it was uploaded
+    start_time = time.time()
 
-            # Calculate relative path for S3 key
-            relative_path = file_path.relative_to(local_path)
-            s3_key = f"{s3_prefix}/{relative_path}"
+    print(f"\nUploading results from {workdir} to s3://{bucket}/{s3_prefix}/ as they are produced")
+    print("__S3_UPLOAD_START__")
+    sys.stdout.flush()
 
-            print(f"  Uploading {relative_path} -> s3://{bucket}/{s3_key}")
+    def upload_if_changed(file_path):
+        signature = file_signature(file_path)
+        if signature is not None and uploaded.get(file_path) != signature:
+            uploaded[file_path] = signature
+            engine.submit(file_path)
 
-            try:
-                s3_client.upload_file(str(file_path), bucket, s3_key)
-                uploaded_files.append(s3_key)
-
-                # Output incremental file info as JSON after each upload
-                file_info = {
-                    "filename": str(relative_path),
-                    "s3_key": s3_key,
-                    "bucket": bucket,
-                    "prefix": s3_prefix
-                }
-                print(f"__S3_FILE_UPLOADED__{json.dumps(file_info)}__S3_FILE_END__")
-                sys.stdout.flush()
-            except Exception as e:
-                print(f"  ERROR uploading {file_path}: {e}", file=sys.stderr)
+    try:
+        while not os.path.exists(marker_file):
+            elapsed = time.time() - start_time
+            if elapsed > timeout:
+                print(f"✗ Timeout waiting for completion marker after {timeout}s", file=sys.stderr)
+                engine.finish(complete=False)
+                return None
+
+            now = time.time()
+            for file_path in watcher.changed_paths(POLL_INTERVAL):
+                if file_path.name != MARKER_NAME:
+                    last_changed[file_path] = now
+
+            now = time.time()
+            for file_path, changed_at in list(last_changed.items()):
+                if now - changed_at >= STABLE_SECONDS:
+                    del last_changed[file_path]
+                    upload_if_changed(file_path)
+
+            engine.poll()
+    finally:
+        watcher.close()
+
+    print(f"✓ Completion marker found after {int(time.time() - start_time)}s, uploading remaining files")
+    for file_path in Path(workdir).rglob('*'):
+        if file_path.is_file() and file_path.name != MARKER_NAME:
+            upload_if_changed(file_path)
+
+    uploaded_files = engine.finish()
 
     print("__S3_UPLOAD_COMPLETE__")
     print(f"\nSuccessfully uploaded {len(uploaded_files)} files to S3")
@@ -88,7 +193,7 @@ def upload_directory_to_s3(local_directory, bucket, s3_prefix):
 
 
 def main():
-    """Wait for viral_usher to complete, then upload results to S3"""
+    """Upload viral_usher results to S3 as they are produced or once it completes"""
 
     print("=" * 80)
     print("S3 Upload Sidecar Starting")
@@ -96,18 +201,13 @@ def main():
 
     # Configuration
     workdir = os.environ.get('WORKDIR', '/workspace')
-    marker_file = os.path.join(workdir, '.job_complete')
+    marker_file = os.path.join(workdir, MARKER_NAME)
     s3_bucket = os.environ.get('S3_BUCKET')
 
     if not s3_bucket:
         print("\nERROR: S3_BUCKET not set, cannot upload results", file=sys.stderr)
         sys.exit(1)
 
-    # Wait for main container to complete
-    if not wait_for_completion(marker_file):
-        print("\nERROR: Main container did not complete in time", file=sys.stderr)
-        sys.exit(1)
-
     # Create S3 prefix from config key if available, otherwise use timestamp
     config_s3_key = os.environ.get('CONFIG_S3_KEY', '')
     if config_s3_key:
@@ -120,19 +220,21 @@ def main():
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         s3_prefix = f"results/{timestamp}"
 
-    print(f"\nStarting upload to s3://{s3_bucket}/{s3_prefix}/")
-
     try:
-        # Install boto3 if not available (for python:3.12-slim base image)
-        try:
-            import boto3
-        except ImportError:
-            print("Installing boto3...")
-            import subprocess
-            subprocess.run([sys.executable, "-m", "pip", "install", "-q", "boto3"], check=True)
-            import boto3
-
-        uploaded_files = upload_directory_to_s3(workdir, s3_bucket, s3_prefix)
+        # Dependencies come preinstalled in the uploader image (Dockerfile.uploader)
+        if UPLOAD_MODE == 'watch':
+            uploaded_files = watch_and_upload(workdir, marker_file, s3_bucket, s3_prefix)
+            if uploaded_files is None:
+                print("\nERROR: Main container did not complete in time", file=sys.stderr)
+                sys.exit(1)
+        else:
+            # Wait for main container to complete
+            if not wait_for_completion(marker_file):
+                print("\nERROR: Main container did not complete in time", file=sys.stderr)
+                sys.exit(1)
+
+            print(f"\nStarting upload to s3://{s3_bucket}/{s3_prefix}/")
+            uploaded_files = upload_directory_to_s3(workdir, s3_bucket, s3_prefix, exclude={MARKER_NAME})
 
         print("\n" + "=" * 80)
         print(f"Results uploaded to s3://{s3_bucket}/{s3_prefix}/")